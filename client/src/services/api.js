@@ -237,11 +237,20 @@ export const documentService = {
   
   queryDocument: async (query) => {
     try {
+      // Send the same token as the upload so the query searches this user's documents
+      const userInfo = localStorage.getItem('user-info');
+      let token = null;
+      if (userInfo) {
+        const { token: userToken } = JSON.parse(userInfo);
+        token = userToken;
+      }
+
       const response = await api.post('/api/query', {
         query: query
       }, {
         headers: {
-          'Content-Type': 'application/json'
+          'Content-Type': 'application/json',
+          'Authorization': token ? `Bearer ${token}` : '',
         }
       });
       
@@ -1,60 +1,52 @@
-from contextlib import redirect_stdout
+import time
+_import_started = time.perf_counter()
+from contextlib import contextmanager
+import contextvars
 import unicodedata
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, request, jsonify, send_file, Response, stream_with_context
 from youtube_transcript_api import YouTubeTranscriptApi
 from youtube_transcript_api.formatters import TextFormatter
 from threading import Thread
-import pyttsx3
 import html
-from bs4 import BeautifulSoup
 from flask_cors import CORS 
-import fitz
-from fpdf import FPDF
 import random
 import re
 import json
-from langchain_community.llms import GPT4All  
-from langchain_groq import ChatGroq
 import os
 from dotenv import load_dotenv
 load_dotenv()
 from pymongo import MongoClient
-import PyPDF2
-import google.generativeai as genai
 import io
-from google.generativeai import GenerativeModel
 import jwt
 from functools import wraps
 from werkzeug.utils import secure_filename
 import logging
-from bson.objectid import ObjectId
 from langchain_core.prompts import ChatPromptTemplate
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import PyPDFLoader
-#from langchain_community.indexes import VectorstoreIndexCreator  # Commented out due to ImportError
-from langchain_community.vectorstores import FAISS
-from langchain_community.embeddings import SentenceTransformerEmbeddings
-from langchain_community.document_loaders import PyMuPDFLoader
-from langchain.chains import RetrievalQA
-from io import BytesIO
-from PyPDF2 import PdfReader  
-from langchain.schema import Document  
-import chromadb
-from sentence_transformers import SentenceTransformer
-import google.generativeai as genai
 #from langchain.document_loaders import PyPDFLoader
-from pptx import Presentation
 import redis
 redis_client = redis.StrictRedis(host='localhost', port=6379, db=0, decode_responses=True)
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.colors import HexColor
-from reportlab.lib.units import inch
-from agno.agent import Agent
-from agno.models.groq import Groq
-from agno.tools.duckduckgo import DuckDuckGoTools
+# Heavy dependencies (sentence-transformers, chromadb, faiss, google-generativeai, fitz, fpdf,
+# reportlab, agno, pyttsx3, PyPDF2, python-pptx, bs4) are imported on first use, see "Lazy resources".
 import requests
+import threading
+import hashlib
+import sqlite3
+import hmac
+import uuid
+import base64
+import importlib
+import sys
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, Future, wait, TimeoutError as FuturesTimeoutError
+import queue
+import multiprocessing
+try:
+    import fcntl
+except ImportError:  # Windows: writers are only serialised within one process
+    fcntl = None
+
+startup_timings = {"import:eager_modules": round(time.perf_counter() - _import_started, 3)}
 
 app = Flask(__name__)
 SECRET_KEY = "quick" 
@@ -69,155 +61,1714 @@ CORS(app, resources={
             "http://localhost:3000",  # Main/Proxy server
             "http://localhost:3001"   # Node server
         ],
-        "methods": ["GET", "POST", "OPTIONS"],
-        "allow_headers": ["Content-Type", "Authorization"],
+        "methods": ["GET", "POST", "DELETE", "OPTIONS"],
+        "allow_headers": ["Content-Type", "Authorization", "Prefer", "If-None-Match", "If-Modified-Since", "Range", "If-Range"],
+        "expose_headers": ["Location", "ETag", "Last-Modified", "Accept-Ranges", "Content-Range", "Content-Disposition"],
         "supports_credentials": True
     }
 })
 
 formatter = TextFormatter()
 
-google_api_key = os.getenv("GENAI_API_KEY")
-genai.configure(api_key=google_api_key)
-gemini_model = genai.GenerativeModel('gemini-2.0-flash')  # Use the correct model name
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Lazy resources
+lazy_resources = {}
+
+class LazyResource:
+    """
+    Thread-safe proxy that builds an expensive object (model, client, index) on first use.
+    Attribute access is forwarded to the loaded object, so call sites use it like the object itself.
+    """
+    def __init__(self, name, loader):
+        self._name = name
+        self._loader = loader
+        self._value = None
+        self._lock = threading.Lock()
+        lazy_resources[name] = self
+
+    @property
+    def loaded(self):
+        return self._value is not None
+
+    def load(self):
+        if self._value is None:
+            with self._lock:
+                if self._value is None:
+                    started = time.perf_counter()
+                    value = self._loader()
+                    startup_timings[f"resource:{self._name}"] = round(time.perf_counter() - started, 3)
+                    logger.info(f"Loaded {self._name} in {startup_timings[f'resource:{self._name}']}s")
+                    self._value = value
+        return self._value
+
+    def reset(self):
+        """Drop the loaded object so the next use builds a fresh one."""
+        with self._lock:
+            self._value = None
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+def import_timed(module_name):
+    """Import a module, recording how long the first import took in the startup report."""
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    started = time.perf_counter()
+    module = importlib.import_module(module_name)
+    startup_timings.setdefault(f"import:{module_name}", round(time.perf_counter() - started, 3))
+    return module
+
+# Modules only some endpoints need; imported lazily inside those endpoints, preloaded by warm_up()
+LAZY_MODULES = ("fitz", "fpdf", "reportlab.platypus", "agno.agent", "pyttsx3", "PyPDF2", "pptx", "bs4")
+
+def load_genai():
+    genai_module = import_timed("google.generativeai")
+    if os.getenv("GENAI_API_ENDPOINT"):
+        # Point Gemini at another endpoint (e.g. the load-test stub) over REST
+        genai_module.configure(
+            api_key=os.getenv("GENAI_API_KEY"),
+            transport="rest",
+            client_options={"api_endpoint": os.getenv("GENAI_API_ENDPOINT")}
+        )
+    else:
+        genai_module.configure(api_key=os.getenv("GENAI_API_KEY"))
+    return genai_module
+
+huggingface_login_lock = threading.Lock()
+huggingface_logged_in = False
+
+def load_sentence_transformer(model_name):
+    global huggingface_logged_in
+    with huggingface_login_lock:
+        if not huggingface_logged_in and os.getenv("HUGGINGFACE_TOKEN"):
+            from huggingface_hub import login
+            login(token=os.getenv("HUGGINGFACE_TOKEN"))
+        huggingface_logged_in = True
+    return import_timed("sentence_transformers").SentenceTransformer(model_name)
+
+def warm_up(names=None):
+    """Load the named lazy resources and modules (all of them by default) ahead of the first request."""
+    for module_name in LAZY_MODULES:
+        if names is None or module_name in names:
+            try:
+                import_timed(module_name)
+            except ImportError as e:
+                logger.error(f"Warm-up import of {module_name} failed: {str(e)}")
+    for name, resource in list(lazy_resources.items()):
+        if names is None or name in names:
+            try:
+                resource.load()
+            except Exception as e:
+                logger.error(f"Warm-up of {name} failed: {str(e)}")
+
+# Metrics
+# Prometheus text format, aggregated per process. Stage timers are labelled with the endpoint
+# that triggered the work (carried into worker threads by ContextThreadPoolExecutor).
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+metrics_registry = []
+current_endpoint = contextvars.ContextVar("current_endpoint", default="background")
+
+def format_labels(names, values):
+    if not names:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for v in values)
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(names, escaped)) + "}"
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by label values."""
+    def __init__(self, name, documentation, labelnames, buckets=STAGE_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+        metrics_registry.append(self)
+
+    def observe(self, value, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][i] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series["counts"]):
+                    lines.append(f"{self.name}_bucket{format_labels(self.labelnames + ('le',), labels + (bound,))} {count}")
+                lines.append(f"{self.name}_bucket{format_labels(self.labelnames + ('le',), labels + ('+Inf',))} {series['count']}")
+                lines.append(f"{self.name}_sum{format_labels(self.labelnames, labels)} {series['sum']:.6f}")
+                lines.append(f"{self.name}_count{format_labels(self.labelnames, labels)} {series['count']}")
+        return lines
+
+class Gauge:
+    def __init__(self, name, documentation, labelnames):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+        metrics_registry.append(self)
 
-groq_model = ChatGroq(
-    model="llama-3.1-8b-instant",
-    temperature=0,
-    groq_api_key=os.getenv("GROQ_API_KEY")
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels):
+        self.inc(*labels, amount=-1)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+stage_seconds = Histogram(
+    "quicklearn_stage_duration_seconds",
+    "Time spent in one processing stage (transcript fetch, LLM call, embedding, search, PDF work).",
+    ("endpoint", "stage", "model")
 )
+request_seconds = Histogram(
+    "quicklearn_request_duration_seconds",
+    "HTTP request latency.",
+    ("endpoint", "method", "status")
+)
+requests_in_flight = Gauge("quicklearn_requests_in_flight", "Requests currently being handled.", ("endpoint",))
+
+@contextmanager
+def stage_timer(stage, model=""):
+    """Record how long the block takes under the current endpoint, even if it raises."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_seconds.observe(time.perf_counter() - started, current_endpoint.get(), stage, model)
+
+def timed_stage(stage, model=""):
+    """Decorator form of stage_timer for functions that are a stage on their own."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage_timer(stage, model):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+class ContextThreadPoolExecutor(ThreadPoolExecutor):
+    """ThreadPoolExecutor that runs each task in a copy of the submitter's context, so metrics keep their endpoint label."""
+    def submit(self, fn, *args, **kwargs):
+        return super().submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+@app.before_request
+def start_request_metrics():
+    endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+    current_endpoint.set(endpoint)
+    request.metrics_endpoint = endpoint
+    request.metrics_started = time.perf_counter()
+    requests_in_flight.inc(endpoint)
+
+@app.after_request
+def record_request_metrics(response):
+    if hasattr(request, "metrics_started"):
+        request_seconds.observe(
+            time.perf_counter() - request.metrics_started, request.metrics_endpoint, request.method, str(response.status_code)
+        )
+    return response
+
+@app.teardown_request
+def finish_request_metrics(error=None):
+    if hasattr(request, "metrics_endpoint"):
+        requests_in_flight.dec(request.metrics_endpoint)
+
+def render_cache_metrics():
+    """Cache and embedding-queue counters, read from the existing stats() at scrape time."""
+    lines = [
+        "# HELP quicklearn_cache_events_total Cache lookups and writes by outcome.",
+        "# TYPE quicklearn_cache_events_total counter"
+    ]
+    hit_rates = []
+    for name, cache in sorted(cache_registry.items()):
+        stats = cache.stats()
+        for event in ("local_hits", "redis_hits", "hits", "misses", "sets", "evictions", "redis_errors"):
+            if event in stats:
+                lines.append(f"quicklearn_cache_events_total{format_labels(('cache', 'event'), (name, event))} {stats[event]}")
+        hit_rates.append(f"quicklearn_cache_hit_ratio{format_labels(('cache',), (name,))} {stats['hit_rate']}")
+    lines += ["# HELP quicklearn_cache_hit_ratio Hits over lookups since start.", "# TYPE quicklearn_cache_hit_ratio gauge"] + hit_rates
+    lines += ["# HELP quicklearn_embedding_queue_depth Encode requests waiting for the embedding worker.",
+              "# TYPE quicklearn_embedding_queue_depth gauge"]
+    for name, service in sorted(embedding_services.items()):
+        lines.append(f"quicklearn_embedding_queue_depth{format_labels(('model',), (name,))} {service.queue.qsize()}")
+    return lines
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    lines = []
+    for metric in metrics_registry:
+        lines += metric.render()
+    lines += render_cache_metrics()
+    return Response("\n".join(lines) + "\n", mimetype="text/plain; version=0.0.4")
+
+# Request profiling
+# Off by default. A request is profiled when it carries X-Profile: <PROFILE_ADMIN_TOKEN>, or at random
+# with probability PROFILE_SAMPLE_RATE. Each trace is one JSON file in PROFILE_DIR, named after the
+# endpoint and duration; the oldest are pruned beyond PROFILE_MAX_FILES. Traces hold code paths and
+# request data, so /profiles only serves them to requests carrying the admin token.
+PROFILE_DIR = os.getenv("PROFILE_DIR", "./profiles")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_ADMIN_TOKEN = os.getenv("PROFILE_ADMIN_TOKEN", "")
+PROFILE_MODE = os.getenv("PROFILE_MODE", "sample")  # "sample" (stack sampler) or "cprofile"
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL_MS", "5")) / 1000
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "200"))
+PROFILE_TOP = 50
+
+def is_profile_admin():
+    token = request.headers.get("X-Profile", "")
+    return bool(PROFILE_ADMIN_TOKEN) and hmac.compare_digest(token, PROFILE_ADMIN_TOKEN)
+
+class StackSampler:
+    """
+    One background thread that snapshots the stacks of every thread being profiled every
+    PROFILE_INTERVAL seconds and counts them as folded stacks ("outer;inner;leaf" -> samples).
+    The sampled threads run at full speed; the cost is one sys._current_frames() per tick.
+    """
+    def __init__(self, interval=PROFILE_INTERVAL, max_depth=64):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.lock = threading.Lock()
+        self.active = {}  # thread id -> {folded stack: samples}
+        self.wakeup = threading.Event()
+        self.thread = None
+
+    def start(self, thread_id):
+        with self.lock:
+            self.active[thread_id] = {}
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = Thread(target=self._run, name="profile-sampler", daemon=True)
+                self.thread.start()
+        self.wakeup.set()
+
+    def stop(self, thread_id):
+        with self.lock:
+            return self.active.pop(thread_id, {})
+
+    def _fold(self, frame):
+        names = []
+        while frame is not None and len(names) < self.max_depth:
+            code = frame.f_code
+            names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+            frame = frame.f_back
+        return ";".join(reversed(names))
+
+    def _run(self):
+        while True:
+            with self.lock:
+                thread_ids = list(self.active)
+            if not thread_ids:
+                self.wakeup.clear()
+                self.wakeup.wait()
+                continue
+            frames = sys._current_frames()
+            for thread_id in thread_ids:
+                frame = frames.get(thread_id)
+                if frame is None:
+                    continue
+                stack = self._fold(frame)
+                with self.lock:
+                    counts = self.active.get(thread_id)
+                    if counts is not None:
+                        counts[stack] = counts.get(stack, 0) + 1
+            del frames
+            time.sleep(self.interval)
+
+stack_sampler = StackSampler()
+# cProfile hooks the interpreter globally on newer Pythons, so only one request uses it at a time;
+# others asking for it fall back to the stack sampler
+cprofile_lock = threading.Lock()
+
+def summarize_cprofile(profiler):
+    import pstats
+    stats = pstats.Stats(profiler)
+    rows = []
+    for (filename, line, name), (calls, primitive, tottime, cumtime, _) in stats.stats.items():
+        rows.append({
+            "function": f"{name} ({os.path.basename(filename)}:{line})",
+            "calls": calls,
+            "tottime_ms": round(tottime * 1000, 3),
+            "cumtime_ms": round(cumtime * 1000, 3)
+        })
+    rows.sort(key=lambda row: row["cumtime_ms"], reverse=True)
+    return rows[:PROFILE_TOP]
+
+def write_profile(trace):
+    try:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = os.path.join(PROFILE_DIR, f"{trace['id']}.json")
+        with open(path + ".tmp", "w") as f:
+            json.dump(trace, f)
+        os.replace(path + ".tmp", path)
+        prune_cache_dir(PROFILE_DIR, max_files=PROFILE_MAX_FILES, suffix=".json")
+    except OSError as e:
+        print(f"Could not write profile {trace['id']}: {e}")
+
+@app.before_request
+def start_request_profile():
+    if request.path.startswith("/profiles"):
+        return
+    admin = is_profile_admin()
+    if not admin and (PROFILE_SAMPLE_RATE <= 0 or random.random() >= PROFILE_SAMPLE_RATE):
+        return
+    mode = request.headers.get("X-Profile-Mode", PROFILE_MODE) if admin else PROFILE_MODE
+    profiler = None
+    if mode == "cprofile" and cprofile_lock.acquire(blocking=False):
+        import cProfile
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:  # another profiler (e.g. a debugger) is already active
+            cprofile_lock.release()
+            profiler = None
+    if profiler is None:
+        mode = "sample"
+        stack_sampler.start(threading.get_ident())
+    request.profile = {
+        "mode": mode, "profiler": profiler, "thread_id": threading.get_ident(),
+        "started": time.perf_counter(), "started_at": time.time(), "trigger": "admin" if admin else "sampled"
+    }
+
+@app.after_request
+def finish_request_profile(response):
+    profile = getattr(request, "profile", None)
+    if profile is None:
+        return response
+    request.profile = None
+    if profile["profiler"] is not None:
+        profile["profiler"].disable()
+        cprofile_lock.release()
+        top = summarize_cprofile(profile["profiler"])
+    else:
+        samples = stack_sampler.stop(profile["thread_id"])
+        top = [{"stack": stack, "samples": count}
+               for stack, count in sorted(samples.items(), key=lambda item: item[1], reverse=True)[:PROFILE_TOP]]
+    duration_ms = round((time.perf_counter() - profile["started"]) * 1000, 1)
+    endpoint = getattr(request, "metrics_endpoint", request.path)
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", endpoint).strip("_") or "root"
+    trace_id = f"{int(profile['started_at'] * 1000)}-{slug}-{int(duration_ms)}ms-{uuid.uuid4().hex[:6]}"
+    trace = {
+        "id": trace_id,
+        "endpoint": endpoint,
+        "method": request.method,
+        "status": response.status_code,
+        "duration_ms": duration_ms,
+        "mode": profile["mode"],
+        "trigger": profile["trigger"],
+        "started_at": profile["started_at"],
+        "interval_ms": PROFILE_INTERVAL * 1000 if profile["mode"] == "sample" else None,
+        "top": top
+    }
+    Thread(target=write_profile, args=(trace,), daemon=True).start()
+    response.headers["X-Profile-Id"] = trace_id
+    return response
+
+@app.teardown_request
+def abandon_request_profile(error=None):
+    """Requests that never reach after_request still release the profiler."""
+    profile = getattr(request, "profile", None)
+    if profile is None:
+        return
+    request.profile = None
+    if profile["profiler"] is not None:
+        try:
+            profile["profiler"].disable()
+        finally:
+            cprofile_lock.release()
+    else:
+        stack_sampler.stop(profile["thread_id"])
+
+def require_profile_admin():
+    """The trace endpoints are closed unless PROFILE_ADMIN_TOKEN is configured and sent as X-Profile."""
+    if not PROFILE_ADMIN_TOKEN:
+        return jsonify({"error": "Profiling access is disabled; set PROFILE_ADMIN_TOKEN to enable it"}), 403
+    if not is_profile_admin():
+        return jsonify({"error": "Profiling access requires the X-Profile admin header"}), 403
+    return None
+
+@app.route('/profiles', methods=['GET'])
+def list_profiles():
+    """Slowest recent traces first; ?endpoint= filters, ?limit= caps the list (default 20)."""
+    denied = require_profile_admin()
+    if denied:
+        return denied
+    endpoint = request.args.get("endpoint")
+    limit = request.args.get("limit", default=20, type=int)
+    traces = []
+    if os.path.isdir(PROFILE_DIR):
+        for name in os.listdir(PROFILE_DIR):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(PROFILE_DIR, name)) as f:
+                    trace = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if endpoint and trace.get("endpoint") != endpoint:
+                continue
+            trace.pop("top", None)
+            traces.append(trace)
+    traces.sort(key=lambda trace: trace.get("duration_ms", 0), reverse=True)
+    return jsonify({"profiles": traces[:limit], "total": len(traces)}), 200
+
+@app.route('/profiles/<trace_id>', methods=['GET'])
+def get_profile(trace_id):
+    denied = require_profile_admin()
+    if denied:
+        return denied
+    path = os.path.join(PROFILE_DIR, f"{secure_filename(trace_id)}.json")
+    if not os.path.isfile(path):
+        return jsonify({"error": "Profile not found"}), 404
+    with open(path) as f:
+        return jsonify(json.load(f)), 200
+
+genai = LazyResource("google.generativeai", load_genai)
+
+# LLM client registry
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 4))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", 0.5))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", 20))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", 60))
+LLM_HTTP_MAX_CONNECTIONS = int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", 50))
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL")  # Optional override, e.g. a proxy or a local stand-in
+RETRYABLE_LLM_STATUS = {429, 500, 502, 503, 504}
+RETRYABLE_LLM_ERRORS = {"APIConnectionError", "APITimeoutError", "ServiceUnavailable", "DeadlineExceeded", "InternalServerError"}
+llm_clients = {}
+llm_clients_lock = threading.Lock()
+
+def load_llm_http_client():
+    httpx = import_timed("httpx")
+    return httpx.Client(
+        limits=httpx.Limits(max_connections=LLM_HTTP_MAX_CONNECTIONS, max_keepalive_connections=LLM_HTTP_MAX_CONNECTIONS),
+        timeout=LLM_TIMEOUT
+    )
+
+# Pooled keep-alive connections shared by every Groq client
+llm_http_client = LazyResource("llm_http_client", load_llm_http_client)
+
+def llm_error_status(error):
+    status = getattr(error, "status_code", None) or getattr(error, "code", None)
+    if not isinstance(status, int):
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+def is_retryable_llm_error(error):
+    return llm_error_status(error) in RETRYABLE_LLM_STATUS or type(error).__name__ in RETRYABLE_LLM_ERRORS
+
+def llm_retry_after(error):
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+def call_with_backoff(label, func, *args, **kwargs):
+    """Call `func`, retrying 429/5xx and connection errors with full-jitter exponential backoff."""
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        started = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+            logger.info(f"LLM call {label} took {(time.perf_counter() - started) * 1000:.0f} ms (attempt {attempt + 1})")
+            return result
+        except Exception as e:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            if attempt >= LLM_MAX_RETRIES or not is_retryable_llm_error(e):
+                logger.error(f"LLM call {label} failed after {elapsed_ms:.0f} ms (attempt {attempt + 1}): {str(e)}")
+                raise
+            delay = llm_retry_after(e) or random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** attempt))
+            delay = min(delay, LLM_BACKOFF_MAX)
+            logger.warning(f"LLM call {label} got {llm_error_status(e) or type(e).__name__}, retrying in {delay:.2f}s")
+            time.sleep(delay)
+
+class LLMClient:
+    """
+    Long-lived client for one provider/model/temperature. The underlying client is built on first
+    use and reused by every request; calls go through call_with_backoff.
+    """
+    def __init__(self, provider, model, temperature=0):
+        self.provider = provider
+        self.model = model
+        self.temperature = temperature
+        self.label = f"{provider}/{model}"
+        self._client = LazyResource(f"llm:{self.label}:{temperature}", self._build)
+
+    def _build(self):
+        if self.provider == "groq":
+            from langchain_groq import ChatGroq
+            return ChatGroq(
+                model=self.model,
+                temperature=self.temperature,
+                groq_api_key=os.getenv("GROQ_API_KEY"),
+                base_url=GROQ_BASE_URL,
+                max_retries=0,  # Retries are handled by call_with_backoff
+                http_client=llm_http_client.load()
+            )
+        if self.provider == "gemini":
+            return genai.GenerativeModel(self.model)
+        raise ValueError(f"Unknown LLM provider: {self.provider}")
+
+    def invoke(self, prompt):
+        """LangChain-style call; returns a message with `.content`."""
+        with stage_timer("llm", self.label):
+            return call_with_backoff(self.label, self._client.invoke, prompt)
+
+    def generate_content(self, prompt):
+        """Gemini-style call; returns a response with `.text`."""
+        with stage_timer("llm", self.label):
+            return call_with_backoff(self.label, self._client.generate_content, prompt)
+
+    def _start_stream(self, prompt):
+        if self.provider == "gemini":
+            iterator = iter(self._client.generate_content(prompt, stream=True))
+        else:
+            iterator = iter(self._client.stream(prompt))
+        return next(iterator, None), iterator
+
+    def stream(self, prompt):
+        """Yield raw provider chunks; only opening the stream is retried, never a half-sent answer."""
+        with stage_timer("llm_first_chunk", self.label):
+            first, iterator = call_with_backoff(self.label, self._start_stream, prompt)
+        if first is not None:
+            yield first
+        yield from iterator
+
+def get_llm_client(provider, model, temperature=0):
+    """Return the shared client for (provider, model, temperature), creating it on first use."""
+    key = (provider, model, float(temperature))
+    client = llm_clients.get(key)
+    if client is None:
+        with llm_clients_lock:
+            client = llm_clients.get(key)
+            if client is None:
+                client = LLMClient(provider, model, temperature)
+                llm_clients[key] = client
+    return client
+
+gemini_model = get_llm_client("gemini", "gemini-2.0-flash")  # Use the correct model name
+groq_model = get_llm_client("groq", "llama-3.1-8b-instant", temperature=0)
 os.environ["SERPER_API_KEY"] = "85a684d9cfcddab4886460954ef36f054053529b"
 
+# Caching
+cache_registry = {}
+
+class LRUCache:
+    """
+    Thread-safe, size-bounded in-process LRU with per-entry expiry. on_evict(key, value) is called,
+    outside the lock, for each entry pushed out by the size limit.
+    """
+    def __init__(self, max_size=256, on_evict=None):
+        self.max_size = max_size
+        self.on_evict = on_evict
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at < time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.time() + ttl if ttl else None
+        evicted = []
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                evicted.append(self._data.popitem(last=False))
+        if self.on_evict:
+            for evicted_key, (_, evicted_value) in evicted:
+                self.on_evict(evicted_key, evicted_value)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def __len__(self):
+        return len(self._data)
+
+class TieredCache:
+    """
+    JSON cache with a local LRU in front of Redis.
+    Redis failures are counted and treated as misses so the app keeps working without Redis.
+    """
+    def __init__(self, namespace, ttl, local_size=256):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.local = LRUCache(local_size)
+        self.counters = {"local_hits": 0, "redis_hits": 0, "misses": 0, "sets": 0, "redis_errors": 0}
+        self._counter_lock = threading.Lock()
+        cache_registry[namespace] = self
+
+    def _count(self, name):
+        with self._counter_lock:
+            self.counters[name] += 1
+
+    def key(self, *parts):
+        return ":".join([self.namespace] + [str(part) for part in parts])
+
+    def get(self, key):
+        value = self.local.get(key)
+        if value is not None:
+            self._count("local_hits")
+            return value
+        try:
+            raw = redis_client.get(key)
+        except redis.RedisError as e:
+            self._count("redis_errors")
+            print(f"Redis cache read failed for {key}: {e}")
+            raw = None
+        if raw is not None:
+            value = json.loads(raw)
+            self.local.set(key, value, self.ttl)
+            self._count("redis_hits")
+            return value
+        self._count("misses")
+        return None
+
+    def set(self, key, value):
+        self.local.set(key, value, self.ttl)
+        self._count("sets")
+        try:
+            redis_client.setex(key, self.ttl, json.dumps(value))
+        except redis.RedisError as e:
+            self._count("redis_errors")
+            print(f"Redis cache write failed for {key}: {e}")
+
+    def delete(self, key):
+        self.local.delete(key)
+        try:
+            redis_client.delete(key)
+        except redis.RedisError as e:
+            self._count("redis_errors")
+            print(f"Redis cache delete failed for {key}: {e}")
+
+    def stats(self):
+        with self._counter_lock:
+            counters = dict(self.counters)
+        lookups = counters["local_hits"] + counters["redis_hits"] + counters["misses"]
+        counters["hit_rate"] = round((lookups - counters["misses"]) / lookups, 4) if lookups else 0.0
+        counters["local_entries"] = len(self.local)
+        counters["ttl"] = self.ttl
+        return counters
+
+# Single-flight: identical work that is already running is joined instead of repeated
+SINGLE_FLIGHT_LOCK_TTL = int(os.getenv("SINGLE_FLIGHT_LOCK_TTL", 120))
+SINGLE_FLIGHT_WAIT = float(os.getenv("SINGLE_FLIGHT_WAIT", 120))
+SINGLE_FLIGHT_RESULT_TTL = int(os.getenv("SINGLE_FLIGHT_RESULT_TTL", 30))
+
+class SingleFlight:
+    """
+    Runs work for a key once while it is in flight and hands the result to every concurrent caller.
+    Within a process, later callers wait on the first caller's Future and share its result or exception.
+    Across processes the first caller holds <key>:lock in Redis and publishes its JSON result under
+    <key>:result for result_ttl seconds; callers elsewhere poll for it. When Redis is unavailable, the
+    lock disappears without a result, or wait_timeout passes, a waiting caller runs the work itself.
+    """
+    def __init__(self, namespace, lock_ttl, wait_timeout, result_ttl):
+        self.namespace = namespace
+        self.lock_ttl = lock_ttl
+        self.wait_timeout = wait_timeout
+        self.result_ttl = result_ttl
+        self.calls = {}  # key -> Future of the call running in this process
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "local_waits": 0, "remote_waits": 0, "fallbacks": 0, "redis_errors": 0}
+        self._counter_lock = threading.Lock()
+        cache_registry[namespace] = self
+
+    def _count(self, name):
+        with self._counter_lock:
+            self.counters[name] += 1
+
+    def key(self, *parts):
+        return ":".join([self.namespace] + [str(part) for part in parts])
+
+    def do(self, key, func):
+        with self._lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = Future()
+
+        if not leader:
+            self._count("local_waits")
+            try:
+                result = call.result(timeout=self.wait_timeout)
+            except FuturesTimeoutError:
+                self._count("fallbacks")
+                return self._run(func)
+            self._count("hits")
+            return result
+
+        try:
+            result = self._do_across_processes(key, func)
+        except BaseException as e:
+            call.set_exception(e)
+            raise
+        else:
+            call.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self.calls.pop(key, None)
+
+    def _run(self, func):
+        self._count("misses")
+        return func()
+
+    def _do_across_processes(self, key, func):
+        lock_key, result_key = f"{key}:lock", f"{key}:result"
+        token = uuid.uuid4().hex
+        try:
+            acquired = redis_client.set(lock_key, token, nx=True, ex=self.lock_ttl)
+        except redis.RedisError as e:
+            self._count("redis_errors")
+            print(f"Single-flight lock failed for {key}: {e}")
+            return self._run(func)
+
+        if not acquired:
+            self._count("remote_waits")
+            found, result = self._wait_for_result(lock_key, result_key)
+            if found:
+                self._count("hits")
+                return result
+            self._count("fallbacks")
+            return self._run(func)
+
+        try:
+            result = self._run(func)
+            try:
+                redis_client.setex(result_key, self.result_ttl, json.dumps(result))
+            except (redis.RedisError, TypeError, ValueError) as e:
+                print(f"Single-flight result not shared for {key}: {e}")
+            return result
+        finally:
+            try:
+                if redis_client.get(lock_key) == token:
+                    redis_client.delete(lock_key)
+            except redis.RedisError as e:
+                self._count("redis_errors")
+                print(f"Single-flight unlock failed for {key}: {e}")
+
+    def _wait_for_result(self, lock_key, result_key):
+        """Poll until the leader publishes a result; (False, None) if it gives up, fails or times out."""
+        deadline = time.time() + self.wait_timeout
+        delay = 0.05
+        try:
+            while time.time() < deadline:
+                raw = redis_client.get(result_key)
+                if raw is not None:
+                    return True, json.loads(raw)
+                if not redis_client.exists(lock_key):
+                    raw = redis_client.get(result_key)  # The leader may have finished between the two reads
+                    return (True, json.loads(raw)) if raw is not None else (False, None)
+                time.sleep(delay)
+                delay = min(delay * 2, 0.5)
+        except redis.RedisError as e:
+            self._count("redis_errors")
+            print(f"Single-flight wait failed for {lock_key}: {e}")
+        return False, None
+
+    def stats(self):
+        with self._counter_lock:
+            counters = dict(self.counters)
+        calls = counters["hits"] + counters["misses"]
+        counters["hit_rate"] = round(counters["hits"] / calls, 4) if calls else 0.0
+        with self._lock:
+            counters["in_flight"] = len(self.calls)
+        return counters
+
+single_flight = SingleFlight("singleflight", SINGLE_FLIGHT_LOCK_TTL, SINGLE_FLIGHT_WAIT, SINGLE_FLIGHT_RESULT_TTL)
+
+YOUTUBE_ID_PATTERN = re.compile(r'(?:v=|youtu\.be/|/embed/|/shorts/|/live/)([\w-]{11})')
+
+def normalize_video_id(youtube_url):
+    """Reduce any YouTube URL (watch, youtu.be, embed, shorts, extra query params) to its video id."""
+    youtube_url = (youtube_url or "").strip()
+    match = YOUTUBE_ID_PATTERN.search(youtube_url)
+    if match:
+        return match.group(1)
+    return youtube_url.split('v=')[-1].split('&')[0]
+
+raw_transcript_cache = TieredCache(
+    "transcript:raw",
+    ttl=int(os.getenv("TRANSCRIPT_CACHE_TTL", 7 * 24 * 3600)),
+    local_size=int(os.getenv("TRANSCRIPT_CACHE_LOCAL_SIZE", 128))
+)
+enhanced_transcript_cache = TieredCache(
+    "transcript:enhanced",
+    ttl=int(os.getenv("ENHANCED_TRANSCRIPT_CACHE_TTL", 7 * 24 * 3600)),
+    local_size=int(os.getenv("TRANSCRIPT_CACHE_LOCAL_SIZE", 128))
+)
+
+def fetch_raw_transcript(video_id):
+    """Fetch the raw transcript text and its language, trying Hindi first, then English."""
+    cache_key = raw_transcript_cache.key(video_id)
+    cached = raw_transcript_cache.get(cache_key)
+    if cached:
+        return cached["text"], cached["language"]
+
+    for lang in ['hi', 'en']:
+        try:
+            with stage_timer("transcript_fetch", lang):
+                transcript = YouTubeTranscriptApi().fetch(video_id, languages=[lang])
+        except:
+            continue
+        if transcript:
+            formatted_transcript = "\n".join([entry['text'] for entry in transcript])
+            raw_transcript_cache.set(cache_key, {"text": formatted_transcript, "language": lang})
+            return formatted_transcript, lang
+
+    return None, None
+
+def build_enhance_prompt(transcript):
+    # Enhanced transcript prompt
+    return f"""
+        Act as a transcript cleaner. Generate a new transcript with the same context and content as the given transcript.
+        If there's a revision portion, differentiate it from the actual transcript.
+        Output in sentences line by line. If the transcript lacks educational content, return 'Fake transcript'.
+        Transcript: {transcript}
+        """
+
 def get_and_enhance_transcript(youtube_url, model_type='gemini'):
+    """Concurrent requests for the same video and model share one fetch and cleanup."""
+    flight_key = single_flight.key("transcript", normalize_video_id(youtube_url), model_type.lower())
+    transcript, language = single_flight.do(flight_key, lambda: _get_and_enhance_transcript(youtube_url, model_type))
+    return transcript, language
+
+def _get_and_enhance_transcript(youtube_url, model_type='gemini'):
+    try:
+        video_id = normalize_video_id(youtube_url)
+        formatted_transcript, language = fetch_raw_transcript(video_id)
+
+        if not formatted_transcript:
+            return None, None
+
+        # The enhanced transcript is addressed by the raw content it was generated from,
+        # so re-published captions never serve a stale cleanup.
+        content_hash = hashlib.sha256(formatted_transcript.encode('utf-8')).hexdigest()[:16]
+        cache_key = enhanced_transcript_cache.key(video_id, language, model_type.lower(), content_hash)
+        cached = enhanced_transcript_cache.get(cache_key)
+        if cached:
+            return cached, language
+
+        if is_long_transcript(formatted_transcript):
+            enhanced_transcript = enhance_long_transcript(formatted_transcript, model_type)
+            if enhanced_transcript:
+                enhanced_transcript_cache.set(cache_key, enhanced_transcript)
+            return enhanced_transcript, language
+
+        enhanced_transcript = invoke_llm(build_enhance_prompt(formatted_transcript), model_type)
+
+        if enhanced_transcript:
+            enhanced_transcript_cache.set(cache_key, enhanced_transcript)
+        return enhanced_transcript, language
+    except Exception as e:
+        print(f"Error in get_and_enhance_transcript: {str(e)}")
+        return None, None
+
+def build_summary_and_quiz_prompt(transcript, num_questions, difficulty):
+    return f"""
+        Summarize the following transcript by identifying the key topics covered, and provide a detailed summary of each topic in 6-7 sentences.
+        Each topic should be labeled clearly as "Topic X", where X is the topic name. Provide the full summary for each topic in English, even if the transcript is in a different language.
+        Strictly ensure that possessives (e.g., John's book) and contractions (e.g., don't) use apostrophes (') instead of quotation marks (" or "  ").
+
+        If the transcript contains 'Fake Transcript', do not generate any quiz or summary.
+
+        After the summary, give the name of the topic on which the transcript was all about in a maximum of 2 to 3 words.
+        After summarizing, create a quiz with {num_questions} multiple-choice questions in English, based on the transcript content.
+        Only generate {difficulty} difficulty questions. Format the output in JSON format as follows, just give the JSON as output, nothing before it:
+
+        {{
+            "summary": {{
+                "topic1": "value1",
+                "topic2": "value2",
+                "topic3": "value3"
+            }},
+            "questions": {{
+                "{difficulty}": [
+                    {{
+                        "question": "What is the capital of France?",
+                        "options": ["Paris", "London", "Berlin", "Madrid"],
+                        "answer": "Paris"
+                    }},
+                    {{
+                        "question": "What is the capital of Germany?",
+                        "options": ["Paris", "London", "Berlin", "Madrid"],
+                        "answer": "Berlin"
+                    }}
+                ]
+            }}
+        }}
+
+        Transcript: {transcript}
+        """
+
+def extract_json_response(response_content):
+    with stage_timer("json_parse"):
+        return _extract_json_response(response_content)
+
+def _extract_json_response(response_content):
+    # Extract JSON from response
+    json_match = re.search(r'\{.*\}', response_content, re.DOTALL)
+    if json_match:
+        json_str = json_match.group(0)
+        try:
+            return json.loads(json_str)
+        except json.JSONDecodeError as e:
+            print(f"JSONDecodeError: {e}, Raw response: {response_content}")
+            return None
+    else:
+        print(f"No valid JSON found in response: {response_content}")
+        return None
+
+def invoke_llm(prompt, model_type):
+    """Run a prompt on the selected model and return the response text."""
+    if model_type.lower() == 'chatgroq':
+        response = groq_model.invoke(prompt)
+        return response.content if hasattr(response, 'content') else str(response)
+    # Default to gemini
+    response = gemini_model.generate_content(prompt)
+    return response.text if hasattr(response, 'text') else str(response)
+
+def generate_summary_and_quiz(transcript, num_questions, language, difficulty, model_type='gemini'):
+    try:
+        if 'Fake transcript' in transcript:
+            return {"summary": {}, "questions": {difficulty: []}}
+
+        if is_long_transcript(transcript):
+            return generate_summary_and_quiz_map_reduce(transcript, num_questions, language, difficulty, model_type)
+
+        prompt = build_summary_and_quiz_prompt(transcript, num_questions, difficulty)
+        return extract_json_response(invoke_llm(prompt, model_type))
+    except Exception as e:
+        print(f"Error in generate_summary_and_quiz: {str(e)}")
+        return None
+
+# Parallel summary/quiz generation
+QUIZ_GENERATION_MODE = os.getenv("QUIZ_GENERATION_MODE", "single")  # 'single' or 'parallel'
+QUIZ_BATCH_SIZE = int(os.getenv("QUIZ_BATCH_SIZE", 5))
+QUIZ_PART_RETRIES = int(os.getenv("QUIZ_PART_RETRIES", 2))
+llm_pool = ContextThreadPoolExecutor(max_workers=int(os.getenv("LLM_POOL_SIZE", 8)), thread_name_prefix="llm")
+
+def build_summary_prompt(transcript):
+    return f"""
+        Summarize the following transcript by identifying the key topics covered, and provide a detailed summary of each topic in 6-7 sentences.
+        Each topic should be labeled clearly as "Topic X", where X is the topic name. Provide the full summary for each topic in English, even if the transcript is in a different language.
+        Strictly ensure that possessives (e.g., John's book) and contractions (e.g., don't) use apostrophes (') instead of quotation marks (" or "  ").
+        Format the output in JSON format as follows, just give the JSON as output, nothing before it:
+
+        {{
+            "summary": {{
+                "topic1": "value1",
+                "topic2": "value2"
+            }}
+        }}
+
+        Transcript: {transcript}
+        """
+
+def build_question_batch_prompt(transcript, num_questions, difficulty, part=1, total_parts=1):
+    focus = (
+        f"This is part {part} of {total_parts} of a longer quiz, so focus on section {part} of {total_parts} of the transcript."
+        if total_parts > 1 else ""
+    )
+    return f"""
+        Create a quiz with {num_questions} multiple-choice questions in English, based on the transcript content.
+        {focus}
+        Only generate {difficulty} difficulty questions. The answer must be exactly one of the options.
+        Format the output in JSON format as follows, just give the JSON as output, nothing before it:
+
+        {{
+            "questions": [
+                {{
+                    "question": "What is the capital of France?",
+                    "options": ["Paris", "London", "Berlin", "Madrid"],
+                    "answer": "Paris"
+                }}
+            ]
+        }}
+
+        Transcript: {transcript}
+        """
+
+def split_into_batches(total, batch_size):
+    """Split `total` items into batch sizes of at most `batch_size`, e.g. 12, 5 -> [5, 5, 2]."""
+    return [min(batch_size, total - start) for start in range(0, total, batch_size)]
+
+def validate_summary(parsed):
+    summary = parsed.get("summary")
+    return summary if isinstance(summary, dict) and summary else None
+
+def validate_questions(parsed):
+    questions = parsed.get("questions")
+    if isinstance(questions, dict):  # Tolerate the {"<difficulty>": [...]} shape
+        questions = next(iter(questions.values()), None)
+    if not isinstance(questions, list):
+        return None
+    valid = [
+        q for q in questions
+        if isinstance(q, dict) and q.get("question")
+        and isinstance(q.get("options"), list) and q.get("answer") in q["options"]
+    ]
+    return valid or None
+
+def generate_part(prompt, model_type, validate, retries=QUIZ_PART_RETRIES):
+    """Generate one part of a quiz, regenerating only this part while its output is malformed."""
+    for attempt in range(retries + 1):
+        try:
+            parsed = extract_json_response(invoke_llm(prompt, model_type))
+            result = validate(parsed) if isinstance(parsed, dict) else None
+            if result is not None:
+                return result
+        except Exception as e:
+            print(f"Error in generate_part (attempt {attempt + 1}): {str(e)}")
+    return None
+
+def merge_question_batches(batches, num_questions):
+    questions = []
+    seen = set()
+    for batch in batches:
+        for question in batch or []:
+            key = question["question"].strip().lower()
+            if key not in seen:
+                seen.add(key)
+                questions.append(question)
+    return questions[:num_questions]
+
+def generate_summary_and_quiz_parallel(transcript, num_questions, language, difficulty, model_type='gemini'):
+    """Same result shape as generate_summary_and_quiz, with the summary and each question batch generated concurrently."""
     try:
-        video_id = youtube_url.split('v=')[-1]
-        transcript = None
-        language = None
+        if 'Fake transcript' in transcript:
+            return {"summary": {}, "questions": {difficulty: []}}
+
+        if is_long_transcript(transcript):
+            return generate_summary_and_quiz_map_reduce(transcript, num_questions, language, difficulty, model_type)
+
+        batch_sizes = split_into_batches(num_questions, QUIZ_BATCH_SIZE)
+        summary_future = llm_pool.submit(generate_part, build_summary_prompt(transcript), model_type, validate_summary)
+        question_futures = [
+            llm_pool.submit(
+                generate_part,
+                build_question_batch_prompt(transcript, size, difficulty, part, len(batch_sizes)),
+                model_type,
+                validate_questions
+            )
+            for part, size in enumerate(batch_sizes, 1)
+        ]
+
+        summary = summary_future.result()
+        questions = merge_question_batches([future.result() for future in question_futures], num_questions)
+        if summary is None and not questions:
+            return None
+
+        return {"summary": summary or {}, "questions": {difficulty: questions}}
+    except Exception as e:
+        print(f"Error in generate_summary_and_quiz_parallel: {str(e)}")
+        return None
+
+# Long transcripts (map-reduce)
+LONG_TRANSCRIPT_TOKENS = int(os.getenv("LONG_TRANSCRIPT_TOKENS", 8000))
+TRANSCRIPT_CHUNK_TOKENS = int(os.getenv("TRANSCRIPT_CHUNK_TOKENS", 4000))
+TRANSCRIPT_CHUNK_OVERLAP_TOKENS = int(os.getenv("TRANSCRIPT_CHUNK_OVERLAP_TOKENS", 200))
+
+def estimate_tokens(text):
+    """Approximate LLM token count: ~4 characters per token, or ~1.3 tokens per word for denser scripts."""
+    return max(len(text) // 4, int(len(text.split()) * 1.3))
+
+def is_long_transcript(transcript):
+    return estimate_tokens(transcript) > LONG_TRANSCRIPT_TOKENS
+
+def split_transcript(transcript, chunk_tokens=TRANSCRIPT_CHUNK_TOKENS, overlap_tokens=TRANSCRIPT_CHUNK_OVERLAP_TOKENS):
+    """Split a transcript into token-bounded segments on line/sentence boundaries."""
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_tokens,
+        chunk_overlap=overlap_tokens,
+        length_function=estimate_tokens,
+        separators=["\n\n", "\n", ". ", " ", ""]
+    )
+    return splitter.split_text(transcript)
+
+def enhance_long_transcript(transcript, model_type):
+    # Segments don't overlap here, otherwise the joined transcript would repeat text
+    segments = split_transcript(transcript, overlap_tokens=0)
+    futures = [llm_pool.submit(invoke_llm, build_enhance_prompt(segment), model_type) for segment in segments]
+    enhanced = [future.result() for future in futures]
+    educational = [text for text in enhanced if text and 'Fake transcript' not in text]
+    if not educational:
+        return 'Fake transcript'
+    return "\n".join(educational)
+
+def distribute_questions(num_questions, num_segments):
+    """Spread questions as evenly as possible over segments, e.g. 10 over 3 -> [4, 3, 3]."""
+    base, extra = divmod(num_questions, num_segments)
+    return [base + (1 if i < extra else 0) for i in range(num_segments)]
+
+def build_segment_summary_prompt(segment, part, total_parts):
+    return f"""
+        The following is segment {part} of {total_parts} of a longer lecture transcript.
+        Identify the key topics covered in this segment and summarize each topic in 3-4 sentences in English, even if the transcript is in a different language.
+        Strictly ensure that possessives (e.g., John's book) and contractions (e.g., don't) use apostrophes (') instead of quotation marks (" or "  ").
+        Format the output in JSON format as follows, just give the JSON as output, nothing before it:
+
+        {{
+            "summary": {{
+                "topic1": "value1",
+                "topic2": "value2"
+            }}
+        }}
+
+        Transcript segment: {segment}
+        """
+
+def build_reduce_summary_prompt(segment_summaries):
+    return f"""
+        The following are topic summaries of consecutive segments of one lecture, in order.
+        Merge them into the final list of key topics covered by the whole lecture, combining topics that repeat across segments,
+        and provide a detailed summary of each topic in 6-7 sentences in English.
+        Strictly ensure that possessives (e.g., John's book) and contractions (e.g., don't) use apostrophes (') instead of quotation marks (" or "  ").
+        Format the output in JSON format as follows, just give the JSON as output, nothing before it:
+
+        {{
+            "summary": {{
+                "topic1": "value1",
+                "topic2": "value2"
+            }}
+        }}
+
+        Segment summaries: {json.dumps(segment_summaries)}
+        """
+
+def generate_summary_and_quiz_map_reduce(transcript, num_questions, language, difficulty, model_type='gemini'):
+    """
+    Summarize each transcript segment in parallel and reduce the segment summaries into one,
+    spreading the quiz questions across segments. Returns the same shape as generate_summary_and_quiz.
+    """
+    segments = split_transcript(transcript)
+    summary_futures = [
+        llm_pool.submit(generate_part, build_segment_summary_prompt(segment, part, len(segments)), model_type, validate_summary)
+        for part, segment in enumerate(segments, 1)
+    ]
+    question_futures = [
+        llm_pool.submit(generate_part, build_question_batch_prompt(segment, count, difficulty), model_type, validate_questions)
+        for segment, count in zip(segments, distribute_questions(num_questions, len(segments)))
+        if count > 0
+    ]
+
+    segment_summaries = [summary for summary in (future.result() for future in summary_futures) if summary]
+    if len(segment_summaries) > 1:
+        summary = generate_part(build_reduce_summary_prompt(segment_summaries), model_type, validate_summary)
+        if summary is None:  # Fall back to the concatenated segment summaries
+            summary = {topic: text for segment_summary in segment_summaries for topic, text in segment_summary.items()}
+    else:
+        summary = segment_summaries[0] if segment_summaries else None
+
+    questions = merge_question_batches([future.result() for future in question_futures], num_questions)
+    if summary is None and not questions:
+        return None
+
+    return {"summary": summary or {}, "questions": {difficulty: questions}}
+
+# Streaming (Server-Sent Events)
+def wants_event_stream():
+    """Clients opt into streaming with `Accept: text/event-stream` or `"stream": true` in the JSON body."""
+    if 'text/event-stream' in request.headers.get('Accept', ''):
+        return True
+    data = request.get_json(silent=True) or {}
+    return isinstance(data, dict) and bool(data.get('stream'))
+
+def format_sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def sse_response(events):
+    return Response(
+        stream_with_context(events),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+def stream_llm(prompt, model_type):
+    """Yield text chunks from the selected model as soon as they are produced."""
+    if model_type.lower() == 'chatgroq':
+        for chunk in groq_model.stream(prompt):
+            if chunk.content:
+                yield chunk.content
+    else:  # Default to gemini
+        for chunk in gemini_model.stream(prompt):
+            try:
+                text = chunk.text
+            except ValueError:  # Chunk without text parts (e.g. a safety stop)
+                continue
+            if text:
+                yield text
+
+class QuizStreamParser:
+    """
+    Pulls summary topics and quiz questions out of a partially streamed
+    summary/quiz JSON document, emitting each one as soon as it is complete.
+    """
+    SUMMARY_START = re.compile(r'"summary"\s*:\s*\{')
+    QUESTIONS_START = re.compile(r'"questions"\s*:\s*\{\s*"[^"]*"\s*:\s*\[')
+
+    def __init__(self):
+        self.buffer = ""
+        self.decoder = json.JSONDecoder()
+        self.summary_pos = None
+        self.questions_pos = None
+        self.summary_done = False
+        self.questions_done = False
+        self.question_count = 0
+
+    def feed(self, text):
+        self.buffer += text
+        return self._parse_summary() + self._parse_questions()
+
+    def _skip(self, pos, chars=' \t\r\n,'):
+        while pos < len(self.buffer) and self.buffer[pos] in chars:
+            pos += 1
+        return pos
+
+    def _parse_summary(self):
+        events = []
+        if self.summary_done:
+            return events
+        if self.summary_pos is None:
+            match = self.SUMMARY_START.search(self.buffer)
+            if not match:
+                return events
+            self.summary_pos = match.end()
+
+        while True:
+            pos = self._skip(self.summary_pos)
+            if pos >= len(self.buffer):
+                return events
+            if self.buffer[pos] == '}':
+                self.summary_done = True
+                return events
+            try:
+                topic, pos = self.decoder.raw_decode(self.buffer, pos)
+                pos = self._skip(pos, ' \t\r\n')
+                if pos >= len(self.buffer):
+                    return events
+                if self.buffer[pos] != ':':
+                    self.summary_done = True  # Malformed; leave it to the final parse
+                    return events
+                pos = self._skip(pos + 1, ' \t\r\n')
+                summary, pos = self.decoder.raw_decode(self.buffer, pos)
+            except json.JSONDecodeError:
+                return events  # Incomplete value, wait for more tokens
+            self.summary_pos = pos
+            events.append(("topic", {"topic": topic, "summary": summary}))
+
+    def _parse_questions(self):
+        events = []
+        if self.questions_done:
+            return events
+        if self.questions_pos is None:
+            match = self.QUESTIONS_START.search(self.buffer)
+            if not match:
+                return events
+            self.questions_pos = match.end()
+
+        while True:
+            pos = self._skip(self.questions_pos)
+            if pos >= len(self.buffer):
+                return events
+            if self.buffer[pos] == ']':
+                self.questions_done = True
+                return events
+            try:
+                question, pos = self.decoder.raw_decode(self.buffer, pos)
+            except json.JSONDecodeError:
+                return events
+            self.questions_pos = pos
+            if isinstance(question, dict):
+                self.question_count += 1
+                events.append(("question", {"index": self.question_count, **question}))
+
+def stream_summary_and_quiz(youtube_link, num_questions, difficulty, model_type):
+    yield format_sse("status", {"stage": "transcript"})
+    transcript, language = get_and_enhance_transcript(youtube_link, model_type)
+    if not transcript:
+        yield format_sse("error", {"error": "Failed to fetch transcript"})
+        return
+    if 'Fake transcript' in transcript:
+        yield format_sse("done", {"summary": {}, "questions": {difficulty: []}})
+        return
+
+    yield format_sse("status", {"stage": "generating", "language": language})
+    if is_long_transcript(transcript):
+        # Map-reduce output isn't a single token stream; emit each part once the merge is done
+        summary_and_quiz = generate_summary_and_quiz_map_reduce(transcript, num_questions, language, difficulty, model_type)
+        if not summary_and_quiz:
+            yield format_sse("error", {"error": "Failed to generate quiz"})
+            return
+        for topic, summary in summary_and_quiz["summary"].items():
+            yield format_sse("topic", {"topic": topic, "summary": summary})
+        for index, question in enumerate(summary_and_quiz["questions"][difficulty], 1):
+            yield format_sse("question", {"index": index, **question})
+        yield format_sse("done", summary_and_quiz)
+        return
+
+    parser = QuizStreamParser()
+    chunks = []
+    try:
+        for text in stream_llm(build_summary_and_quiz_prompt(transcript, num_questions, difficulty), model_type):
+            chunks.append(text)
+            for event, payload in parser.feed(text):
+                yield format_sse(event, payload)
+    except Exception as e:
+        print(f"Error in stream_summary_and_quiz: {str(e)}")
+        yield format_sse("error", {"error": "Failed to generate quiz"})
+        return
+
+    summary_and_quiz = extract_json_response("".join(chunks))
+    if summary_and_quiz:
+        yield format_sse("done", summary_and_quiz)
+    else:
+        yield format_sse("error", {"error": "Failed to generate quiz"})
+
+# Background jobs
+JOB_STORE = os.getenv("JOB_STORE", "redis")  # 'redis' or 'memory'
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 4))
+JOB_RESULT_TTL = int(os.getenv("JOB_RESULT_TTL", 3600))
+# Per-type concurrency limits, e.g. "paper=2,question_bank=1"; unlisted types may use every worker
+JOB_LIMITS = {
+    name.strip(): int(limit)
+    for name, limit in (item.split("=") for item in os.getenv("JOB_LIMITS", "paper=2").split(",") if "=" in item)
+}
+
+class JobError(Exception):
+    """Raised by job handlers for expected failures; the status is used for the HTTP response."""
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+class InMemoryJobStore:
+    """Process-local job store with the same interface as RedisJobStore, for tests and single-process runs."""
+    def __init__(self):
+        self._jobs = {}
+        self._dedupe = {}
+        self._lock = threading.Lock()
+
+    def _expired(self, expires_at):
+        return expires_at is not None and expires_at < time.time()
+
+    def save(self, job, ttl):
+        with self._lock:
+            self._jobs[job["id"]] = (time.time() + ttl, dict(job))
+
+    def get(self, job_id):
+        with self._lock:
+            entry = self._jobs.get(job_id)
+            if entry is None or self._expired(entry[0]):
+                self._jobs.pop(job_id, None)
+                return None
+            return dict(entry[1])
+
+    def claim(self, dedupe_key, job_id, ttl):
+        """Bind dedupe_key to job_id unless a live job already holds it; returns the holder's id or None."""
+        with self._lock:
+            entry = self._dedupe.get(dedupe_key)
+            if entry is not None and not self._expired(entry[0]):
+                return entry[1]
+            self._dedupe[dedupe_key] = (time.time() + ttl, job_id)
+            return None
+
+    def release(self, dedupe_key):
+        with self._lock:
+            self._dedupe.pop(dedupe_key, None)
+
+class RedisJobStore:
+    """Jobs stored as JSON under job:<id> so any worker process can answer polls."""
+    def __init__(self, client, prefix="job"):
+        self.client = client
+        self.prefix = prefix
+
+    def save(self, job, ttl):
+        self.client.setex(f"{self.prefix}:{job['id']}", ttl, json.dumps(job))
+
+    def get(self, job_id):
+        raw = self.client.get(f"{self.prefix}:{job_id}")
+        return json.loads(raw) if raw else None
+
+    def claim(self, dedupe_key, job_id, ttl):
+        key = f"{self.prefix}:dedupe:{dedupe_key}"
+        if self.client.set(key, job_id, nx=True, ex=ttl):
+            return None
+        return self.client.get(key)
+
+    def release(self, dedupe_key):
+        self.client.delete(f"{self.prefix}:dedupe:{dedupe_key}")
+
+class JobManager:
+    """
+    Runs registered handlers on a local worker pool and records their state in a job store.
+    Handlers are called as handler(params, progress) and return a JSON-serialisable result;
+    progress(fraction, message=None) reports how far along they are.
+    """
+    def __init__(self, store, workers=JOB_WORKERS, limits=None, result_ttl=JOB_RESULT_TTL):
+        self.store = store
+        self.executor = ContextThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self.workers = workers
+        self.limits = limits or {}
+        self.result_ttl = result_ttl
+        self.handlers = {}
+        self.running = {}
+        self.pending = {}
+        self._lock = threading.Lock()
+
+    def register(self, job_type, handler):
+        self.handlers[job_type] = handler
+
+    def submit(self, job_type, params, dedupe=True):
+        """Queue a job and return its record; identical live submissions return the existing job."""
+        if job_type not in self.handlers:
+            raise JobError(f"Unknown job type: {job_type}", 400)
+        job_id = uuid.uuid4().hex
+        dedupe_key = None
+        if dedupe:
+            dedupe_key = hashlib.sha256(f"{job_type}:{json.dumps(params, sort_keys=True)}".encode("utf-8")).hexdigest()
+            existing_id = self.store.claim(dedupe_key, job_id, self.result_ttl)
+            existing = self.store.get(existing_id) if existing_id else None
+            if existing is not None:
+                return existing
+            if existing_id:
+                # The job behind a stale claim has expired; take the key over
+                self.store.release(dedupe_key)
+                self.store.claim(dedupe_key, job_id, self.result_ttl)
+
+        job = {
+            "id": job_id,
+            "type": job_type,
+            "status": "queued",
+            "progress": 0.0,
+            "message": None,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "dedupe_key": dedupe_key,
+            "result": None,
+            "error": None,
+            "error_status": None
+        }
+        self.store.save(job, self.result_ttl)
+        with self._lock:
+            if self.running.get(job_type, 0) < self.limits.get(job_type, self.workers):
+                self.running[job_type] = self.running.get(job_type, 0) + 1
+                self.executor.submit(self._run, job, params)
+            else:
+                self.pending.setdefault(job_type, deque()).append((job, params))
+        return job
+
+    def get(self, job_id):
+        return self.store.get(job_id)
+
+    def _run(self, job, params):
+        job_type = job["type"]
+        current_endpoint.set(f"job:{job_type}")
+        try:
+            job.update(status="running", started_at=time.time())
+            self.store.save(job, self.result_ttl)
+
+            def progress(fraction, message=None):
+                job.update(progress=round(min(max(fraction, 0.0), 1.0), 3), message=message)
+                self.store.save(job, self.result_ttl)
 
-        # Fetch transcript
-        for lang in ['hi', 'en']:
             try:
-                transcript = YouTubeTranscriptApi().fetch(video_id, languages=[lang])
-                language = lang
-                break
-            except:
-                continue
+                result = self.handlers[job_type](params, progress)
+                job.update(status="succeeded", progress=1.0, result=result)
+            except JobError as e:
+                job.update(status="failed", error=e.message, error_status=e.status)
+            except Exception as e:
+                logger.error(f"Job {job['id']} ({job_type}) failed: {str(e)}")
+                job.update(status="failed", error=str(e), error_status=500)
+            job["finished_at"] = time.time()
+            if job["status"] == "failed" and job["dedupe_key"]:
+                self.store.release(job["dedupe_key"])  # Let the same request be retried
+            self.store.save(job, self.result_ttl)
+            logger.info(f"Job {job['id']} ({job_type}) {job['status']} in {job['finished_at'] - job['started_at']:.2f}s")
+        except Exception as e:
+            logger.error(f"Job store error for {job['id']}: {str(e)}")
+        finally:
+            self._dispatch_next(job_type)
 
-        if not transcript:
-            return None, None
+    def _dispatch_next(self, job_type):
+        with self._lock:
+            queued = self.pending.get(job_type)
+            if queued:
+                self.executor.submit(self._run, *queued.popleft())
+            else:
+                self.running[job_type] -= 1
 
-        formatted_transcript = "\n".join([entry['text'] for entry in transcript])
+    def stats(self):
+        with self._lock:
+            return {
+                "running": dict(self.running),
+                "pending": {job_type: len(queued) for job_type, queued in self.pending.items()},
+                "limits": {job_type: self.limits.get(job_type, self.workers) for job_type in self.handlers}
+            }
 
-        # Enhanced transcript prompt
-        prompt = f"""
-        Act as a transcript cleaner. Generate a new transcript with the same context and content as the given transcript.
-        If there's a revision portion, differentiate it from the actual transcript.
-        Output in sentences line by line. If the transcript lacks educational content, return 'Fake transcript'.
-        Transcript: {formatted_transcript}
-        """
+job_manager = JobManager(
+    InMemoryJobStore() if JOB_STORE == "memory" else RedisJobStore(redis_client),
+    workers=JOB_WORKERS,
+    limits=JOB_LIMITS
+)
 
-        if model_type.lower() == 'chatgroq':
-            response = groq_model.invoke(prompt)
-            enhanced_transcript = response.content if hasattr(response, 'content') else str(response)
-        else:  # Default to gemini
-            google_api_key = os.getenv("GENAI_API_KEY")
-            genai.configure(api_key=google_api_key)
-            gemini_model = genai.GenerativeModel('gemini-2.0-flash') 
-            response = gemini_model.generate_content(prompt)
-            enhanced_transcript = response.text if hasattr(response, 'text') else str(response)
-        
-        return enhanced_transcript, language
-    except Exception as e:
-        print(f"Error in get_and_enhance_transcript: {str(e)}")
-        return None, None
+def wants_async():
+    """Clients opt into a background job with `Prefer: respond-async`, `?async=1` or `"async": true` in the JSON body."""
+    if 'respond-async' in request.headers.get('Prefer', ''):
+        return True
+    if request.args.get('async', '').lower() in ('1', 'true', 'yes'):
+        return True
+    data = request.get_json(silent=True) or {}
+    return isinstance(data, dict) and bool(data.get('async'))
 
-def generate_summary_and_quiz(transcript, num_questions, language, difficulty, model_type='gemini'):
+def public_job(job):
+    """Job record as returned to clients; the result is only served by the result endpoint."""
+    view = {key: value for key, value in job.items() if key not in ("result", "dedupe_key")}
+    view["status_url"] = f"/jobs/{job['id']}"
+    view["result_url"] = f"/jobs/{job['id']}/result"
+    return view
+
+def job_accepted_response(job_type, params):
     try:
-        if 'Fake transcript' in transcript:
-            return {"summary": {}, "questions": {difficulty: []}}
+        job = job_manager.submit(job_type, params)
+    except JobError as e:
+        return jsonify({"error": e.message}), e.status
+    except redis.RedisError as e:
+        logger.error(f"Job store unavailable, could not queue {job_type}: {str(e)}")
+        return jsonify({"error": "Background jobs are temporarily unavailable"}), 503
+    response = jsonify(public_job(job))
+    response.status_code = 202
+    response.headers["Location"] = f"/jobs/{job['id']}"
+    return response
 
-        prompt = f"""
-        Summarize the following transcript by identifying the key topics covered, and provide a detailed summary of each topic in 6-7 sentences.
-        Each topic should be labeled clearly as "Topic X", where X is the topic name. Provide the full summary for each topic in English, even if the transcript is in a different language.
-        Strictly ensure that possessives (e.g., John's book) and contractions (e.g., don't) use apostrophes (') instead of quotation marks (" or "  ").
+def respond_sync(handler, params):
+    """Run a job handler inside the request, mapping JobError to the endpoint's usual error response."""
+    try:
+        return jsonify(handler(params, lambda fraction, message=None: None))
+    except JobError as e:
+        return jsonify({"error": e.message}), e.status
 
-        If the transcript contains 'Fake Transcript', do not generate any quiz or summary.
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({"error": "Request body must be a JSON object"}), 400
+    job_type = data.get("type")
+    params = data.get("params") or {}
+    if not job_type or not isinstance(params, dict):
+        return jsonify({"error": "'type' and an object 'params' are required"}), 400
+    return job_accepted_response(job_type, params)
 
-        After the summary, give the name of the topic on which the transcript was all about in a maximum of 2 to 3 words.
-        After summarizing, create a quiz with {num_questions} multiple-choice questions in English, based on the transcript content.
-        Only generate {difficulty} difficulty questions. Format the output in JSON format as follows, just give the JSON as output, nothing before it:
+def lookup_job(job_id):
+    """Return (job, None), or (None, error response) when the job is unknown or the store is down."""
+    try:
+        job = job_manager.get(job_id)
+    except redis.RedisError as e:
+        logger.error(f"Job store unavailable, could not read job {job_id}: {str(e)}")
+        return None, (jsonify({"error": "Background jobs are temporarily unavailable"}), 503)
+    if job is None:
+        return None, (jsonify({"error": "Job not found or expired"}), 404)
+    return job, None
 
-        {{
-            "summary": {{
-                "topic1": "value1",
-                "topic2": "value2",
-                "topic3": "value3"
-            }},
-            "questions": {{
-                "{difficulty}": [
-                    {{
-                        "question": "What is the capital of France?",
-                        "options": ["Paris", "London", "Berlin", "Madrid"],
-                        "answer": "Paris"
-                    }},
-                    {{
-                        "question": "What is the capital of Germany?",
-                        "options": ["Paris", "London", "Berlin", "Madrid"],
-                        "answer": "Berlin"
-                    }}
-                ]
-            }}
-        }}
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job, error = lookup_job(job_id)
+    if error:
+        return error
+    return jsonify(public_job(job))
 
-        Transcript: {transcript}
-        """
+@app.route('/jobs/<job_id>/result', methods=['GET'])
+def get_job_result(job_id):
+    job, error = lookup_job(job_id)
+    if error:
+        return error
+    if job["status"] == "failed":
+        return jsonify({"error": job["error"]}), job["error_status"] or 500
+    if job["status"] != "succeeded":
+        return jsonify(public_job(job)), 202
+    return jsonify(job["result"])
 
-        if model_type.lower() == 'chatgroq':
-            response = groq_model.invoke(prompt)
-            response_content = response.content if hasattr(response, 'content') else str(response)
-        else:  # Default to gemini
-            response = gemini_model.generate_content(prompt)
-            response_content = response.text if hasattr(response, 'text') else str(response)
-
-        # Extract JSON from response
-        json_match = re.search(r'\{.*\}', response_content, re.DOTALL)
-        if json_match:
-            json_str = json_match.group(0)
-            try:
-                return json.loads(json_str)
-            except json.JSONDecodeError as e:
-                print(f"JSONDecodeError: {e}, Raw response: {response_content}")
-                return None
-        else:
-            print(f"No valid JSON found in response: {response_content}")
-            return None
-    except Exception as e:
-        print(f"Error in generate_summary_and_quiz: {str(e)}")
-        return None
+@app.route('/job_stats', methods=['GET'])
+def job_stats():
+    return jsonify(job_manager.stats())
 
 @app.route('/quiz', methods=['POST', 'OPTIONS'])
 def quiz():
     if request.method == 'OPTIONS':
         return jsonify({'status': 'ok'}), 200
 
-    data = request.json
-    youtube_link = data.get('link')
-    num_questions = int(data.get('qno', 5))  # Default to 5 if not provided
-    difficulty = data.get('difficulty', 'medium')  # Default to medium
-    model_type = data.get('model', 'chatgroq')  # Default to gemini, can be 'chatgroq' or 'gemini'
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({"error": "Request body must be a JSON object"}), 400
+    if not data.get('link'):
+        return jsonify({"error": "No YouTube URL provided"}), 400
+
+    if wants_event_stream():
+        return sse_response(stream_summary_and_quiz(
+            data['link'], int(data.get('qno', 5)), data.get('difficulty', 'medium'), data.get('model', 'chatgroq')
+        ))
+
+    params = {key: value for key, value in data.items() if key not in ('async', 'stream')}
+    if wants_async():
+        return job_accepted_response("quiz", params)
+    return respond_sync(run_quiz_job, params)
+
+def run_quiz_job(params, progress):
+    youtube_link = params.get('link')
+    num_questions = int(params.get('qno', 5))  # Default to 5 if not provided
+    difficulty = params.get('difficulty', 'medium')  # Default to medium
+    model_type = params.get('model', 'chatgroq')  # Default to gemini, can be 'chatgroq' or 'gemini'
+    mode = params.get('mode', QUIZ_GENERATION_MODE)  # 'single' or 'parallel'
 
     if not youtube_link:
-        return jsonify({"error": "No YouTube URL provided"}), 400
+        raise JobError("No YouTube URL provided", 400)
+
+    flight_key = single_flight.key(
+        "quiz", normalize_video_id(youtube_link), num_questions, normalize_topic(str(difficulty)), model_type.lower(), mode
+    )
+    return single_flight.do(flight_key, lambda: generate_video_quiz(
+        youtube_link, num_questions, difficulty, model_type, mode, progress
+    ))
 
+def generate_video_quiz(youtube_link, num_questions, difficulty, model_type, mode, progress):
+    progress(0.1, "Fetching transcript")
     transcript, language = get_and_enhance_transcript(youtube_link, model_type)
     if not transcript:
-        return jsonify({"error": "Failed to fetch transcript"}), 404
+        raise JobError("Failed to fetch transcript", 404)
 
-    summary_and_quiz = generate_summary_and_quiz(transcript, num_questions, language, difficulty, model_type)
-    if summary_and_quiz:
-        return jsonify(summary_and_quiz)
-    else:
-        return jsonify({"error": "Failed to generate quiz"}), 500
+    progress(0.5, "Generating quiz")
+    generate = generate_summary_and_quiz_parallel if mode == 'parallel' else generate_summary_and_quiz
+    summary_and_quiz = generate(transcript, num_questions, language, difficulty, model_type)
+    if not summary_and_quiz:
+        raise JobError("Failed to generate quiz", 500)
+    return summary_and_quiz
+
+job_manager.register("quiz", run_quiz_job)
 
 # recommendation
 def validate_token_middleware():
@@ -248,6 +1799,139 @@ def validate_token_middleware():
 
 
 from langchain.prompts import PromptTemplate
+chat_prompt_template = PromptTemplate(
+    input_variables=["transcript", "question"],
+    template="""Given the following YouTube video transcript:
+            {transcript}
+            
+            Please answer this question based on the transcript content:
+            {question}"""
+)
+
+# Transcript retrieval for /chat_trans
+CHAT_TOP_K = int(os.getenv("CHAT_TOP_K", 4))
+CHAT_CHUNK_TOKENS = int(os.getenv("CHAT_CHUNK_TOKENS", 300))
+CHAT_CHUNK_OVERLAP_TOKENS = int(os.getenv("CHAT_CHUNK_OVERLAP_TOKENS", 40))
+INDEXED_TRANSCRIPTS_CACHE_SIZE = int(os.getenv("INDEXED_TRANSCRIPTS_CACHE_SIZE", 1024))
+# Chunks indexed longer ago than this are swept, covering keys other workers or earlier runs left behind
+TRANSCRIPT_INDEX_TTL = int(os.getenv("TRANSCRIPT_INDEX_TTL", 7 * 86400))
+TRANSCRIPT_SWEEP_INTERVAL = int(os.getenv("TRANSCRIPT_SWEEP_INTERVAL", 3600))
+transcript_sweep = {"last": 0.0}
+transcript_sweep_lock = threading.Lock()
+
+def drop_transcript_index(index_key, _value):
+    """Delete a transcript's chunks once its key falls out of indexed_transcripts."""
+    try:
+        transcript_collection.delete(where={"index_key": index_key})
+        logger.info(f"Dropped transcript chunks for {index_key}")
+    except Exception as e:
+        logger.warning(f"Could not drop transcript chunks for {index_key}: {str(e)}")
+
+# Index keys this process has embedded or found, most recently used last; evicting one deletes its chunks
+indexed_transcripts = LRUCache(max_size=INDEXED_TRANSCRIPTS_CACHE_SIZE, on_evict=drop_transcript_index)
+
+def sweep_transcript_index():
+    """Delete chunks older than TRANSCRIPT_INDEX_TTL, at most once per TRANSCRIPT_SWEEP_INTERVAL."""
+    with transcript_sweep_lock:
+        if time.time() - transcript_sweep["last"] < TRANSCRIPT_SWEEP_INTERVAL:
+            return
+        transcript_sweep["last"] = time.time()
+    try:
+        transcript_collection.delete(where={"indexed_at": {"$lt": time.time() - TRANSCRIPT_INDEX_TTL}})
+    except Exception as e:
+        logger.warning(f"Transcript index sweep failed: {str(e)}")
+
+def index_transcript(video_id, model_type, transcript):
+    """Embed a transcript's chunks once per video, model and transcript content; returns the index key."""
+    content_hash = hashlib.sha256(transcript.encode('utf-8')).hexdigest()[:16]
+    index_key = f"{video_id}:{model_type.lower()}:{content_hash}"
+    if indexed_transcripts.get(index_key):
+        return index_key
+
+    existing = transcript_collection.get(where={"index_key": index_key}, limit=1)
+    if not existing["ids"]:
+        chunks = split_transcript(transcript, CHAT_CHUNK_TOKENS, CHAT_CHUNK_OVERLAP_TOKENS)
+        embeddings = minilm_embeddings.encode(chunks).tolist()
+        transcript_collection.upsert(
+            ids=[f"{index_key}:{i}" for i in range(len(chunks))],
+            documents=chunks,
+            embeddings=embeddings,
+            metadatas=[
+                {"index_key": index_key, "video_id": video_id, "chunk": i, "indexed_at": time.time()}
+                for i in range(len(chunks))
+            ]
+        )
+        logger.info(f"Indexed {len(chunks)} transcript chunks for {index_key}")
+        sweep_transcript_index()
+
+    indexed_transcripts.set(index_key, True)
+    return index_key
+
+def retrieve_transcript_context(video_id, model_type, transcript, question, top_k=CHAT_TOP_K):
+    query_embedding = minilm_embeddings.encode(question).tolist()
+    for attempt in range(2):
+        index_key = index_transcript(video_id, model_type, transcript)
+        with stage_timer("vector_search", "chroma"):
+            results = transcript_collection.query(
+                query_embeddings=[query_embedding],
+                n_results=top_k,
+                where={"index_key": index_key}
+            )
+        if results["documents"][0]:
+            break
+        # Another worker evicted or swept this transcript after we cached its key; index it again
+        indexed_transcripts.delete(index_key)
+    # Keep transcript order so the excerpts read in sequence
+    hits = sorted(zip(results["metadatas"][0], results["documents"][0]), key=lambda hit: hit[0]["chunk"])
+    return "\n...\n".join(document for _, document in hits)
+
+def build_chat_prompt(youtube_link, model_type, transcript, question):
+    """Return the chat prompt and how many prompt tokens retrieval saved over sending the whole transcript."""
+    full_prompt = chat_prompt_template.format(transcript=transcript, question=question)
+    if estimate_tokens(transcript) <= CHAT_TOP_K * CHAT_CHUNK_TOKENS:
+        return full_prompt, 0
+
+    try:
+        context = retrieve_transcript_context(normalize_video_id(youtube_link), model_type, transcript, question)
+    except Exception as e:
+        logger.error(f"Transcript retrieval failed, using the full transcript: {str(e)}")
+        return full_prompt, 0
+
+    prompt = chat_prompt_template.format(transcript=context, question=question)
+    return prompt, max(estimate_tokens(full_prompt) - estimate_tokens(prompt), 0)
+
+def stream_chat_answer(youtube_link, question, model_type):
+    yield format_sse("status", {"stage": "transcript"})
+    transcript, language = get_and_enhance_transcript(youtube_link, model_type)
+    if not transcript:
+        yield format_sse("error", {"error": "Failed to fetch transcript"})
+        return
+
+    formatted_prompt, prompt_tokens_saved = build_chat_prompt(youtube_link, model_type, transcript, question)
+    answer = []
+    try:
+        # Chat answers always come from Groq, as in the non-streaming path
+        for text in stream_llm(formatted_prompt, 'chatgroq'):
+            answer.append(text)
+            yield format_sse("token", {"text": text})
+    except Exception as e:
+        yield format_sse("error", {"error": f"An error occurred: {str(e)}"})
+        return
+
+    yield format_sse("done", {
+        "answer": "".join(answer),
+        "prompt_tokens_saved": prompt_tokens_saved,
+        "status": "success"
+    })
+
+def answer_transcript_question(youtube_link, model_type, transcript, question):
+    # Process question with the relevant transcript excerpts
+    formatted_prompt, prompt_tokens_saved = build_chat_prompt(youtube_link, model_type, transcript, question)
+
+    # Get response from Groq
+    response = groq_model.invoke(formatted_prompt)
+    return {'answer': response.content, 'prompt_tokens_saved': prompt_tokens_saved}
+
 @app.route('/chat_trans', methods=['POST', 'OPTIONS'])
 def chat_with_transcript():
     """Handle chat requests with YouTube transcript context"""
@@ -255,9 +1939,11 @@ def chat_with_transcript():
         return '', 204  # Handle CORS preflight request
 
     try:
-        data = request.json
+        data = request.get_json(silent=True)
         if not data:
             return jsonify({'error': 'No JSON data provided'}), 400
+        if not isinstance(data, dict):
+            return jsonify({'error': 'Request body must be a JSON object'}), 400
 
         youtube_link = data.get('link')
         model_type = data.get('model', 'chatgroq')  # Default to chatgroq
@@ -266,6 +1952,9 @@ def chat_with_transcript():
         if not youtube_link:
             return jsonify({'error': 'Missing YouTube link'}), 400
 
+        if question and wants_event_stream():
+            return sse_response(stream_chat_answer(youtube_link, question, model_type))
+
         # Get and enhance transcript
         transcript, language = get_and_enhance_transcript(youtube_link, model_type)
         
@@ -280,26 +1969,14 @@ def chat_with_transcript():
                 'status': 'success'
             })
 
-        # Process question with transcript context
-        prompt_template = PromptTemplate(
-            input_variables=["transcript", "question"],
-            template="""Given the following YouTube video transcript:
-            {transcript}
-            
-            Please answer this question based on the transcript content:
-            {question}"""
-        )
-
-        formatted_prompt = prompt_template.format(
-            transcript=transcript,
-            question=question
-        )
-
-        # Get response from Groq
-        response = groq_model.invoke(formatted_prompt)
+        # The same question about the same video is answered once for everyone asking it at the same time
+        question_hash = hashlib.sha256(" ".join(question.lower().split()).encode('utf-8')).hexdigest()[:16]
+        flight_key = single_flight.key("chat", normalize_video_id(youtube_link), model_type.lower(), question_hash)
+        answer = single_flight.do(flight_key, lambda: answer_transcript_question(youtube_link, model_type, transcript, question))
 
         return jsonify({
-            'answer': response.content,
+            'answer': answer['answer'],
+            'prompt_tokens_saved': answer['prompt_tokens_saved'],
             # 'transcript': transcript,
             # 'language': language,
             'status': 'success'
@@ -311,11 +1988,7 @@ def chat_with_transcript():
 # Function to interact with LLaMA API
 def llama_generate_recommendations(prompt):
     try:
-        llm = ChatGroq(
-            model="llama-3.1-8b-instant",
-            temperature=0,
-            groq_api_key=os.getenv("GROQ_API_KEY")
-        )
+        llm = get_llm_client("groq", "llama-3.1-8b-instant", temperature=0)
         
         response = llm.invoke(prompt)
         
@@ -330,29 +2003,19 @@ def llama_generate_recommendations(prompt):
  
 import json
 
-@app.route('/getonly', methods=['GET'])
-@validate_token_middleware()
-def get_recommendations():
-    user_id = request.user_id  # Extract user ID from the token
-    
-    try:
-        # Fetch user statistics from Redis
-        statistics = redis_client.hget(f"student:{user_id}", "statistics")
-        
-        if not statistics:
-            return jsonify({"message": "No statistics found for the provided user."}), 404
-        
-        # Convert JSON string to Python dictionary
-        topics_data = json.loads(statistics)
-
-        if not topics_data:
-            return jsonify({"message": "No topics found for the provided user."}), 404
+# Recommendation cache
+RECOMMENDATION_REFRESH_INTERVAL = int(os.getenv("RECOMMENDATION_REFRESH_INTERVAL", 300))  # 0 disables the refresher
+RECOMMENDATION_REFRESH_BATCH = int(os.getenv("RECOMMENDATION_REFRESH_BATCH", 10))
 
-        # Extract only topic names
-        topics_list = list(topics_data.keys())
+# Recommendations depend only on the topic, so they are shared by every student
+recommendation_cache = TieredCache(
+    "recommendation:topic",
+    ttl=int(os.getenv("RECOMMENDATION_CACHE_TTL", 30 * 24 * 3600)),
+    local_size=int(os.getenv("RECOMMENDATION_CACHE_LOCAL_SIZE", 512))
+)
 
-        # Format recommendations prompt
-        prompt = f"""
+def build_recommendations_prompt(topics_list):
+    return f"""
         Act as an intelligent recommendation generator. Based on the topics provided, generate a structured JSON response 
         with an overview, recommendations, and five YouTube video URLs for each topic. Ensure the output is in strict JSON 
         format without markdown or extra formatting. Use the following JSON structure:
@@ -375,18 +2038,112 @@ def get_recommendations():
         The topics are: {', '.join(topics_list)}
         """
 
-        # Generate recommendations
-        recommendations_raw = llama_generate_recommendations(prompt)
+def get_cached_recommendations(topics_list):
+    """Split topics into (cached recommendations keyed by topic, topics still missing)."""
+    cached, missing = {}, []
+    for topic in topics_list:
+        value = recommendation_cache.get(recommendation_cache.key(normalize_topic(topic)))
+        if value is None:
+            missing.append(topic)
+        else:
+            cached[topic] = value
+    return cached, missing
+
+def generate_topic_recommendations(topics_list):
+    """
+    Ask the LLM about all missing topics in one prompt and cache each topic's entry.
+    Returns (recommendations keyed by the requested topic names, raw response or None on success).
+    """
+    recommendations_raw = llama_generate_recommendations(build_recommendations_prompt(topics_list))
+    parsed = extract_json_response(recommendations_raw)
+    if not parsed or not isinstance(parsed.get("topics"), dict):
+        return {}, recommendations_raw
+
+    # Match the model's topic names back to the requested ones
+    by_normalized = {normalize_topic(name): value for name, value in parsed["topics"].items()}
+    generated = {}
+    for topic in topics_list:
+        value = by_normalized.get(normalize_topic(topic))
+        if value is not None:
+            recommendation_cache.set(recommendation_cache.key(normalize_topic(topic)), value)
+            generated[topic] = value
+    return generated, None
 
-        # Ensure the response is valid JSON
+def refresh_recommendations_once(seen_statistics):
+    """Generate recommendations for topics that appeared in any student's statistics since the last pass."""
+    pending, pending_topics = [], set()
+    for student_key in redis_client.scan_iter(match="student:*", count=100):
         try:
-            recommendations = json.loads(recommendations_raw)
-        except json.JSONDecodeError:
-            return jsonify({"message": "Failed to parse AI response as JSON", "raw_response": recommendations_raw}), 500
+            statistics = redis_client.hget(student_key, "statistics")
+        except redis.ResponseError:
+            continue  # Not a hash
+        if not statistics:
+            continue
+        digest = hashlib.sha1(statistics.encode("utf-8")).hexdigest()
+        if seen_statistics.get(student_key) == digest:
+            continue
+        try:
+            topics = list(json.loads(statistics).keys())
+        except (json.JSONDecodeError, AttributeError):
+            continue
+        _, missing = get_cached_recommendations(topics)
+        for topic in missing:
+            if normalize_topic(topic) not in pending_topics:
+                pending_topics.add(normalize_topic(topic))
+                pending.append(topic)
+        seen_statistics[student_key] = digest
+
+    for start in range(0, len(pending), RECOMMENDATION_REFRESH_BATCH):
+        batch = pending[start:start + RECOMMENDATION_REFRESH_BATCH]
+        _, error = generate_topic_recommendations(batch)
+        if error is not None:
+            logger.warning(f"Recommendation refresh failed for {batch}: {error[:200]}")
+    if pending:
+        logger.info(f"Recommendation refresher generated {len(pending)} new topics")
+
+def recommendation_refresher():
+    """Background loop; a Redis lock lets only one worker process refresh per interval."""
+    seen_statistics = {}
+    while True:
+        time.sleep(RECOMMENDATION_REFRESH_INTERVAL)
+        try:
+            if redis_client.set("recommendation:refresher:lock", os.getpid(), nx=True, ex=RECOMMENDATION_REFRESH_INTERVAL):
+                refresh_recommendations_once(seen_statistics)
+        except Exception as e:
+            logger.error(f"Recommendation refresher error: {str(e)}")
+
+@app.route('/getonly', methods=['GET'])
+@validate_token_middleware()
+def get_recommendations():
+    user_id = request.user_id  # Extract user ID from the token
+    
+    try:
+        # Fetch user statistics from Redis
+        statistics = redis_client.hget(f"student:{user_id}", "statistics")
+        
+        if not statistics:
+            return jsonify({"message": "No statistics found for the provided user."}), 404
+        
+        # Convert JSON string to Python dictionary
+        topics_data = json.loads(statistics)
+
+        if not topics_data:
+            return jsonify({"message": "No topics found for the provided user."}), 404
+
+        # Extract only topic names
+        topics_list = list(topics_data.keys())
+
+        # Serve cached topics and only ask the LLM about the rest
+        recommendations, missing = get_cached_recommendations(topics_list)
+        if missing:
+            generated, recommendations_raw = generate_topic_recommendations(missing)
+            if recommendations_raw is not None:
+                return jsonify({"message": "Failed to parse AI response as JSON", "raw_response": recommendations_raw}), 500
+            recommendations.update(generated)
 
         return jsonify({
             "message": "Recommendations generated successfully",
-            "recommendations": recommendations["topics"]  # Extract only relevant content
+            "recommendations": {topic: recommendations[topic] for topic in topics_list if topic in recommendations}
         }), 200
 
     except Exception as e:
@@ -394,17 +2151,10 @@ def get_recommendations():
         return jsonify({"message": f"An error occurred: {str(e)}"}), 500
 
 
-import faiss 
-from sentence_transformers import SentenceTransformer
-from huggingface_hub import login
 groq_api_key = os.getenv("GROQ_API_KEY")
 groq_model_name = "llama3-8b-8192"
-login(token=os.getenv("HUGGINGFACE_TOKEN")) 
 
-groq_chat = ChatGroq(
-    groq_api_key=groq_api_key,
-    model_name=groq_model_name,
-)
+groq_chat = get_llm_client("groq", groq_model_name)
 
 
 # Define the Groq system prompt
@@ -412,70 +2162,531 @@ groq_sys_prompt = ChatPromptTemplate.from_template(
     "You are very smart at everything, you always give the best, the most accurate and most precise answers. "
     "Answer the following questions: {user_prompt}. Add more information as per your knowledge so that user can get proper knowledge, but make sure information is correct"
 )
-import threading
-import time
 
 
-embedding_model = SentenceTransformer('multi-qa-mpnet-base-cos-v1')  # Pre-trained model for embeddings
-dimension = embedding_model.get_sentence_embedding_dimension()
-faiss_index = faiss.IndexFlatL2(dimension) 
-metadata_store = {}
+embedding_model = LazyResource(
+    "multi-qa-mpnet-base-cos-v1",
+    lambda: load_sentence_transformer('multi-qa-mpnet-base-cos-v1')  # Pre-trained model for embeddings
+)
 pdf_storage = {}
 
+# Persistent FAISS index
+FAISS_DIR = os.getenv("FAISS_DIR", "./faiss_index")
+FAISS_INDEX_TYPE = os.getenv("FAISS_INDEX_TYPE", "flat")  # 'flat' or 'ivf'
+FAISS_IVF_NLIST = int(os.getenv("FAISS_IVF_NLIST", 256))
+FAISS_IVF_NPROBE = int(os.getenv("FAISS_IVF_NPROBE", 16))
+FAISS_BLOCK_ROWS = 65536  # Rows copied at a time when building or compacting
+
+class FaissStore:
+    """
+    Chunk vectors and their metadata persisted under `directory`, shared by every worker process.
+
+    vectors.<epoch>.f32 is an append-only float32 matrix that readers np.memmap, so workers share
+    the page cache instead of each holding a copy. chunks.db (sqlite, WAL) maps every row to its
+    document and chunk and records how many rows are committed. Writers append rows and insert their
+    metadata under a file lock, so an upload costs O(its own chunks). Deletes mark rows as deleted;
+    once deleted rows outnumber live ones, compaction rewrites the matrix under a new epoch.
+
+    'flat' searches the mapped matrix exactly with faiss.knn. 'ivf' also keeps an IndexIVFFlat read
+    with IO_FLAG_MMAP, so its inverted lists stay on disk; rows appended after it was built are
+    searched exactly, and it is rebuilt once they outnumber the rows it covers.
+    """
+    def __init__(self, directory, dimension, index_type=FAISS_INDEX_TYPE):
+        self.directory = directory
+        self.db_path = os.path.join(directory, "chunks.db")
+        self.lock_path = os.path.join(directory, ".lock")
+        self.dimension = dimension
+        self.index_type = index_type
+        self._thread_lock = threading.RLock()
+        self._local = threading.local()  # One sqlite connection per thread
+        self._vectors = None  # (epoch, rows, memmap)
+        self._ivf = None  # (file name, index)
+        os.makedirs(directory, exist_ok=True)
+        with self._write_lock():
+            self._init_schema(self._db())
+
+    def _db(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self, conn):
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunks (id INTEGER PRIMARY KEY, document TEXT NOT NULL, "
+            "chunk INTEGER NOT NULL, deleted INTEGER NOT NULL DEFAULT 0)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS chunks_document ON chunks (document)")
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value)")
+        conn.executemany(
+            "INSERT OR IGNORE INTO meta (key, value) VALUES (?, ?)",
+            [("rows", 0), ("deleted", 0), ("epoch", 0), ("ivf_file", ""), ("ivf_rows", 0)]
+        )
+
+    def _meta(self, conn):
+        return dict(conn.execute("SELECT key, value FROM meta"))
+
+    def _set_meta(self, conn, **values):
+        conn.executemany("UPDATE meta SET value = ? WHERE key = ?", [(value, key) for key, value in values.items()])
+
+    @contextmanager
+    def _write_lock(self):
+        with self._thread_lock, open(self.lock_path, "w") as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+    def _vectors_path(self, epoch):
+        return os.path.join(self.directory, f"vectors.{epoch}.f32")
+
+    def _mapped_vectors(self, meta):
+        np = import_timed("numpy")
+        key = (meta["epoch"], meta["rows"])
+        with self._thread_lock:
+            if self._vectors is None or self._vectors[:2] != key:
+                matrix = np.memmap(self._vectors_path(meta["epoch"]), dtype="float32", mode="r",
+                                   shape=(meta["rows"], self.dimension))
+                self._vectors = key + (matrix,)
+            return self._vectors[2]
+
+    def _mapped_ivf(self, name):
+        faiss = import_timed("faiss")
+        with self._thread_lock:
+            if self._ivf is None or self._ivf[0] != name:
+                index = faiss.read_index(os.path.join(self.directory, name), faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+                self._ivf = (name, index)
+            return self._ivf[1]
+
+    def search(self, query_embedding, k=5):
+        """Return up to k (document, chunk, distance) hits for one query vector."""
+        conn = self._db()
+        for attempt in range(2):
+            try:
+                conn.execute("BEGIN")  # One snapshot for the row count, the search and the metadata lookup
+                try:
+                    return self._search_snapshot(conn, query_embedding, k)
+                finally:
+                    conn.execute("COMMIT")
+            except FileNotFoundError:
+                if attempt:  # A compaction replaced the files mid-search; the retry sees the new epoch
+                    raise
+
+    def _search_snapshot(self, conn, query_embedding, k):
+        meta = self._meta(conn)
+        if meta["rows"] == 0:
+            return []
+        # Deleted rows are filtered after the search, so widen it until k live hits are found
+        fetch = min(meta["rows"], k if not meta["deleted"] else 2 * k)
+        while True:
+            with stage_timer("vector_search", "faiss"):
+                candidates = self._nearest_rows(meta, query_embedding, fetch)
+            live = self._live_chunks(conn, [row for row, _ in candidates])
+            hits = [live[row] + (distance,) for row, distance in candidates if row in live]
+            if len(hits) >= k or fetch >= meta["rows"]:
+                return hits[:k]
+            fetch = min(meta["rows"], fetch * 4)
+
+    def _live_chunks(self, conn, rows, batch=500):
+        """row -> (document, chunk) for the rows that are not deleted; batched under sqlite's parameter limit."""
+        live = {}
+        for start in range(0, len(rows), batch):
+            part = rows[start:start + batch]
+            live.update({
+                row: (document, chunk) for row, document, chunk in conn.execute(
+                    f"SELECT id, document, chunk FROM chunks WHERE deleted = 0 AND id IN ({','.join('?' * len(part))})", part
+                )
+            })
+        return live
+
+    def _nearest_rows(self, meta, query_embedding, fetch):
+        """(row, distance) pairs, nearest first, from the IVF index and an exact scan of the rows it lacks."""
+        np = import_timed("numpy")
+        faiss = import_timed("faiss")
+        query = np.asarray([query_embedding], dtype="float32")
+        vectors = self._mapped_vectors(meta)
+        indexed_rows = meta["ivf_rows"] if meta["ivf_file"] else 0
+        results = []
+        if indexed_rows:
+            index = self._mapped_ivf(meta["ivf_file"])
+            index.nprobe = FAISS_IVF_NPROBE
+            distances, rows = index.search(query, min(fetch, indexed_rows))
+            results += zip(rows[0].tolist(), distances[0].tolist())
+        tail = vectors[indexed_rows:]
+        if len(tail):
+            distances, rows = faiss.knn(query, tail, min(fetch, len(tail)))
+            results += [(row + indexed_rows, distance) for row, distance in zip(rows[0].tolist(), distances[0].tolist())]
+        return sorted((pair for pair in results if pair[0] != -1), key=lambda pair: pair[1])[:fetch]
+
+    def add(self, document, embeddings):
+        np = import_timed("numpy")
+        embeddings = np.ascontiguousarray(embeddings, dtype="float32").reshape(-1, self.dimension)
+        with self._write_lock():
+            conn = self._db()
+            meta = self._meta(conn)
+            rows = meta["rows"]
+            with open(self._vectors_path(meta["epoch"]), "ab") as f:
+                f.truncate(rows * self.dimension * 4)  # Drop rows a crashed writer appended but never committed
+                f.write(embeddings.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(
+                "INSERT INTO chunks (id, document, chunk) VALUES (?, ?, ?)",
+                [(rows + position, document, position) for position in range(len(embeddings))]
+            )
+            self._set_meta(conn, rows=rows + len(embeddings))
+            conn.execute("COMMIT")
+            self._maybe_build_ivf(conn)
+
+    def delete_document(self, document):
+        with self._write_lock():
+            conn = self._db()
+            conn.execute("BEGIN IMMEDIATE")
+            deleted = conn.execute(
+                "UPDATE chunks SET deleted = 1 WHERE document = ? AND deleted = 0", (document,)
+            ).rowcount
+            meta = self._meta(conn)
+            self._set_meta(conn, deleted=meta["deleted"] + deleted)
+            conn.execute("COMMIT")
+            if 2 * (meta["deleted"] + deleted) > meta["rows"]:
+                self._compact(conn)
+        return deleted
+
+    def build(self, index_type=None):
+        """Compact away deleted rows and, for 'ivf', (re)build the index now, e.g. after a bulk load."""
+        index_type = index_type or self.index_type
+        with self._write_lock():
+            conn = self._db()
+            if self._meta(conn)["deleted"]:
+                self._compact(conn)
+            if index_type == "ivf":
+                self._build_ivf(conn, self._meta(conn))
+
+    def _compact(self, conn):
+        """Rewrite the live rows into a new epoch and renumber them; caller holds the write lock."""
+        np = import_timed("numpy")
+        meta = self._meta(conn)
+        live = [row for (row,) in conn.execute("SELECT id FROM chunks WHERE deleted = 0 ORDER BY id")]
+        epoch = meta["epoch"] + 1
+        with open(self._vectors_path(epoch), "wb") as f:
+            if live:
+                old = np.memmap(self._vectors_path(meta["epoch"]), dtype="float32", mode="r",
+                                shape=(meta["rows"], self.dimension))
+                for start in range(0, len(live), FAISS_BLOCK_ROWS):
+                    f.write(np.ascontiguousarray(old[live[start:start + FAISS_BLOCK_ROWS]]).tobytes())
+                del old
+            f.flush()
+            os.fsync(f.fileno())
+
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("DELETE FROM chunks WHERE deleted = 1")
+        # Ascending order: each row moves down to a slot that earlier rows have already vacated
+        conn.executemany("UPDATE chunks SET id = ? WHERE id = ?", list(enumerate(live)))
+        self._set_meta(conn, rows=len(live), deleted=0, epoch=epoch, ivf_file="", ivf_rows=0)
+        conn.execute("COMMIT")
+        # Readers still searching the old files keep them open until they finish
+        self._remove(self._vectors_path(meta["epoch"]))
+        if meta["ivf_file"]:
+            self._remove(os.path.join(self.directory, meta["ivf_file"]))
+        self._maybe_build_ivf(conn)
+
+    def _maybe_build_ivf(self, conn):
+        if self.index_type != "ivf":
+            return
+        meta = self._meta(conn)
+        # IVF needs enough vectors to train its coarse quantizer; until then every search is exact.
+        # Rebuilding once the unindexed tail outgrows the index keeps appends amortised O(1).
+        if meta["rows"] >= FAISS_IVF_NLIST * 39 and meta["rows"] - meta["ivf_rows"] > meta["ivf_rows"]:
+            self._build_ivf(conn, meta)
+
+    def _build_ivf(self, conn, meta):
+        np = import_timed("numpy")
+        faiss = import_timed("faiss")
+        rows = meta["rows"]
+        if rows == 0:
+            return
+        vectors = np.memmap(self._vectors_path(meta["epoch"]), dtype="float32", mode="r", shape=(rows, self.dimension))
+        nlist = max(1, min(FAISS_IVF_NLIST, rows // 39))
+        index = faiss.IndexIVFFlat(faiss.IndexFlatL2(self.dimension), self.dimension, nlist)
+        sample = np.sort(np.random.default_rng(0).choice(rows, size=min(rows, nlist * 256), replace=False))
+        index.train(np.ascontiguousarray(vectors[sample]))
+        for start in range(0, rows, FAISS_BLOCK_ROWS):
+            block = np.ascontiguousarray(vectors[start:start + FAISS_BLOCK_ROWS])
+            index.add_with_ids(block, np.arange(start, start + len(block), dtype="int64"))
+        del vectors
+
+        name = f"ivf.{meta['epoch']}.{rows}.faiss"
+        path = os.path.join(self.directory, name)
+        faiss.write_index(index, f"{path}.{os.getpid()}.tmp")
+        os.replace(f"{path}.{os.getpid()}.tmp", path)
+        conn.execute("BEGIN IMMEDIATE")
+        self._set_meta(conn, ivf_file=name, ivf_rows=rows)
+        conn.execute("COMMIT")
+        if meta["ivf_file"] and meta["ivf_file"] != name:
+            self._remove(os.path.join(self.directory, meta["ivf_file"]))
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def stats(self):
+        meta = self._meta(self._db())
+        return {"rows": meta["rows"], "deleted": meta["deleted"], "epoch": meta["epoch"],
+                "index_type": self.index_type, "ivf_rows": meta["ivf_rows"]}
+
+faiss_store = LazyResource(
+    "faiss_store",
+    lambda: FaissStore(FAISS_DIR, embedding_model.get_sentence_embedding_dimension())
+)
+
 def store_in_faiss(filename, text):
     chunks = [text[i:i+1000] for i in range(0, len(text), 1000)]
-    embeddings = embedding_model.encode(chunks)
-    faiss_index.add(embeddings)  
-    metadata_store.update({i: filename for i in range(len(metadata_store), len(metadata_store) + len(chunks))})
-genai.configure(api_key=os.getenv("GENAI_API_KEY"))
-model = SentenceTransformer("all-MiniLM-L6-v2")
-chroma_client = chromadb.PersistentClient(path="./chroma_db")
-collection = chroma_client.get_or_create_collection(name="pdf_documents")
+    embeddings = mpnet_embeddings.encode(chunks)
+    faiss_store.add(filename, embeddings)
 
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
+def search_faiss(query, k=5):
+    return faiss_store.search(mpnet_embeddings.encode(query), k)
 
-class TextToSpeechManager:
-    def __init__(self):
-        self.lock = threading.Lock()
-    
-    def speak(self, text):
-        try:
-            with self.lock:  # Ensure only one speech operation happens at a time
-                engine = None
+def delete_from_faiss(filename):
+    return faiss_store.delete_document(filename)
+model = LazyResource("all-MiniLM-L6-v2", lambda: load_sentence_transformer("all-MiniLM-L6-v2"))
+
+# Embedding service
+EMBED_MAX_BATCH_SIZE = int(os.getenv("EMBED_MAX_BATCH_SIZE", 64))
+EMBED_MAX_WAIT_MS = float(os.getenv("EMBED_MAX_WAIT_MS", 10))
+EMBED_BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+embedding_services = {}
+
+class EmbeddingBatcher:
+    """
+    Queues encode requests from every endpoint and runs them on one dedicated worker thread,
+    batching texts until the batch holds max_batch_size texts or max_wait_ms has passed.
+    """
+    def __init__(self, name, encoder, max_batch_size=EMBED_MAX_BATCH_SIZE, max_wait_ms=EMBED_MAX_WAIT_MS):
+        self.name = name
+        self.encoder = encoder
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.queue = queue.Queue()
+        self.stats_lock = threading.Lock()
+        self.batch_histogram = {bucket: 0 for bucket in EMBED_BATCH_BUCKETS}
+        self.batch_histogram["+Inf"] = 0
+        self.batches = 0
+        self.texts = 0
+        self.requests = 0
+        self.worker = Thread(target=self._run, name=f"embed-{name}", daemon=True)
+        self.worker.start()
+        embedding_services[name] = self
+
+    def submit(self, texts):
+        """Queue texts for encoding; the future resolves to an array with one row per text."""
+        future = Future()
+        self.queue.put((list(texts), future))
+        return future
+
+    def encode(self, texts):
+        """Blocking drop-in for SentenceTransformer.encode: a string gives one vector, a list gives one row per text."""
+        with stage_timer("embedding", self.name):
+            if isinstance(texts, str):
+                return self.submit([texts]).result()[0]
+            return self.submit(texts).result()
+
+    def _run(self):
+        while True:
+            pending = [self.queue.get()]
+            size = len(pending[0][0])
+            deadline = time.monotonic() + self.max_wait
+            while size < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
                 try:
-                    engine = pyttsx3.init()
-                    engine.setProperty('rate', 150)
-                    engine.setProperty('volume', 1.0)
-                    engine.say(text)
-                    engine.runAndWait() 
-                    # print("spoke")
-                    engine.startLoop(False)  # Start the event loop without blocking
-                    engine.iterate()  # Process queued commands
-                    engine.endLoop()  # End the event loop
-                    logger.info("Speech completed successfully")
-                finally:
-                    if engine:
-                        try:
-                            engine.stop()
-                        except:
-                            pass
-                        del engine
+                    item = self.queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                pending.append(item)
+                size += len(item[0])
+            self._encode_batch(pending)
+
+    def _encode_batch(self, pending):
+        pending = [(texts, future) for texts, future in pending if future.set_running_or_notify_cancel()]
+        texts = [text for request_texts, _ in pending for text in request_texts]
+        if not texts:
+            for _, future in pending:
+                future.set_result([])
+            return
+        try:
+            embeddings = self.encoder.encode(texts, batch_size=self.max_batch_size)
         except Exception as e:
-            logger.error(f"Text-to-speech error: {str(e)}")
-            
-    def start_speaking(self, text):
-        """Start a new thread for speaking"""
-        thread = Thread(target=self.speak, args=(text,))
-        thread.daemon = True  # Make thread daemon so it doesn't block program exit
-        thread.start()
-        return thread
+            for _, future in pending:
+                future.set_exception(e)
+            return
+
+        self._record_batch(len(texts), len(pending))
+        offset = 0
+        for request_texts, future in pending:
+            future.set_result(embeddings[offset:offset + len(request_texts)])
+            offset += len(request_texts)
+
+    def _record_batch(self, batch_size, request_count):
+        bucket = next((b for b in EMBED_BATCH_BUCKETS if batch_size <= b), "+Inf")
+        with self.stats_lock:
+            self.batch_histogram[bucket] += 1
+            self.batches += 1
+            self.texts += batch_size
+            self.requests += request_count
+
+    def stats(self):
+        with self.stats_lock:
+            return {
+                "queue_depth": self.queue.qsize(),
+                "batches": self.batches,
+                "texts": self.texts,
+                "requests": self.requests,
+                "mean_batch_size": round(self.texts / self.batches, 2) if self.batches else 0.0,
+                "batch_size_histogram": {str(bucket): count for bucket, count in self.batch_histogram.items()}
+            }
+
+minilm_embeddings = EmbeddingBatcher("all-MiniLM-L6-v2", model)
+mpnet_embeddings = EmbeddingBatcher("multi-qa-mpnet-base-cos-v1", embedding_model)
+chroma_client = LazyResource("chroma_client", lambda: import_timed("chromadb").PersistentClient(path="./chroma_db"))
+collection = LazyResource(
+    "document_chunks",
+    lambda: chroma_client.get_or_create_collection(name="document_chunks")
+)
+transcript_collection = LazyResource(
+    "transcript_chunks",
+    lambda: chroma_client.get_or_create_collection(name="transcript_chunks")
+)
+
+# Text-to-speech rendering
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", "./tts_cache")
+# pyttsx3 shares one engine per driver within a process, so more than one worker only helps
+# with drivers that tolerate concurrent use
+TTS_WORKERS = int(os.getenv("TTS_WORKERS", 1))
+TTS_QUEUE_SIZE = int(os.getenv("TTS_QUEUE_SIZE", 16))
+TTS_CACHE_MAX_FILES = int(os.getenv("TTS_CACHE_MAX_FILES", 500))
+TTS_RATE = 150
+TTS_VOLUME = 1.0
+AUDIO_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+class TTSBusyError(Exception):
+    pass
+
+def prune_cache_dir(directory, max_files=None, max_bytes=None, suffix=""):
+    """Evict the least recently used files (oldest mtime first) until the directory fits the limits."""
+    entries = []
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if name.endswith(suffix) and os.path.isfile(path):
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, stat.st_size, path))
+    entries.sort()
+    total_bytes = sum(size for _, size, _ in entries)
+    while entries and ((max_files is not None and len(entries) > max_files)
+                       or (max_bytes is not None and total_bytes > max_bytes)):
+        _, size, path = entries.pop(0)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total_bytes -= size
+
+class TextToSpeechManager:
+    """
+    Renders speech to WAV files on a bounded pool of worker threads that keep their engine warm.
+    Files are cached by a hash of the text and voice settings. When the queue is full new work is
+    rejected with TTSBusyError instead of piling up threads.
+    """
+    def __init__(self, cache_dir=TTS_CACHE_DIR, workers=TTS_WORKERS, queue_size=TTS_QUEUE_SIZE):
+        self.cache_dir = cache_dir
+        self.worker_count = workers
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.lock = threading.Lock()
+        self.pending = {}  # audio id -> Event set once rendering finishes
+        self.workers = []
+
+    def audio_id(self, text):
+        return hashlib.sha256(f"{TTS_RATE}:{TTS_VOLUME}:{text}".encode('utf-8')).hexdigest()[:32]
+
+    def audio_path(self, audio_id):
+        return os.path.join(self.cache_dir, f"{audio_id}.wav")
+
+    def status(self, audio_id):
+        if os.path.exists(self.audio_path(audio_id)):
+            return "ready"
+        return "pending" if audio_id in self.pending else "unknown"
+
+    def submit(self, text):
+        """Queue text for rendering and return its audio id; cached audio is returned immediately."""
+        audio_id = self.audio_id(text)
+        path = self.audio_path(audio_id)
+        if os.path.exists(path):
+            os.utime(path)  # Mark as recently used for cache eviction
+            return audio_id
+
+        with self.lock:
+            if audio_id in self.pending:
+                return audio_id
+            self._start_workers()
+            try:
+                self.queue.put_nowait((audio_id, text))
+            except queue.Full:
+                raise TTSBusyError("Text-to-speech queue is full")
+            self.pending[audio_id] = threading.Event()
+        return audio_id
+
+    def wait(self, audio_id, timeout):
+        event = self.pending.get(audio_id)
+        if event:
+            event.wait(timeout)
+        return self.status(audio_id)
+
+    def _start_workers(self):
+        if self.workers:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        for i in range(self.worker_count):
+            worker = Thread(target=self._run, name=f"tts-{i}", daemon=True)
+            worker.start()
+            self.workers.append(worker)
+
+    def _run(self):
+        engine = None
+        while True:
+            audio_id, text = self.queue.get()
+            path = self.audio_path(audio_id)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp.wav"
+            try:
+                if engine is None:
+                    import pyttsx3
+                    engine = pyttsx3.init()
+                    engine.setProperty('rate', TTS_RATE)
+                    engine.setProperty('volume', TTS_VOLUME)
+                engine.save_to_file(text, tmp_path)
+                engine.runAndWait()
+                os.replace(tmp_path, path)
+                prune_cache_dir(self.cache_dir, max_files=TTS_CACHE_MAX_FILES, suffix=".wav")
+                logger.info(f"Rendered speech {audio_id}")
+            except Exception as e:
+                logger.error(f"Text-to-speech error: {str(e)}")
+                engine = None  # Re-create the engine for the next job
+            finally:
+                with self.lock:
+                    event = self.pending.pop(audio_id, None)
+                if event:
+                    event.set()
 
 # Create a global instance of the TTS manager
 tts_manager = TextToSpeechManager()
 
 def clean_response(text):
     """Clean and format the LLM response."""
+    from bs4 import BeautifulSoup
     text = BeautifulSoup(text, "html.parser").get_text()
     text = html.unescape(text)
     text = re.sub(r'\n\s*\n', '\n\n', text)
@@ -484,19 +2695,82 @@ def clean_response(text):
     return text
 
 def speak_text(text):
-    """Convert text to speech using the TTS manager."""
-    tts_manager.speak(text)
+    """Render text to speech using the TTS manager; returns the audio id."""
+    return tts_manager.submit(text)
 
+@timed_stage("document_parse", "pdf")
 def extract_text_from_pdf(pdf_file):
+    from PyPDF2 import PdfReader
     reader = PdfReader(pdf_file)
     return " ".join(page.extract_text() for page in reader.pages if page.extract_text())
 
+@timed_stage("document_parse", "pptx")
 def extract_text_from_pptx(pptx_path):
+    from pptx import Presentation
     prs = Presentation(pptx_path)
     text = [shape.text for slide in prs.slides for shape in slide.shapes if hasattr(shape, "text")]
     return " ".join(text)
 
+# Per-user document index
+DOCUMENT_CHUNK_SIZE = int(os.getenv("DOCUMENT_CHUNK_SIZE", 1000))
+DOCUMENT_CHUNK_OVERLAP = int(os.getenv("DOCUMENT_CHUNK_OVERLAP", 150))
+QUERY_TOP_K = int(os.getenv("QUERY_TOP_K", 3))
+document_splitter = RecursiveCharacterTextSplitter(chunk_size=DOCUMENT_CHUNK_SIZE, chunk_overlap=DOCUMENT_CHUNK_OVERLAP)
+
+def require_document_owner(func):
+    """validate_token_middleware plus a user id in the token; each user's documents live in their own namespace."""
+    @validate_token_middleware()
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if not request.user_id:
+            return jsonify({"message": "Unauthorized: Token has no user id"}), 401
+        return func(*args, **kwargs)
+    return wrapper
+
+def document_id_for(user_id, filename):
+    return f"{user_id}:{filename}"
+
+def index_document(user_id, filename, content):
+    """Upsert a document's chunks under the user's namespace; other documents are left untouched."""
+    chunks = document_splitter.split_text(content)
+    if not chunks:
+        raise ValueError("No text could be extracted from the file")
+
+    document_id = document_id_for(user_id, filename)
+    embeddings = minilm_embeddings.encode(chunks).tolist()
+    collection.upsert(
+        ids=[f"{document_id}:{i}" for i in range(len(chunks))],
+        documents=chunks,
+        embeddings=embeddings,
+        metadatas=[
+            {"user_id": user_id, "document_id": document_id, "filename": filename, "chunk": i}
+            for i in range(len(chunks))
+        ]
+    )
+    # Drop chunks left over from a longer previous version of the same document
+    collection.delete(where={"$and": [{"document_id": document_id}, {"chunk": {"$gte": len(chunks)}}]})
+    return len(chunks)
+
+def delete_document(user_id, filename):
+    document_id = document_id_for(user_id, filename)
+    existing = collection.get(where={"document_id": document_id}, include=[])["ids"]
+    if existing:
+        collection.delete(ids=existing)
+    return len(existing)
+
+def search_documents(user_id, query, top_k=QUERY_TOP_K, filename=None):
+    where = {"user_id": user_id}
+    if filename:
+        where = {"$and": [where, {"filename": filename}]}
+    if collection.count() == 0:
+        return []
+    query_embedding = minilm_embeddings.encode(query).tolist()
+    with stage_timer("vector_search", "chroma"):
+        results = collection.query(query_embeddings=[query_embedding], n_results=top_k, where=where)
+    return results["documents"][0] if results["documents"] else []
+
 @app.route("/upload", methods=["POST"])
+@require_document_owner
 def upload_file():
     if "file" not in request.files:
         return jsonify({"error": "No file part in the request"}), 400
@@ -504,10 +2778,13 @@ def upload_file():
     file = request.files["file"]
     if file.filename == "":
         return jsonify({"error": "No file selected"}), 400
-    
-    file_ext = os.path.splitext(file.filename)[-1].lower()
-    file_path = os.path.join("./uploads", file.filename)
-    os.makedirs("./uploads", exist_ok=True)
+
+    user_id = str(request.user_id)
+    filename = secure_filename(file.filename)
+    file_ext = os.path.splitext(filename)[-1].lower()
+    user_upload_dir = os.path.join("./uploads", secure_filename(user_id))
+    os.makedirs(user_upload_dir, exist_ok=True)
+    file_path = os.path.join(user_upload_dir, filename)
     file.save(file_path)
     
     try:
@@ -518,30 +2795,52 @@ def upload_file():
         else:
             return jsonify({"error": "Unsupported file format. Only PDF and PPTX are allowed."}), 400
         
-        existing_ids = collection.get()["ids"]
-        if existing_ids:
-            collection.delete(ids=existing_ids)
-        embedding = model.encode(content).tolist()
-        collection.add(documents=[content], embeddings=[embedding], ids=[file.filename])
+        chunk_count = index_document(user_id, filename, content)
         
-        return jsonify({"message": "File uploaded and processed successfully."}), 200
+        return jsonify({
+            "message": "File uploaded and processed successfully.",
+            "document": filename,
+            "chunks": chunk_count
+        }), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route("/documents", methods=["GET"])
+@require_document_owner
+def list_documents():
+    user_id = str(request.user_id)
+    metadatas = collection.get(where={"user_id": user_id}, include=["metadatas"])["metadatas"]
+    chunk_counts = {}
+    for metadata in metadatas:
+        chunk_counts[metadata["filename"]] = chunk_counts.get(metadata["filename"], 0) + 1
+    return jsonify({
+        "documents": [{"document": name, "chunks": count} for name, count in sorted(chunk_counts.items())]
+    })
+
+@app.route("/documents/<filename>", methods=["DELETE"])
+@require_document_owner
+def delete_document_endpoint(filename):
+    deleted = delete_document(str(request.user_id), secure_filename(filename))
+    if not deleted:
+        return jsonify({"error": "Document not found"}), 404
+    return jsonify({"message": "Document deleted", "chunks_deleted": deleted})
+
 @app.route("/test-audio", methods=["GET"])
 def test_audio():
     try:
         test_text = "This is a test of the text to speech system"
         logger.info("Testing text-to-speech with test message")
         
-        # Start speech in a new thread
-        speech_thread = tts_manager.start_speaking(test_text)
+        audio_id = tts_manager.submit(test_text)
         
         return jsonify({
             "message": "Audio test initiated",
             "test_text": test_text,
-            "status": "Speech initiated"
+            "audio_url": f"/audio/{audio_id}",
+            "status": "Speech rendering"
         })
+    except TTSBusyError as e:
+        return jsonify({"error": "Audio test failed", "details": str(e)}), 503
     except Exception as e:
         logger.error(f"Audio test failed: {str(e)}")
         return jsonify({
@@ -549,17 +2848,35 @@ def test_audio():
             "details": str(e)
         }), 500
 
+@app.route("/audio/<audio_id>", methods=["GET"])
+def get_audio(audio_id):
+    """Serve rendered speech; `?wait=<seconds>` (max 10) waits for audio that is still rendering."""
+    if not AUDIO_ID_PATTERN.match(audio_id):
+        return jsonify({"error": "Invalid audio id"}), 400
+
+    wait = min(max(request.args.get("wait", 0.0, type=float), 0.0), 10.0)
+    status = tts_manager.wait(audio_id, wait) if wait > 0 else tts_manager.status(audio_id)
+    if status == "ready":
+        return send_cacheable_file(tts_manager.audio_path(audio_id), mimetype="audio/wav")
+    if status == "pending":
+        return jsonify({"status": "pending"}), 202, {"Retry-After": "1"}
+    return jsonify({"error": "Audio not found"}), 404
+
 @app.route("/query", methods=["POST"])
+@require_document_owner
 def query_file():
     try:
-        data = request.get_json()
+        data = request.get_json(silent=True) or {}
+        if not isinstance(data, dict):
+            return jsonify({"error": "Request body must be a JSON object"}), 400
         query = data.get("query", "")
+        document = data.get("document")  # Optional: restrict the search to one of the caller's documents
         
         logger.info(f"Received query: {query}")
         
-        query_embedding = model.encode(query).tolist()
-        results = collection.query(query_embeddings=[query_embedding], n_results=3)
-        retrieved_texts = "\n".join(results["documents"][0])
+        retrieved_texts = "\n".join(
+            search_documents(str(request.user_id), query, filename=secure_filename(document) if document else None)
+        )
         
         prompt = f"""
         Based on the following context, please provide a clear and concise answer to the question.
@@ -570,17 +2887,25 @@ def query_file():
         Question: {query}
         """
         
-        response = genai.GenerativeModel("gemini-1.5-flash").generate_content(prompt)
+        response = get_llm_client("gemini", "gemini-1.5-flash").generate_content(prompt)
         cleaned_response = clean_response(response.text)
         
-        # Add a small delay before starting new speech
-        time.sleep(0.1)  # 100ms delay
-        
-        speech_thread = tts_manager.start_speaking(cleaned_response)
+        try:
+            audio_id = tts_manager.submit(cleaned_response)
+        except TTSBusyError:
+            # Backpressure: answer without audio rather than queueing unbounded speech work
+            return jsonify({
+                "answer": cleaned_response,
+                "voice_enabled": False,
+                "audio_url": None,
+                "status": "Speech skipped: text-to-speech is busy"
+            })
         
         return jsonify({
             "answer": cleaned_response,
             "voice_enabled": True,
+            "audio_url": f"/audio/{audio_id}",
+            "audio_status": tts_manager.status(audio_id),
             "status": "Speech initiated"
         })
         
@@ -644,7 +2969,8 @@ def query_file():
 def fetch_youtube_transcript(video_url):
     try:
         video_id = video_url.split("v=")[-1]
-        transcript = YouTubeTranscriptApi.get_transcript(video_id, languages=['en', 'hi'])
+        with stage_timer("transcript_fetch"):
+            transcript = YouTubeTranscriptApi.get_transcript(video_id, languages=['en', 'hi'])
         return " ".join([entry["text"] for entry in transcript])  # Clean transcript
     except Exception as e:
         return {"error": f"Error fetching transcript: {str(e)}"}
@@ -666,11 +2992,7 @@ def generate_mind_map(content):
     }}
     """
 
-    llm = ChatGroq(
-        model="llama-3.1-8b-instant",
-        temperature=0,
-        groq_api_key=os.getenv("GROQ_API_KEY"),
-    )      
+    llm = get_llm_client("groq", "llama-3.1-8b-instant", temperature=0)
 
     response = llm.invoke(prompt)
 
@@ -689,25 +3011,169 @@ def generate_mind_map(content):
 @app.route("/generate_mind_map", methods=['GET'])
 def generate_mind_map_endpoint():
     # print("✅ Endpoint called!")  # Debugging
-    video_url = request.args.get('video_url')
+    params = {"video_url": request.args.get('video_url')}
+    if wants_async():
+        return job_accepted_response("mind_map", params)
+    return respond_sync(run_mind_map_job, params)
+
+def run_mind_map_job(params, progress):
+    video_url = params.get('video_url')
 
     if not video_url:
-        return jsonify({"error": "No video URL provided"}), 400
+        raise JobError("No video URL provided", 400)
+
+    flight_key = single_flight.key("mind_map", normalize_video_id(video_url))
+    return single_flight.do(flight_key, lambda: build_video_mind_map(video_url, progress))
 
+def build_video_mind_map(video_url, progress):
+    progress(0.1, "Fetching transcript")
     transcript = fetch_youtube_transcript(video_url)
     if isinstance(transcript, dict) and "error" in transcript:
-        return jsonify(transcript), 400
+        raise JobError(transcript["error"], 400)
+
+    progress(0.4, "Generating mind map")
+    return generate_mind_map(transcript)
+
+job_manager.register("mind_map", run_mind_map_job)
+
+# Semantic quiz cache
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", 0.92))
+SEMANTIC_CACHE_TTL = int(os.getenv("SEMANTIC_CACHE_TTL", 7 * 24 * 3600))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", 256))
+
+def normalize_topic(topic):
+    """
+    Casefold, drop punctuation and collapse whitespace so trivial rewordings compare equal.
+    Letters and combining marks in every script are kept (Hindi vowel signs are not \\w in re), as are
+    "+" and "#" so that C, C++ and C# stay different topics.
+    """
+    raw = " ".join((topic or "").split())
+    normalized = "".join(
+        char if char.isalnum() or char in "_+#" or unicodedata.category(char).startswith("M") else " "
+        for char in unicodedata.normalize("NFKC", raw).casefold()
+    )
+    return " ".join(normalized.split()) or raw
+
+class SemanticQuizCache:
+    """
+    Reuses generated quizzes for topics whose embeddings are close enough to a stored topic.
+    Entries live in Redis buckets keyed by (difficulty, num_questions):
+      <namespace>:<difficulty>:<n>:vectors  entry id -> base64 float32 embedding
+      <namespace>:<difficulty>:<n>:entries  entry id -> JSON {topic, quiz, latency_ms}
+      <namespace>:<difficulty>:<n>:lru      entry id scored by last use, for eviction
+    Each bucket is capped at max_entries (least recently used entries are evicted) and expires after ttl.
+    """
+    def __init__(self, namespace, embeddings, threshold, ttl, max_entries):
+        self.namespace = namespace
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.counters = {"hits": 0, "misses": 0, "sets": 0, "evictions": 0, "redis_errors": 0, "saved_llm_ms": 0}
+        self._counter_lock = threading.Lock()
+        cache_registry[namespace] = self
+
+    def _count(self, name, amount=1):
+        with self._counter_lock:
+            self.counters[name] += amount
+
+    def _bucket(self, num_questions, difficulty):
+        return f"{self.namespace}:{normalize_topic(str(difficulty))}:{num_questions}"
 
-    mind_map = generate_mind_map(transcript)
-   
-    return jsonify(mind_map)
+    def embed(self, topic):
+        np = import_timed("numpy")
+        vector = np.asarray(self.embeddings.encode(normalize_topic(topic)), dtype="float32")
+        return vector / (np.linalg.norm(vector) or 1.0)
 
-llm = ChatGroq(
-    model="llama-3.1-8b-instant",
-    temperature=0,
-    groq_api_key=os.getenv("GROQ_API_KEY"),
+    def get(self, embedding, num_questions, difficulty):
+        """Return (quiz, similarity) for the closest stored topic above the threshold, else (None, best similarity)."""
+        np = import_timed("numpy")
+        bucket = self._bucket(num_questions, difficulty)
+        try:
+            stored = redis_client.hgetall(f"{bucket}:vectors")
+            if not stored:
+                self._count("misses")
+                return None, 0.0
+            entry_ids = list(stored)
+            matrix = np.stack([np.frombuffer(base64.b64decode(stored[i]), dtype="float32") for i in entry_ids])
+            scores = matrix @ embedding
+            best = int(np.argmax(scores))
+            similarity = float(scores[best])
+            if similarity < self.threshold:
+                self._count("misses")
+                return None, similarity
+            raw = redis_client.hget(f"{bucket}:entries", entry_ids[best])
+            if raw is None:
+                self._count("misses")
+                return None, similarity
+            redis_client.zadd(f"{bucket}:lru", {entry_ids[best]: time.time()})
+        except redis.RedisError as e:
+            self._count("redis_errors")
+            print(f"Semantic cache read failed for {bucket}: {e}")
+            return None, 0.0
+        entry = json.loads(raw)
+        self._count("hits")
+        self._count("saved_llm_ms", int(entry.get("latency_ms", 0)))
+        return entry["quiz"], similarity
+
+    def set(self, embedding, topic, num_questions, difficulty, quiz, latency_ms):
+        bucket = self._bucket(num_questions, difficulty)
+        entry_id = hashlib.sha256(normalize_topic(topic).encode("utf-8")).hexdigest()[:16]
+        entry = {"topic": topic, "quiz": quiz, "latency_ms": round(latency_ms)}
+        try:
+            pipe = redis_client.pipeline()
+            pipe.hset(f"{bucket}:vectors", entry_id, base64.b64encode(embedding.astype("float32").tobytes()).decode("ascii"))
+            pipe.hset(f"{bucket}:entries", entry_id, json.dumps(entry))
+            pipe.zadd(f"{bucket}:lru", {entry_id: time.time()})
+            for suffix in ("vectors", "entries", "lru"):
+                pipe.expire(f"{bucket}:{suffix}", self.ttl)
+            pipe.execute()
+            self._count("sets")
+            self._evict(bucket)
+        except redis.RedisError as e:
+            self._count("redis_errors")
+            print(f"Semantic cache write failed for {bucket}: {e}")
+
+    def _evict(self, bucket):
+        overflow = redis_client.zcard(f"{bucket}:lru") - self.max_entries
+        if overflow <= 0:
+            return
+        evicted = [entry_id for entry_id, _ in redis_client.zpopmin(f"{bucket}:lru", overflow)]
+        if evicted:
+            redis_client.hdel(f"{bucket}:vectors", *evicted)
+            redis_client.hdel(f"{bucket}:entries", *evicted)
+            self._count("evictions", len(evicted))
+
+    def stats(self):
+        with self._counter_lock:
+            counters = dict(self.counters)
+        lookups = counters["hits"] + counters["misses"]
+        counters["hit_rate"] = round(counters["hits"] / lookups, 4) if lookups else 0.0
+        counters["threshold"] = self.threshold
+        counters["ttl"] = self.ttl
+        counters["max_entries_per_bucket"] = self.max_entries
+        return counters
+
+quiz_semantic_cache = SemanticQuizCache(
+    "quiz:semantic",
+    minilm_embeddings,
+    threshold=SEMANTIC_CACHE_THRESHOLD,
+    ttl=SEMANTIC_CACHE_TTL,
+    max_entries=SEMANTIC_CACHE_MAX_ENTRIES
 )
 
+def shuffle_quiz_options(quiz):
+    """Return a copy of a cached quiz with every question's options reshuffled; answers are stored as text so stay valid."""
+    quiz = json.loads(json.dumps(quiz))
+    questions = quiz.get("questions", {}) if isinstance(quiz, dict) else {}
+    for level in (questions.values() if isinstance(questions, dict) else [questions]):
+        for question in level if isinstance(level, list) else []:
+            if isinstance(question, dict) and isinstance(question.get("options"), list):
+                random.shuffle(question["options"])
+    return quiz
+
+llm = groq_model
+
 def generate_quiz(topic: str, num_questions: int, difficulty: str):
     """Generate a quiz based on the given topic."""
     prompt = f"""
@@ -733,7 +3199,9 @@ def generate_quiz(topic: str, num_questions: int, difficulty: str):
 
 @app.route("/llm_quiz", methods=["POST"])
 def quiz_endpoint():
-    data = request.json
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({"error": "Request body must be a JSON object"}), 400
     topic = data.get("topic")
     num_questions = data.get("num_questions")
     difficulty = data.get("difficulty")
@@ -742,7 +3210,19 @@ def quiz_endpoint():
         return jsonify({"error": "Topic is required"}), 400
     
     try:
+        try:
+            topic_embedding = quiz_semantic_cache.embed(topic)
+            cached_quiz, similarity = quiz_semantic_cache.get(topic_embedding, num_questions, difficulty)
+        except Exception as e:
+            logger.warning(f"Semantic quiz cache unavailable: {str(e)}")
+            topic_embedding, cached_quiz = None, None
+        if cached_quiz is not None:
+            logger.info(f"Semantic quiz cache hit for '{topic}' (similarity {similarity:.3f})")
+            return jsonify(shuffle_quiz_options(cached_quiz))
+
+        started = time.perf_counter()
         response_content = generate_quiz(topic, num_questions, difficulty)
+        latency_ms = (time.perf_counter() - started) * 1000
 
         
         try:
@@ -755,6 +3235,9 @@ def quiz_endpoint():
                 result = json.loads(json_str)
             else:
                 return jsonify({"error": "Could not parse JSON from response"}), 500
+
+        if topic_embedding is not None:
+            quiz_semantic_cache.set(topic_embedding, topic, num_questions, difficulty, result, latency_ms)
         
         return jsonify(result)
     except Exception as e:
@@ -763,37 +3246,6 @@ def quiz_endpoint():
 
 
 
-llm = ChatGroq(
-    model="llama-3.1-8b-instant",
-    temperature=0,
-    groq_api_key=os.getenv("GROQ_API_KEY")
-)
-
-def generate_quiz(topic: str, num_questions: int, difficulty: str):
-    """Generate a quiz based on the given topic."""
-    prompt = f"""
-    Create a quiz on the topic: "{topic}". Generate {num_questions} multiple-choice questions.
-    The questions should be of {difficulty} difficulty.
-    Format the output strictly in JSON format as follows:
-    
-    {{
-       
-        "questions": {{
-            "{difficulty}": [
-                {{
-                    "question": "What is ...?",
-                    "options": ["Option 1", "Option 2", "Option 3", "Option 4"],
-                    "answer": "Option 1"
-                }}
-            ]
-        }}
-    }}
-    """
-    response = llm.invoke(prompt)
-    return response.content if hasattr(response, 'content') else response.text
-
-
-
 UPLOAD_FOLDER = "uploads"
 OUTPUT_FOLDER = "generated_papers"
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
@@ -801,82 +3253,104 @@ os.makedirs(OUTPUT_FOLDER, exist_ok=True)
 
 groq_api_key = os.getenv("GROQ_API_KEY")
 
-def extract_questions_from_pdf(pdf_path):
+# Rendered PDF cache
+PDF_CACHE_MAX_FILES = int(os.getenv("PDF_CACHE_MAX_FILES", 500))
+PDF_CACHE_MAX_MB = int(os.getenv("PDF_CACHE_MAX_MB", 512))
+# Part of every cache key; bump a template's version when its layout changes
+PDF_TEMPLATE_VERSIONS = {"question_paper": 1, "question_bank": 1}
+
+# (path, inode, size) -> sha256 of the file, used as its download ETag. Every writer in this app
+# replaces files atomically (new inode), so an entry never outlives the content it describes.
+file_content_hashes = LRUCache(max_size=2048)
+
+def file_identity_key(file_path):
+    # The mtime guards against a freed inode being reused for a different file of the same size
+    stat = os.stat(file_path)
+    return (os.path.abspath(file_path), stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+def file_content_hash(file_path):
+    key = file_identity_key(file_path)
+    content_hash = file_content_hashes.get(key)
+    if content_hash is None:
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        content_hash = digest.hexdigest()
+        file_content_hashes.set(key, content_hash)
+    return content_hash
+
+class PdfFileCache:
     """
-    Extract questions from a PDF file more robustly.
-    Handles various question formats and improves text extraction.
+    Rendered PDFs stored on disk as <sha256 of template, version and inputs>.pdf, so identical
+    papers are rendered once and concurrent users never write to the same file. Reads refresh a
+    file's mtime and writes prune the least recently used files beyond the size limits.
     """
-    try:
-        doc = fitz.open(pdf_path)
-        questions = []
-        current_question = ""
-        
-        for page in doc:
-            # Extract text with different methods for robustness
-            text = page.get_text("text")  # Primary method
-            if not text.strip():  # Fallback if text extraction fails
-                text = page.get_text("blocks")  # Extract by blocks if needed
-                text = "\n".join(block[4] for block in text if len(block) > 4)  # block[4] is the text content
-            
-            # Split text into lines and clean up
-            lines = [line.strip() for line in text.split('\n') if line.strip()]
-            
-            for line in lines:
-                # Check if line could be the start of a new question
-                is_new_question = False
-                # Pattern 1: Starts with number followed by dot or parenthesis (e.g., "1.", "1)")
-                if re.match(r'^\d+[.\)]\s', line):
-                    is_new_question = True
-                # Pattern 2: Contains a question mark and is long enough to be meaningful
-                elif '?' in line and len(line) > 10:
-                    is_new_question = True
-                
-                if is_new_question:
-                    # Save previous question if exists
-                    if current_question:
-                        questions.append(current_question.strip())
-                    current_question = line
-                elif current_question:  # Append to existing question (multi-line)
-                    current_question += " " + line
-            
-            # Append the last question on the page if exists
-            if current_question:
-                questions.append(current_question.strip())
-                current_question = ""  # Reset for next page
-        
-        # Final filtering of questions
-        filtered_questions = []
-        for q in questions:
-            # Ensure question is meaningful: has a question mark and sufficient length
-            if '?' in q and len(q) > 10:
-                # Clean up extra spaces and ensure proper encoding
-                cleaned_q = " ".join(q.split())
-                filtered_questions.append(cleaned_q)
-        
-        # If no questions found, try a more aggressive extraction as last resort
-        if not filtered_questions:
-            all_text = ""
-            for page in doc:
-                all_text += page.get_text("text") + "\n"
-            # Split by question marks and filter
-            potential_questions = [q.strip() for q in all_text.split('?') if q.strip()]
-            for pq in potential_questions:
-                if len(pq) > 10:
-                    cleaned_q = f"{pq}?".strip()  # Re-add question mark
-                    filtered_questions.append(cleaned_q)
-        
-        doc.close()
-        return filtered_questions if filtered_questions else ["No valid questions found in PDF"]
+    def __init__(self, namespace, directory, max_files, max_bytes):
+        self.namespace = namespace
+        self.directory = directory
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        self.counters = {"hits": 0, "misses": 0, "sets": 0}
+        self._counter_lock = threading.Lock()
+        cache_registry[namespace] = self
 
-    except Exception as e:
-        return [f"Error extracting questions: {str(e)}"]
+    def _count(self, name):
+        with self._counter_lock:
+            self.counters[name] += 1
+
+    def key(self, template, *parts):
+        payload = json.dumps([template, PDF_TEMPLATE_VERSIONS[template], parts], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+    def path(self, key):
+        return os.path.join(self.directory, f"{key}.pdf")
+
+    def lookup(self, key):
+        """Path of the cached PDF, marked as recently used, or None."""
+        path = self.path(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            self._count("misses")
+            return None
+        self._count("hits")
+        return path
+
+    def get(self, key):
+        path = self.lookup(key)
+        if path is None:
+            return None
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except FileNotFoundError:  # Evicted between lookup and read
+            return None
+
+    def set(self, key, data):
+        path = self.path(key)
+        temp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+        file_content_hashes.set(file_identity_key(path), hashlib.sha256(data).hexdigest())
+        self._count("sets")
+        prune_cache_dir(self.directory, max_files=self.max_files, max_bytes=self.max_bytes, suffix=".pdf")
+        return path
+
+    def stats(self):
+        with self._counter_lock:
+            counters = dict(self.counters)
+        lookups = counters["hits"] + counters["misses"]
+        counters["hit_rate"] = round(counters["hits"] / lookups, 4) if lookups else 0.0
+        counters["max_files"] = self.max_files
+        counters["max_bytes"] = self.max_bytes
+        return counters
+
+pdf_cache = PdfFileCache("pdf:rendered", OUTPUT_FOLDER, PDF_CACHE_MAX_FILES, PDF_CACHE_MAX_MB * 1024 * 1024)
 
 def generate_questions(extracted_questions, num_questions):
-    llm = ChatGroq(
-        model="llama-3.1-8b-instant",
-        temperature=0.7,
-        groq_api_key=groq_api_key
-    )
+    llm = get_llm_client("groq", "llama-3.1-8b-instant", temperature=0.7)
     
     prompt = (
         "Based on the following sample questions, generate similar academic questions that are clear, meaningful, "
@@ -898,7 +3372,9 @@ def generate_questions(extracted_questions, num_questions):
     
     return valid_questions[:num_questions]
 
-def create_question_paper(questions, filename, set_number):
+def create_question_paper(questions, set_number):
+    """Render one question paper set and return the PDF bytes."""
+    from fpdf import FPDF
     pdf = FPDF()
     pdf.set_auto_page_break(auto=True, margin=15)
     pdf.add_page()
@@ -916,7 +3392,7 @@ def create_question_paper(questions, filename, set_number):
     # Add questions with proper numbering
     pdf.set_font("Arial", size=12)
     for idx, question in enumerate(questions, 1):
-        q_text = question.split('.', 1)[1].strip() if '.' in question[:3] else question
+        q_text = strip_question_number(question)
         safe_question = f"{idx}. {q_text}".encode('latin-1', 'replace').decode('latin-1')
         pdf.multi_cell(0, 10, safe_question)
         pdf.ln(5)
@@ -927,74 +3403,363 @@ def create_question_paper(questions, filename, set_number):
     pdf.set_text_color(100, 100, 100)  # Gray text
     pdf.cell(0, 10, "Powered by QuickLearn AI", ln=True, align='C')
     
-    pdf.output(filename)
+    return bytes(pdf.output())
+
+# Parallel paper generation
+PAPER_RENDER_PROCESSES = int(os.getenv("PAPER_RENDER_PROCESSES", min(4, os.cpu_count() or 1)))  # 0 renders in-process
+
+def load_paper_render_pool():
+    from concurrent.futures import ProcessPoolExecutor
+    # forkserver/spawn avoid forking this multi-threaded process; workers re-import this module once
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return ProcessPoolExecutor(max_workers=PAPER_RENDER_PROCESSES, mp_context=multiprocessing.get_context(method))
+
+paper_render_pool = LazyResource("paper_render_pool", load_paper_render_pool)
+
+QUESTION_NUMBER_PATTERN = re.compile(r'^\s*(?:Q(?:uestion)?\s*)?\d+\s*[.):-]\s*', re.IGNORECASE)
+
+def strip_question_number(question):
+    """'12. What is x?' / 'Q3) What is x?' -> 'What is x?'"""
+    return QUESTION_NUMBER_PATTERN.sub('', question, count=1).strip()
+
+def dedupe_questions(questions):
+    """Drop repeats that differ only in numbering, spacing or case; returns the unnumbered questions in order."""
+    seen, unique = set(), []
+    for question in questions:
+        text = " ".join(strip_question_number(question).split())
+        key = text.casefold()
+        if text and key not in seen:
+            seen.add(key)
+            unique.append(text)
+    return unique
+
+def generate_questions_parallel(extracted_questions, total_questions, questions_per_set):
+    """Split generation into one batch per paper set (the last may be smaller) and run them concurrently on llm_pool."""
+    batch_size = max(1, questions_per_set)
+    sizes = [batch_size] * (total_questions // batch_size)
+    if total_questions % batch_size:
+        sizes.append(total_questions % batch_size)
+
+    futures = []
+    for i, size in enumerate(sizes):
+        # Rotate the samples so batches do not all imitate the same five questions
+        offset = (i * 5) % max(len(extracted_questions), 1)
+        samples = extracted_questions[offset:] + extracted_questions[:offset]
+        futures.append(llm_pool.submit(generate_questions, samples, size))
+
+    questions = []
+    for future in futures:
+        try:
+            questions.extend(future.result())
+        except Exception as e:
+            logger.error(f"Question batch failed: {str(e)}")
+    return dedupe_questions(questions)
+
+def map_on_process_pool(func, jobs):
+    """
+    Return [func(*job) for job in jobs], computed on paper_render_pool when there is more than one job.
+    If the pool fails the jobs run in-process instead, and a broken pool (e.g. a crashed worker) is
+    reset so the next call starts fresh workers.
+    """
+    if PAPER_RENDER_PROCESSES > 0 and len(jobs) > 1:
+        try:
+            futures = [paper_render_pool.submit(func, *job) for job in jobs]
+            return [future.result() for future in futures]
+        except Exception as e:
+            logger.warning(f"Process pool failed running {func.__name__}, running in-process: {str(e)}")
+            if type(e).__name__ == "BrokenProcessPool":
+                paper_render_pool.reset()
+    return [func(*job) for job in jobs]
+
+@timed_stage("pdf_render", "fpdf")
+def render_question_papers(papers):
+    """
+    Return the cached PDF path of each (questions, set_number) paper. Papers not in pdf_cache are
+    rendered on the process pool.
+    """
+    keys = [pdf_cache.key("question_paper", questions, set_number) for questions, set_number in papers]
+    paths = [pdf_cache.lookup(key) for key in keys]
+    missing = [i for i, path in enumerate(paths) if path is None]
+    rendered = map_on_process_pool(create_question_paper, [papers[i] for i in missing])
+    for i, pdf_data in zip(missing, rendered):
+        paths[i] = pdf_cache.set(keys[i], pdf_data)
+    return paths
+
+# Parsed question-paper cache
+PDF_PARALLEL_PAGES = int(os.getenv("PDF_PARALLEL_PAGES", 40))  # PDFs with more pages are split across the process pool
+# v2: entries no longer hold placeholder strings such as "No valid questions found in PDF"
+paper_questions_cache = TieredCache(
+    "paper:questions:v2",
+    ttl=int(os.getenv("PAPER_QUESTIONS_CACHE_TTL", 30 * 24 * 3600)),
+    local_size=int(os.getenv("PAPER_QUESTIONS_CACHE_LOCAL_SIZE", 64))
+)
+# (path, size, mtime) -> content hash, so regenerating from the same upload never re-reads the file
+paper_file_hashes = LRUCache(max_size=1024)
+
+def save_and_hash_upload(file, file_path):
+    """Stream an upload to disk while hashing it; returns the sha256 of the content."""
+    digest = hashlib.sha256()
+    with open(file_path, "wb") as f:
+        for chunk in iter(lambda: file.stream.read(1024 * 1024), b""):
+            digest.update(chunk)
+            f.write(chunk)
+    content_hash = digest.hexdigest()
+    paper_file_hashes.set(file_stat_key(file_path), content_hash)
+    return content_hash
+
+def file_stat_key(file_path):
+    stat = os.stat(file_path)
+    return (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+
+def paper_content_hash(file_path):
+    """Content hash recorded at upload time, or computed once for files that predate it."""
+    key = file_stat_key(file_path)
+    content_hash = paper_file_hashes.get(key)
+    if content_hash is None:
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        content_hash = digest.hexdigest()
+        paper_file_hashes.set(key, content_hash)
+    return content_hash
+
+def extract_questions_from_text(text):
+    """Collect the questions that start on one page; multi-line questions are joined."""
+    questions = []
+    current_question = ""
+    lines = [line.strip() for line in text.split('\n') if line.strip()]
+    for line in lines:
+        # Check if line could be the start of a new question
+        is_new_question = False
+        # Pattern 1: Starts with number followed by dot or parenthesis (e.g., "1.", "1)")
+        if re.match(r'^\d+[.\)]\s', line):
+            is_new_question = True
+        # Pattern 2: Contains a question mark and is long enough to be meaningful
+        elif '?' in line and len(line) > 10:
+            is_new_question = True
+
+        if is_new_question:
+            # Save previous question if exists
+            if current_question:
+                questions.append(current_question.strip())
+            current_question = line
+        elif current_question:  # Append to existing question (multi-line)
+            current_question += " " + line
+
+    # Append the last question on the page if exists
+    if current_question:
+        questions.append(current_question.strip())
+    return questions
+
+def extract_questions_from_pages(pdf_path, start=0, stop=None):
+    """
+    Single pass over pages [start, stop): returns (questions, plain page text).
+    The plain text is kept for the last-resort fallback so pages are never read twice.
+    Module-level so the process pool can run it on page ranges of large PDFs.
+    """
+    import fitz
+    questions, page_texts = [], []
+    with fitz.open(pdf_path) as doc:
+        stop = doc.page_count if stop is None else min(stop, doc.page_count)
+        for page_number in range(start, stop):
+            page = doc[page_number]
+            # Extract text with different methods for robustness
+            text = page.get_text("text")  # Primary method
+            page_texts.append(text)
+            if not text.strip():  # Fallback if text extraction fails
+                blocks = page.get_text("blocks")  # Extract by blocks if needed
+                text = "\n".join(block[4] for block in blocks if len(block) > 4)  # block[4] is the text content
+            questions.extend(extract_questions_from_text(text))
+    return questions, "\n".join(page_texts) + "\n" if page_texts else ""
+
+@timed_stage("pdf_parse", "fitz")
+def extract_questions_from_pdf(pdf_path, content_hash=None):
+    """
+    Extract questions from a PDF file more robustly.
+    Handles various question formats and improves text extraction.
+    Results are cached by content hash, so regenerating papers from the same PDF skips parsing.
+    Returns [] when the PDF has no questions; read errors are raised to the caller.
+    """
+    content_hash = content_hash or paper_content_hash(pdf_path)
+    cache_key = paper_questions_cache.key(content_hash)
+    cached = paper_questions_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    import fitz
+    with fitz.open(pdf_path) as doc:
+        page_count = doc.page_count
+
+    if page_count > PDF_PARALLEL_PAGES and PAPER_RENDER_PROCESSES > 1:
+        step = -(-page_count // PAPER_RENDER_PROCESSES)
+        page_ranges = [(pdf_path, start, start + step) for start in range(0, page_count, step)]
+    else:
+        page_ranges = [(pdf_path,)]
+    results = map_on_process_pool(extract_questions_from_pages, page_ranges)
+    questions = [q for page_questions, _ in results for q in page_questions]
+    
+    # Final filtering of questions
+    filtered_questions = []
+    for q in questions:
+        # Ensure question is meaningful: has a question mark and sufficient length
+        if '?' in q and len(q) > 10:
+            # Clean up extra spaces and ensure proper encoding
+            cleaned_q = " ".join(q.split())
+            filtered_questions.append(cleaned_q)
+    
+    # If no questions found, try a more aggressive extraction as last resort
+    if not filtered_questions:
+        all_text = "".join(text for _, text in results)
+        # Split by question marks and filter
+        potential_questions = [q.strip() for q in all_text.split('?') if q.strip()]
+        for pq in potential_questions:
+            if len(pq) > 10:
+                cleaned_q = f"{pq}?".strip()  # Re-add question mark
+                filtered_questions.append(cleaned_q)
+    
+    paper_questions_cache.set(cache_key, filtered_questions)
+    return filtered_questions
 
 @app.route('/paper_upload', methods=['POST'])
 def upload_pdf():
     if 'file' not in request.files:
         return jsonify({"error": "No file uploaded"}), 400
     file = request.files['file']
-    file_path = os.path.join(UPLOAD_FOLDER, file.filename)
-    file.save(file_path)
-    return jsonify({"message": "File uploaded successfully", "file_path": file_path})
+    file_path = os.path.join(UPLOAD_FOLDER, secure_filename(file.filename))
+    content_hash = save_and_hash_upload(file, file_path)
+    return jsonify({"message": "File uploaded successfully", "file_path": file_path, "content_hash": content_hash})
 
 @app.route('/generate_paper', methods=['POST'])
 def generate_papers():
-    data = request.json
-    pdf_path = data.get("file_path")
-    num_questions = data.get("num_questions", 10)
-    num_papers = data.get("num_papers", 1)
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({"error": "Request body must be a JSON object"}), 400
+    params = {key: value for key, value in data.items() if key != 'async'}
+    if wants_async():
+        return job_accepted_response("paper", params)
+    return respond_sync(run_generate_paper_job, params)
+
+def run_generate_paper_job(params, progress):
+    pdf_path = params.get("file_path")
+    num_questions = params.get("num_questions", 10)
+    num_papers = params.get("num_papers", 1)
     
     if not pdf_path or not os.path.exists(pdf_path):
-        return jsonify({"error": "Invalid file path"}), 400
+        raise JobError("Invalid file path", 400)
     
     try:
-        extracted_questions = extract_questions_from_pdf(pdf_path)
+        timings = {}
+        started = time.perf_counter()
+        progress(0.05, "Extracting questions")
+        try:
+            extracted_questions = extract_questions_from_pdf(pdf_path)
+        except Exception as e:
+            raise JobError(f"Could not read PDF: {str(e)}", 400)
         if not extracted_questions:
-            return jsonify({"error": "No valid questions found in PDF"}), 400
-        
-        generated_questions = generate_questions(extracted_questions, num_questions * num_papers)
-        all_questions = extracted_questions + generated_questions
+            raise JobError("No valid questions found in PDF", 400)
+        timings["extract_ms"] = round((time.perf_counter() - started) * 1000)
+
+        stage_started = time.perf_counter()
+        progress(0.15, "Generating questions")
+        needed = num_questions * num_papers
+        generated_questions = generate_questions_parallel(extracted_questions, needed, num_questions)
+        all_questions = dedupe_questions(extracted_questions + generated_questions)
+        if len(all_questions) < needed:
+            # One parallel top-up round instead of a blocking call per short set
+            top_up = generate_questions_parallel(extracted_questions, needed - len(all_questions), num_questions)
+            all_questions = dedupe_questions(all_questions + top_up)
         random.shuffle(all_questions)
+        timings["generate_ms"] = round((time.perf_counter() - stage_started) * 1000)
         
-        pdf_paths = []
+        papers = []
         for i in range(num_papers):
             start_idx = i * num_questions
             end_idx = start_idx + num_questions
             if start_idx >= len(all_questions):
                 break
-                
-            selected_questions = all_questions[start_idx:end_idx]
-            if len(selected_questions) < num_questions:
-                remaining = num_questions - len(selected_questions)
-                extra_questions = generate_questions(extracted_questions, remaining)
-                selected_questions.extend(extra_questions)
-            
-            paper_path = os.path.join(OUTPUT_FOLDER, f"question_paper_set_{i+1}.pdf")
-            create_question_paper(selected_questions, paper_path, i + 1)
-            pdf_paths.append(paper_path)
+            papers.append((all_questions[start_idx:end_idx], i + 1))
+
+        stage_started = time.perf_counter()
+        progress(0.8, "Rendering papers")
+        paper_paths = render_question_papers(papers)
+        timings["render_ms"] = round((time.perf_counter() - stage_started) * 1000)
+        timings["total_ms"] = round((time.perf_counter() - started) * 1000)
+        logger.info(f"Generated {len(papers)} papers: {timings}")
         
-        return jsonify({"message": "Papers generated", "files": pdf_paths})
+        return {"message": "Papers generated", "files": paper_paths, "timings": timings}
     
+    except JobError:
+        raise
     except Exception as e:
-        return jsonify({"error": f"An error occurred: {str(e)}"}), 500
+        raise JobError(f"An error occurred: {str(e)}", 500)
+
+job_manager.register("paper", run_generate_paper_job)
+
+# Downloads
+# Content-addressed files (named by a hash of what they contain) never change under their name
+CONTENT_ADDRESSED_NAME = re.compile(r'^[0-9a-f]{32,64}\.\w+$')
+IMMUTABLE_CACHE_CONTROL = os.getenv("IMMUTABLE_CACHE_CONTROL", "public, max-age=31536000, immutable")
+# Other files may be regenerated under the same name, so caches must revalidate (cheap: 304 on ETag match)
+DOWNLOAD_CACHE_CONTROL = {
+    ".pdf": os.getenv("PDF_CACHE_CONTROL", "public, no-cache"),
+    ".wav": os.getenv("AUDIO_CACHE_CONTROL", "public, max-age=86400"),
+}
+DEFAULT_CACHE_CONTROL = "private, no-cache"
+
+def cache_control_for(file_path):
+    name = os.path.basename(file_path)
+    if CONTENT_ADDRESSED_NAME.match(name):
+        return IMMUTABLE_CACHE_CONTROL
+    return DOWNLOAD_CACHE_CONTROL.get(os.path.splitext(name)[1].lower(), DEFAULT_CACHE_CONTROL)
+
+def send_cacheable_file(file_path, **kwargs):
+    """
+    send_file with a strong ETag from the content hash, Cache-Control by file type, and werkzeug's
+    conditional handling: If-None-Match / If-Modified-Since answer 304, Range / If-Range answer 206.
+    """
+    response = send_file(file_path, etag=file_content_hash(file_path), conditional=True, **kwargs)
+    response.headers["Cache-Control"] = cache_control_for(file_path)
+    response.headers.setdefault("Accept-Ranges", "bytes")  # werkzeug only adds it to range responses
+    return response
 
 @app.route('/download/<filename>', methods=['GET'])
 def download_paper(filename):
-    file_path = os.path.join(OUTPUT_FOLDER, filename)
-    if os.path.exists(file_path):
-        return send_file(file_path, as_attachment=True)
+    file_path = os.path.join(OUTPUT_FOLDER, secure_filename(filename))
+    if os.path.isfile(file_path):
+        return send_cacheable_file(file_path, as_attachment=True)
     return jsonify({"error": "File not found"}), 404
 
 @app.route('/', methods=['GET'])
 def health():
     return jsonify({"status": "ok"}) 
 
+@app.route('/startup_report', methods=['GET'])
+def startup_report():
+    return jsonify({
+        "timings": dict(sorted(startup_timings.items(), key=lambda item: item[1], reverse=True)),
+        "resources": {name: resource.loaded for name, resource in lazy_resources.items()},
+        "modules_loaded": [name for name in LAZY_MODULES if name in sys.modules]
+    })
+
+@app.route('/embedding_stats', methods=['GET'])
+def embedding_stats():
+    return jsonify({name: service.stats() for name, service in embedding_services.items()})
+
+@app.route('/cache_stats', methods=['GET'])
+def cache_stats():
+    return jsonify({name: cache.stats() for name, cache in cache_registry.items()})
+
 def initialize_question_bank_agent():
     try:
+        from agno.agent import Agent
+        from agno.models.groq import Groq
+        from agno.tools.duckduckgo import DuckDuckGoTools
         groq_model = Groq(
             id="llama3-70b-8192",
-            api_key=groq_api_key
+            api_key=groq_api_key,
+            base_url=GROQ_BASE_URL,
+            http_client=llm_http_client.load()  # Reuse the pooled connections
         )
         agent = Agent(
             model=groq_model,
@@ -1011,72 +3776,111 @@ def initialize_question_bank_agent():
     except Exception as e:
         raise Exception(f"Error initializing agent: {str(e)}")
 
+# Question-bank agents
+QUESTION_BANK_AGENTS = int(os.getenv("QUESTION_BANK_AGENTS", 4))
+QUESTION_BANK_AGENT_WAIT = float(os.getenv("QUESTION_BANK_AGENT_WAIT", 60))  # Seconds to wait for a free agent
+
+class AgentPool:
+    """
+    Pre-built agents handed out one request at a time, so each run has its agent to itself.
+    Agents are built on first demand up to `size`; after each run the agent's memory is cleared
+    so one student's prompt never leaks into the next run.
+    """
+    def __init__(self, factory, size, wait_timeout):
+        self.factory = factory
+        self.size = size
+        self.wait_timeout = wait_timeout
+        self.idle = queue.LifoQueue()  # Most recently used first, keeping its HTTP connection warm
+        self.built = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def agent(self):
+        agent = self._acquire()
+        try:
+            yield agent
+        finally:
+            self._reset(agent)
+            self.idle.put(agent)
+
+    def _acquire(self):
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            build = self.built < self.size
+            if build:
+                self.built += 1
+        if build:
+            try:
+                return self.factory()
+            except Exception:
+                with self._lock:
+                    self.built -= 1
+                raise
+        try:
+            return self.idle.get(timeout=self.wait_timeout)
+        except queue.Empty:
+            raise JobError("All question-bank agents are busy, please retry shortly", 503)
+
+    def _reset(self, agent):
+        memory = getattr(agent, "memory", None)
+        if memory is not None and hasattr(memory, "clear"):
+            memory.clear()
+
+    def stats(self):
+        return {"size": self.size, "built": self.built, "idle": self.idle.qsize()}
+
+question_bank_agents = AgentPool(initialize_question_bank_agent, QUESTION_BANK_AGENTS, QUESTION_BANK_AGENT_WAIT)
+
+# Agent answers may carry terminal colour codes and tool-call transcripts; both are dropped
+AGENT_NOISE_PATTERN = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])|<tool-use>.*?</tool-use>', re.DOTALL)
+# A numbered question ("1." or "1)") at the start of a line runs until the next one or the end
+AGENT_QUESTION_PATTERN = re.compile(r'^[ \t]*\d+[.)][ \t]+(.+?)(?=^[ \t]*\d+[.)][ \t]|\Z)', re.MULTILINE | re.DOTALL)
+
+def parse_agent_questions(content):
+    """Numbered questions from an agent answer, renumbered from 1, one paragraph each."""
+    content = AGENT_NOISE_PATTERN.sub('', content)
+    questions = []
+    for match in AGENT_QUESTION_PATTERN.finditer(content):
+        text = unicodedata.normalize('NFKD', match.group(1)).encode('ascii', 'ignore').decode('ascii')
+        text = " ".join(text.split())
+        if text:
+            questions.append(f"{len(questions) + 1}. {text}")
+    return questions
+
 def get_agent_response(agent, prompt):
     try:
-        buffer = io.StringIO()
-        with redirect_stdout(buffer):
-            agent.print_response(prompt)
-        response = buffer.getvalue()
-        
-        if not response:
+        with stage_timer("llm", "agno/groq/llama3-70b-8192"):
+            response = agent.run(prompt, stream=False)
+        content = getattr(response, "content", response)
+
+        if not content:
             raise Exception("No response received from agent")
-        
-        cleaned = unicodedata.normalize('NFKD', response).encode('ascii', 'ignore').decode('ascii')
-        cleaned = re.sub(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])', '', cleaned)
-        cleaned = re.sub(r'Running:.*?\n', '', cleaned)
-        cleaned = re.sub(r'Response:?\s*', '', cleaned)
-        cleaned = re.sub(r'<tool-use>.*?</tool-use>', '', cleaned, flags=re.DOTALL)
-        cleaned = re.sub(r'\(\d+\.\d+s\)', '', cleaned)
-        cleaned = re.sub(r'Here are \d+ practice problems.*?:(?=\n)', '', cleaned)
-        cleaned = re.sub(r'1\., 2\., etc\.\).*?\n', '', cleaned)
-        cleaned = re.sub(r'Make each question clear and well-formatted.*?numerical questions over theory\.', '', cleaned)
-        cleaned = re.sub(r'\n\s*\n', '\n\n', cleaned)
-        cleaned = re.sub(r'\s+', ' ', cleaned)
-        cleaned = cleaned.strip()
-        
-        questions = []
-        current_question = ""
-        for line in cleaned.split('\n'):
-            line = line.strip()
-            if not line:
-                continue
-            if re.match(r'^\d+\.', line):
-                if current_question:
-                    questions.append(current_question.strip())
-                current_question = line
-            elif current_question:
-                current_question += " " + line
-        
-        if current_question:
-            questions.append(current_question.strip())
-        
-        if not questions:
-            matches = re.findall(r'(\d+\..*?)(?=\d+\.|$)', cleaned, re.DOTALL)
-            questions = [q.strip() for q in matches]
-        
+
+        questions = parse_agent_questions(str(content))
         if not questions:
             return "1. Error: No questions could be generated. Please try again."
-        
-        formatted_questions = []
-        for i, q in enumerate(questions, 1):
-            q = q.strip()
-            if not re.match(r'^\d+\.', q):
-                q = f"{i}. {q}"
-            formatted_questions.append(q)
-        
-        return "\n\n".join(formatted_questions)
-        
+
+        return "\n\n".join(questions)
+
     except Exception as e:
         return f"1. An error occurred while generating questions: {str(e)}"
 
+@timed_stage("pdf_render", "reportlab")
 def create_question_bank_pdf(text, subject):
-    question_bank_dir = os.path.join(os.getcwd(), "generated_papers")
-    os.makedirs(question_bank_dir, exist_ok=True)
-    
-    filename = os.path.join(question_bank_dir, f"{subject.replace(' ', '_')}_Questions.pdf")
+    """Render the question bank and return the PDF bytes."""
+    from reportlab.lib.pagesizes import letter
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib.colors import HexColor
+    from reportlab.lib.units import inch
+
+    buffer = io.BytesIO()
     
     try:
-        doc = SimpleDocTemplate(filename, pagesize=letter,
+        doc = SimpleDocTemplate(buffer, pagesize=letter,
                               rightMargin=72, leftMargin=72,
                               topMargin=72, bottomMargin=72)
         
@@ -1129,7 +3933,7 @@ def create_question_bank_pdf(text, subject):
         
         doc.build(elements, onFirstPage=add_watermark_and_background, onLaterPages=add_watermark_and_background)
         
-        return filename
+        return buffer.getvalue()
     
     except Exception as e:
         raise Exception(f"Error building PDF: {str(e)}")
@@ -1140,22 +3944,40 @@ def generate_question_bank():
     if request.method == 'OPTIONS':
         return jsonify({'status': 'ok'}), 200
         
+    if not request.is_json:
+        return jsonify({"error": "Request must be JSON"}), 400
+
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({"error": "Request body must be a JSON object"}), 400
+
+    params = {"topic": data.get('topic')}
+    if wants_async():
+        return job_accepted_response("question_bank", params)
+
+    try:
+        subject, pdf_data, _ = build_question_bank(params, lambda fraction, message=None: None)
+        return send_file(
+            io.BytesIO(pdf_data),
+            as_attachment=True,
+            download_name=f"{subject.replace(' ', '_')}_Questions.pdf",
+            mimetype='application/pdf'
+        )
+    except JobError as e:
+        return jsonify({"error": e.message}), e.status
+
+def build_question_bank(params, progress):
+    """Generate the question bank PDF; returns (subject, pdf bytes, cached pdf path)."""
+    subject = params.get('topic')
+    
+    if not subject or not isinstance(subject, str):
+        raise JobError("Invalid or missing 'topic' in payload", 400)
+    
+    subject = subject.strip()
+    if not subject:
+        raise JobError("Topic cannot be empty", 400)
+    
     try:
-        if not request.is_json:
-            return jsonify({"error": "Request must be JSON"}), 400
-        
-        data = request.get_json()
-        subject = data.get('topic')
-        
-        if not subject or not isinstance(subject, str):
-            return jsonify({"error": "Invalid or missing 'topic' in payload"}), 400
-        
-        subject = subject.strip()
-        if not subject:
-            return jsonify({"error": "Topic cannot be empty"}), 400
-        
-        agent = initialize_question_bank_agent()
-        
         prompt = (
             f"Create 10 challenging practice problems on {subject}. "
             "Number each question with a number and period (1., 2., etc.). "
@@ -1164,41 +3986,82 @@ def generate_question_bank():
             "Focus on numerical questions over theoretical ones."
         )
  
-        result_text = get_agent_response(agent, prompt)
+        progress(0.1, "Generating questions")
+        with question_bank_agents.agent() as agent:
+            result_text = get_agent_response(agent, prompt)
         
         if result_text.startswith("1. Error:") or result_text.startswith("1. An error occurred"):
-            return jsonify({"error": "Failed to generate questions"}), 500
+            raise JobError("Failed to generate questions", 500)
         
-        pdf_path = create_question_bank_pdf(result_text, subject)
-        
-        return send_file(
-            pdf_path,
-            as_attachment=True,
-            download_name=f"{subject.replace(' ', '_')}_Questions.pdf",
-            mimetype='application/pdf'
-        )
+        progress(0.8, "Building PDF")
+        cache_key = pdf_cache.key("question_bank", subject, result_text)
+        pdf_data = pdf_cache.get(cache_key)
+        if pdf_data is None:
+            pdf_data = create_question_bank_pdf(result_text, subject)
+            pdf_path = pdf_cache.set(cache_key, pdf_data)
+        else:
+            pdf_path = pdf_cache.path(cache_key)
+        return subject, pdf_data, pdf_path
     
+    except JobError:
+        raise
     except Exception as e:
-        return jsonify({"error": f"Server error: {str(e)}"}), 500
+        raise JobError(f"Server error: {str(e)}", 500)
+
+def run_question_bank_job(params, progress):
+    _, _, pdf_path = build_question_bank(params, progress)
+    filename = os.path.basename(pdf_path)
+    return {"file": filename, "download_url": f"/download/{filename}"}
+
+job_manager.register("question_bank", run_question_bank_job)
     
+# Serper video search
+SERPER_URL = os.getenv("SERPER_URL", "https://google.serper.dev/videos")
+SERPER_TIMEOUT = float(os.getenv("SERPER_TIMEOUT", 5))  # Per-call connect/read timeout in seconds
+SERPER_DEADLINE = float(os.getenv("SERPER_DEADLINE", 8))  # Overall budget for one /youtube_videos request
+SERPER_POOL_SIZE = int(os.getenv("SERPER_POOL_SIZE", 8))
+SERPER_RESULTS_PER_TOPIC = 10
+
+def load_serper_session():
+    from requests.adapters import HTTPAdapter
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=SERPER_POOL_SIZE)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({"Content-Type": "application/json"})
+    return session
+
+# One keep-alive session shared by every lookup
+serper_session = LazyResource("serper_session", load_serper_session)
+serper_pool = ContextThreadPoolExecutor(max_workers=SERPER_POOL_SIZE, thread_name_prefix="serper")
+serper_cache = TieredCache(
+    "serper:videos",
+    ttl=int(os.getenv("SERPER_CACHE_TTL", 24 * 3600)),
+    local_size=int(os.getenv("SERPER_CACHE_LOCAL_SIZE", 512))
+)
+
 def search_youtube_videos(topic, max_results=3):
-    url = "https://google.serper.dev/videos"
+    """Return video links for a topic. Timeouts are raised so callers can report them; other errors give []."""
+    cache_key = serper_cache.key(normalize_topic(topic))
+    cached = serper_cache.get(cache_key)
+    if cached is not None:
+        return cached[:max_results]
+
     payload = {"q": f"{topic} tutorial"}
-    headers = {
-        "X-API-KEY": os.environ["SERPER_API_KEY"],
-        "Content-Type": "application/json"
-    }
+    headers = {"X-API-KEY": os.environ["SERPER_API_KEY"]}
     try:
-        response = requests.post(url, json=payload, headers=headers)
+        response = serper_session.post(SERPER_URL, json=payload, headers=headers, timeout=SERPER_TIMEOUT)
         response.raise_for_status()
         data = response.json()
         
         if "videos" not in data:
             return []
         
-        # Extract up to max_results URLs
-        urls = [video.get("link", "") for video in data.get("videos", [])[:max_results]]
-        return urls
+        urls = [video.get("link", "") for video in data.get("videos", [])[:SERPER_RESULTS_PER_TOPIC]]
+        serper_cache.set(cache_key, urls)
+        return urls[:max_results]
+    except requests.Timeout:
+        raise
     except requests.RequestException as e:
         print(f"Serper API error for {topic}: {e}")
         return []
@@ -1213,8 +4076,8 @@ def youtube_videos():
         return jsonify({'status': 'ok'}), 200
 
     try:
-        data = request.json
-        if not data or 'topic' not in data:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict) or 'topic' not in data:
             return jsonify({
                 "success": False,
                 "error": "Missing 'topics' in JSON body"
@@ -1231,16 +4094,41 @@ def youtube_videos():
                 "success": False,
                 "error": "'topics' must be a non-empty list"
             }), 400
+
+        if not all(isinstance(topic, str) and topic.strip() for topic in topics):
+            return jsonify({
+                "success": False,
+                "error": "Every topic must be a non-empty string"
+            }), 400
         
+        # Look topics up concurrently; whatever has not finished by the deadline is reported as timed out
+        futures = {topic: serper_pool.submit(search_youtube_videos, topic, 3) for topic in dict.fromkeys(topics)}
+        wait(futures.values(), timeout=SERPER_DEADLINE)
+
         result = {}
-        for topic in topics:
-            video_urls = search_youtube_videos(topic, max_results=3)
+        timed_out = []
+        for topic, future in futures.items():
+            if not future.done():
+                future.cancel()
+                timed_out.append(topic)
+                result[topic] = []
+                continue
+            try:
+                video_urls = future.result()
+            except requests.Timeout:
+                timed_out.append(topic)
+                video_urls = []
             valid_urls = [url for url in video_urls if is_valid_youtube_url(url)]
             result[topic] = valid_urls[:3]
         
+        if timed_out:
+            logger.warning(f"Serper lookups timed out for {timed_out}")
+
         return jsonify({
             "success": True,
-            "data": result
+            "data": result,
+            "partial": bool(timed_out),
+            "timed_out": timed_out
         })
     
     except ValueError as e:
@@ -1255,6 +4143,18 @@ def youtube_videos():
             "error": str(e)
         }), 500
 
+startup_timings["app_module_total"] = round(time.perf_counter() - _import_started, 3)
+logger.info(f"app.py imported in {startup_timings['app_module_total']}s")
+
+# WARMUP_RESOURCES=all (or a comma-separated list of resource/module names) preloads in the background
+# Background threads only run in the server process, not in paper render workers
+if os.getenv("WARMUP_RESOURCES") and multiprocessing.parent_process() is None:
+    warmup_names = None if os.getenv("WARMUP_RESOURCES") == "all" else set(os.getenv("WARMUP_RESOURCES").split(","))
+    Thread(target=warm_up, args=(warmup_names,), name="warm-up", daemon=True).start()
+
+if RECOMMENDATION_REFRESH_INTERVAL > 0 and multiprocessing.parent_process() is None:
+    Thread(target=recommendation_refresher, name="recommendation-refresher", daemon=True).start()
+
 if __name__ == '__main__':
     app.run(debug=True, port=5001)
     
\ No newline at end of file
@@ -0,0 +1,132 @@
+"""
+Deterministic fixtures for the benchmarks, generated on the fly so nothing binary is checked in.
+"""
+import hashlib
+import os
+import random
+
+SIZES = {
+    "small": {"pages": 2, "questions_per_page": 5, "slides": 5, "paragraphs": 20},
+    "medium": {"pages": 20, "questions_per_page": 8, "slides": 40, "paragraphs": 200},
+    "large": {"pages": 100, "questions_per_page": 10, "slides": 200, "paragraphs": 1000},
+}
+
+WORDS = (
+    "algorithm binary tree graph matrix vector integral derivative energy momentum photosynthesis cell "
+    "protein reaction equilibrium theorem proof function variable sequence series probability sample "
+    "distribution network protocol memory cache process thread kernel compiler syntax semantics"
+).split()
+
+def sentence(rng, words=12):
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize()
+
+def question_lines(count, seed=0):
+    """Numbered exam-style questions, some wrapped over two lines like real papers."""
+    rng = random.Random(seed)
+    lines = []
+    for i in range(1, count + 1):
+        if i % 3 == 0:
+            lines.append(f"{i}. {sentence(rng, 10)}")
+            lines.append(f"{sentence(rng, 6).lower()}?")
+        else:
+            lines.append(f"{i}. {sentence(rng, 14)}?")
+    return lines
+
+def write_question_pdf(path, pages, questions_per_page, seed=0):
+    """A sample question paper in the format /paper_upload receives."""
+    from fpdf import FPDF
+    pdf = FPDF()
+    pdf.set_font("Helvetica", size=11)
+    lines = question_lines(pages * questions_per_page, seed)
+    per_page = len(lines) // pages
+    for page in range(pages):
+        pdf.add_page()
+        for line in lines[page * per_page:(page + 1) * per_page]:
+            pdf.multi_cell(0, 8, line, new_x="LMARGIN", new_y="NEXT")
+    pdf.output(path)
+    return path
+
+def write_document_pdf(path, paragraphs, seed=0):
+    """A prose document in the format /upload receives."""
+    from fpdf import FPDF
+    rng = random.Random(seed)
+    pdf = FPDF()
+    pdf.set_font("Helvetica", size=11)
+    pdf.add_page()
+    for _ in range(paragraphs):
+        pdf.multi_cell(0, 6, ". ".join(sentence(rng) for _ in range(4)) + ".", new_x="LMARGIN", new_y="NEXT")
+    pdf.output(path)
+    return path
+
+def write_pptx(path, slides, seed=0):
+    from pptx import Presentation
+    from pptx.util import Inches
+    rng = random.Random(seed)
+    prs = Presentation()
+    layout = prs.slide_layouts[1]
+    for i in range(slides):
+        slide = prs.slides.add_slide(layout)
+        slide.shapes.title.text = f"Slide {i + 1}: {sentence(rng, 4)}"
+        slide.placeholders[1].text = "\n".join(sentence(rng) for _ in range(5))
+        box = slide.shapes.add_textbox(Inches(1), Inches(6), Inches(8), Inches(1))
+        box.text = sentence(rng, 20)
+    prs.save(path)
+    return path
+
+def llm_html_response(paragraphs, seed=0):
+    """An LLM answer with the markup and entities clean_response strips."""
+    rng = random.Random(seed)
+    parts = []
+    for i in range(paragraphs):
+        parts.append(f"<p><b>{sentence(rng, 3)}</b> &amp; {sentence(rng)} &lt;note&gt; *{sentence(rng, 5)}*</p>\n\n")
+        if i % 4 == 0:
+            parts.append(f"<ul><li>{sentence(rng, 6)}</li><li>{sentence(rng, 6)} (see §{i})</li></ul>\n")
+    return "".join(parts)
+
+def agent_answer(questions, seed=0):
+    """Content of agent.run(): an intro line, a tool-call transcript and numbered questions, some wrapped."""
+    rng = random.Random(seed)
+    lines = [f"<tool-use>{sentence(rng, 30)}</tool-use>", f"Here are {questions} practice problems on the topic:", ""]
+    for i in range(1, questions + 1):
+        if i % 4 == 0:
+            lines.append(f"{i}. {sentence(rng, 10)}")
+            lines.append(f"   {sentence(rng, 8).lower()} (≈ {i}.5 units)?")
+        else:
+            lines.append(f"{i}. {sentence(rng, 16)}?")
+    return "\n".join(lines)
+
+class FakeEncoder:
+    """
+    Offline stand-in for SentenceTransformer: unit vectors from an RNG seeded with a blake2b digest
+    of the text, so a text maps to the same vector in every run regardless of PYTHONHASHSEED.
+    """
+    def __init__(self, dimension=768):
+        self.dimension = dimension
+
+    def get_sentence_embedding_dimension(self):
+        return self.dimension
+
+    def encode(self, texts, batch_size=32, **kwargs):
+        import numpy as np
+        single = isinstance(texts, str)
+        texts = [texts] if single else texts
+        vectors = np.empty((len(texts), self.dimension), dtype="float32")
+        for row, text in enumerate(texts):
+            seed = int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+            vector = np.random.default_rng(seed).standard_normal(self.dimension)
+            vectors[row] = vector / np.linalg.norm(vector)
+        return vectors[0] if single else vectors
+
+def build_fixtures(directory):
+    """Write every file fixture once per size; returns {size: {kind: path}}."""
+    os.makedirs(directory, exist_ok=True)
+    fixtures = {}
+    for size, spec in SIZES.items():
+        fixtures[size] = {
+            "question_pdf": write_question_pdf(
+                os.path.join(directory, f"questions_{size}.pdf"), spec["pages"], spec["questions_per_page"]
+            ),
+            "document_pdf": write_document_pdf(os.path.join(directory, f"document_{size}.pdf"), spec["paragraphs"]),
+            "pptx": write_pptx(os.path.join(directory, f"slides_{size}.pptx"), spec["slides"]),
+        }
+    return fixtures
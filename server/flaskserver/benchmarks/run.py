@@ -0,0 +1,202 @@
+"""
+Offline microbenchmarks for the CPU-bound helpers in app.py.
+
+Run from server/flaskserver:
+
+    python -m benchmarks.run                  # run everything and compare with baselines.json
+    python -m benchmarks.run -k pdf           # only benchmarks whose name contains "pdf"
+    python -m benchmarks.run --update         # record the current numbers as the new baselines
+
+Each benchmark reports the median wall time, throughput (items/s) and peak traced memory.
+A benchmark regresses when its median time or peak memory exceeds the baseline by more than
+the tolerance; the run then exits with status 1. Baselines are machine-specific, so refresh
+them with --update when moving to different hardware, and widen --time-tolerance on noisy hosts.
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+import types
+
+from benchmarks import fixtures
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+
+class NullCache:
+    """Replaces result caches so every iteration measures the real work."""
+    def key(self, *parts):
+        return ":".join(str(part) for part in parts)
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value):
+        pass
+
+class FakeAgent:
+    def __init__(self, content):
+        self.content = content
+
+    def run(self, prompt, stream=False):
+        return types.SimpleNamespace(content=self.content)
+
+class Benchmark:
+    """A function under test; `setup` runs untimed before every iteration and returns its arguments."""
+    def __init__(self, name, func, setup, items, unit):
+        self.name = name
+        self.func = func
+        self.setup = setup
+        self.items = items
+        self.unit = unit
+
+def load_app(workdir):
+    """Import app.py with background threads, Redis-backed stores and model downloads kept out of the way."""
+    os.environ.setdefault("RECOMMENDATION_REFRESH_INTERVAL", "0")
+    os.environ.setdefault("JOB_STORE", "memory")
+    os.environ["PAPER_RENDER_PROCESSES"] = "0"
+    os.environ["FAISS_DIR"] = os.path.join(workdir, "faiss_index")
+    os.environ.pop("WARMUP_RESOURCES", None)
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import app
+    app.paper_questions_cache = NullCache()
+    app.mpnet_embeddings = app.EmbeddingBatcher("benchmark-mpnet", fixtures.FakeEncoder())
+    return app
+
+def build_benchmarks(app, files, workdir):
+    benchmarks = []
+    for size, paths in files.items():
+        spec = fixtures.SIZES[size]
+        question_count = spec["pages"] * spec["questions_per_page"]
+        questions = fixtures.question_lines(question_count, seed=1)
+        html_text = fixtures.llm_html_response(spec["paragraphs"])
+        agent = FakeAgent(fixtures.agent_answer(question_count))
+        document_text = app.extract_text_from_pdf(paths["document_pdf"])
+
+        def faiss_setup(size=size, document_text=document_text):
+            store_dir = os.path.join(workdir, f"faiss_{size}")
+            shutil.rmtree(store_dir, ignore_errors=True)
+            app.faiss_store = app.FaissStore(store_dir, 768)
+            return (f"document_{size}.pdf", document_text)
+
+        benchmarks += [
+            Benchmark(f"extract_questions_from_pdf[{size}]", app.extract_questions_from_pdf,
+                      lambda p=paths["question_pdf"]: (p,), spec["pages"], "pages"),
+            Benchmark(f"clean_response[{size}]", app.clean_response,
+                      lambda t=html_text: (t,), len(html_text) / 1024, "KiB"),
+            Benchmark(f"get_agent_response[{size}]", app.get_agent_response,
+                      lambda a=agent: (a, "prompt"), question_count, "questions"),
+            Benchmark(f"create_question_paper[{size}]", app.create_question_paper,
+                      lambda q=questions: (q, 1), question_count, "questions"),
+            Benchmark(f"create_question_bank_pdf[{size}]", app.create_question_bank_pdf,
+                      lambda q=questions, s=size: ("\n\n".join(q), f"bench {s}"), question_count, "questions"),
+            Benchmark(f"extract_text_from_pdf[{size}]", app.extract_text_from_pdf,
+                      lambda p=paths["document_pdf"]: (p,), spec["paragraphs"], "paragraphs"),
+            Benchmark(f"extract_text_from_pptx[{size}]", app.extract_text_from_pptx,
+                      lambda p=paths["pptx"]: (p,), spec["slides"], "slides"),
+            Benchmark(f"store_in_faiss[{size}]", app.store_in_faiss,
+                      faiss_setup, len(document_text) / 1000, "chunks"),
+        ]
+    return benchmarks
+
+def measure(benchmark, min_time, max_iterations):
+    """Median time over repeated runs, then the lowest peak of two runs under tracemalloc."""
+    benchmark.func(*benchmark.setup())  # Warm-up: lazy imports, fonts, caches
+    durations = []
+    while len(durations) < max_iterations and (len(durations) < 3 or sum(durations) < min_time):
+        args = benchmark.setup()
+        started = time.perf_counter()
+        benchmark.func(*args)
+        durations.append(time.perf_counter() - started)
+
+    peaks = []
+    for _ in range(2):
+        args = benchmark.setup()
+        tracemalloc.start()
+        benchmark.func(*args)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    peak = min(peaks)
+
+    median = statistics.median(durations)
+    return {
+        "median_ms": round(median * 1000, 3),
+        "min_ms": round(min(durations) * 1000, 3),
+        "iterations": len(durations),
+        "throughput": round(benchmark.items / median, 1) if median else None,
+        "unit": f"{benchmark.unit}/s",
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+def compare(name, result, baseline, time_tolerance, memory_tolerance):
+    if not baseline:
+        return "new"
+    problems = []
+    if result["median_ms"] > baseline["median_ms"] * (1 + time_tolerance):
+        problems.append(f"time {result['median_ms']:.1f}ms vs {baseline['median_ms']:.1f}ms")
+    if result["peak_kib"] > baseline["peak_kib"] * (1 + memory_tolerance):
+        problems.append(f"memory {result['peak_kib']:.0f}KiB vs {baseline['peak_kib']:.0f}KiB")
+    return "REGRESSION: " + ", ".join(problems) if problems else "ok"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-k", "--filter", default="", help="only run benchmarks whose name contains this text")
+    parser.add_argument("--update", action="store_true", help="write the results to baselines.json")
+    parser.add_argument("--time-tolerance", type=float, default=0.5, help="allowed slowdown before failing (0.5 = 50%%)")
+    parser.add_argument("--memory-tolerance", type=float, default=0.25, help="allowed peak memory growth before failing")
+    parser.add_argument("--min-time", type=float, default=0.5, help="minimum seconds spent timing each benchmark")
+    parser.add_argument("--max-iterations", type=int, default=50)
+    parser.add_argument("--json", dest="json_path", help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="quicklearn-bench-")
+    previous_cwd = os.getcwd()
+    try:
+        os.chdir(workdir)  # app.py creates ./uploads and ./generated_papers on import
+        app = load_app(workdir)
+        files = fixtures.build_fixtures(os.path.join(workdir, "fixtures"))
+        benchmarks = [b for b in build_benchmarks(app, files, workdir) if args.filter in b.name]
+
+        baselines = {}
+        if os.path.exists(BASELINE_PATH):
+            with open(BASELINE_PATH) as f:
+                baselines = json.load(f)
+
+        results, regressions = {}, []
+        print(f"{'benchmark':<38} {'median ms':>10} {'throughput':>22} {'peak KiB':>10}  status")
+        for benchmark in benchmarks:
+            result = measure(benchmark, args.min_time, args.max_iterations)
+            status = compare(benchmark.name, result, baselines.get(benchmark.name), args.time_tolerance, args.memory_tolerance)
+            if status.startswith("REGRESSION"):
+                regressions.append(benchmark.name)
+            results[benchmark.name] = result
+            throughput = f"{result['throughput']} {result['unit']}"
+            print(f"{benchmark.name:<38} {result['median_ms']:>10.2f} {throughput:>22} {result['peak_kib']:>10.1f}  {status}")
+    finally:
+        os.chdir(previous_cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.update:
+        baselines.update({
+            name: {"min_ms": r["min_ms"], "median_ms": r["median_ms"], "peak_kib": r["peak_kib"]}
+            for name, r in results.items()
+        })
+        with open(BASELINE_PATH, "w") as f:
+            json.dump(dict(sorted(baselines.items())), f, indent=2)
+            f.write("\n")
+        print(f"Updated {BASELINE_PATH}")
+        return 0
+    if regressions:
+        print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,306 @@
+"""
+End-to-end load test for app.py against local provider stand-ins.
+
+Run from server/flaskserver (Redis on localhost is used if it is running; without it the
+caches degrade to misses exactly as in production):
+
+    python -m loadtest.run --duration 60 --concurrency 16 --workers 8
+    python -m loadtest.run --mix quiz=1,llm_quiz=4 --groq-latency-ms 800 --failure-rate 0.05 --failure-status 429
+
+The app is served in-process by a threaded WSGI server whose concurrency is capped at --workers,
+like a gunicorn worker pool. Groq, Gemini and Serper are answered by loadtest.stubs over HTTP;
+YouTube transcripts, text-to-speech and sentence embeddings are faked in-process. The report
+gives p50/p95/p99 latency, throughput and error rate per endpoint, plus how long requests
+queued for a worker and how often every worker was busy.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+import jwt
+import requests
+
+from benchmarks.fixtures import FakeEncoder, write_document_pdf, write_question_pdf
+from loadtest.stubs import FakeYouTubeTranscriptApi, ProviderProfile, ProviderStubServer, fake_pyttsx3_module
+
+DEFAULT_MIX = "quiz=3,chat_trans=3,query=2,llm_quiz=4,generate_paper=1,youtube_videos=3"
+
+def percentile(values, pct):
+    """Nearest-rank percentile."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))]
+
+class WorkerPoolMiddleware:
+    """
+    Caps concurrent requests at `workers` and records how long each request queued for a slot.
+    A sampler thread records in-flight and queued counts to measure saturation.
+    """
+    def __init__(self, wsgi_app, workers, sample_interval=0.02):
+        self.wsgi_app = wsgi_app
+        self.workers = workers
+        self.slots = threading.Semaphore(workers)
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.queued = 0
+        self.queue_waits = {}
+        self.samples = []
+        self.sample_interval = sample_interval
+        self.running = True
+        threading.Thread(target=self._sample, name="saturation-sampler", daemon=True).start()
+
+    def __call__(self, environ, start_response):
+        path = environ.get("PATH_INFO", "")
+        started = time.perf_counter()
+        with self.lock:
+            self.queued += 1
+        self.slots.acquire()
+        waited = time.perf_counter() - started
+        with self.lock:
+            self.queued -= 1
+            self.in_flight += 1
+            self.queue_waits.setdefault(path, []).append(waited)
+        try:
+            # Materialise the body so the slot is held until the response is fully produced
+            return list(self.wsgi_app(environ, start_response))
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+            self.slots.release()
+
+    def _sample(self):
+        while self.running:
+            with self.lock:
+                self.samples.append((self.in_flight, self.queued))
+            time.sleep(self.sample_interval)
+
+    def reset(self):
+        with self.lock:
+            self.queue_waits = {}
+            self.samples = []
+
+    def report(self):
+        with self.lock:
+            samples = list(self.samples)
+        if not samples:
+            return {}
+        return {
+            "workers": self.workers,
+            "mean_utilisation": round(statistics.mean(s[0] for s in samples) / self.workers, 3),
+            "saturated_fraction": round(sum(1 for s in samples if s[0] >= self.workers) / len(samples), 3),
+            "max_in_flight": max(s[0] for s in samples),
+            "max_queued": max(s[1] for s in samples),
+            "mean_queued": round(statistics.mean(s[1] for s in samples), 2),
+        }
+
+def preload(resource, value):
+    """Seed a LazyResource so it never runs its real loader (model downloads, etc.)."""
+    resource._value = value
+
+def start_app(args, stub_url, workdir):
+    os.environ.update({
+        "GROQ_API_KEY": os.environ.get("GROQ_API_KEY", "loadtest"),
+        "GENAI_API_KEY": os.environ.get("GENAI_API_KEY", "loadtest"),
+        "GROQ_BASE_URL": stub_url,
+        "GENAI_API_ENDPOINT": stub_url,
+        "SERPER_URL": f"{stub_url}/videos",
+        "RECOMMENDATION_REFRESH_INTERVAL": "0",
+        "JOB_STORE": os.environ.get("JOB_STORE", "memory"),
+        "FAISS_DIR": os.path.join(workdir, "faiss_index"),
+    })
+    os.environ.pop("WARMUP_RESOURCES", None)
+    sys.modules["pyttsx3"] = fake_pyttsx3_module(args.tts_latency_ms)
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import app
+
+    FakeYouTubeTranscriptApi.profile = ProviderProfile(args.youtube_latency_ms, args.youtube_latency_ms / 3, args.youtube_failure_rate)
+    app.YouTubeTranscriptApi = FakeYouTubeTranscriptApi
+    preload(app.model, FakeEncoder(384))
+    preload(app.embedding_model, FakeEncoder(768))
+
+    from werkzeug.serving import make_server
+    middleware = WorkerPoolMiddleware(app.app.wsgi_app, args.workers)
+    app.app.wsgi_app = middleware
+    server = make_server("127.0.0.1", 0, app.app, threaded=True)
+    threading.Thread(target=server.serve_forever, name="app-server", daemon=True).start()
+    return app, server, middleware, f"http://127.0.0.1:{server.server_port}"
+
+def prepare(base_url, workdir, headers):
+    """Upload the files that /generate_paper and /query work on."""
+    paper = write_question_pdf(os.path.join(workdir, "sample_paper.pdf"), pages=4, questions_per_page=8)
+    with open(paper, "rb") as f:
+        file_path = requests.post(f"{base_url}/paper_upload", files={"file": ("sample_paper.pdf", f)}).json()["file_path"]
+    document = write_document_pdf(os.path.join(workdir, "notes.pdf"), paragraphs=60)
+    with open(document, "rb") as f:
+        response = requests.post(f"{base_url}/upload", files={"file": ("notes.pdf", f)}, headers=headers)
+    if response.status_code >= 400:
+        print(f"Document upload failed ({response.status_code}); /query will run without context")
+    return {"paper_path": file_path}
+
+def request_factories(rng, args, prepared):
+    """Each endpoint builds a realistic request; popular videos/topics repeat (Zipf-like), as in real traffic."""
+    videos = [f"https://www.youtube.com/watch?v={i:011d}" for i in range(args.videos)]
+    topics = [f"topic {i} {word}" for i, word in zip(range(args.topics), ["trees", "graphs", "cells", "motion", "limits", "vectors"] * args.topics)]
+    questions = ["What is the main idea?", "Explain the second example", "Summarise the key formula", "Why does this work?"]
+
+    def popular(items):
+        return rng.choices(items, weights=[1 / (i + 1) for i in range(len(items))])[0]
+
+    def model():
+        return rng.choice(["chatgroq", "gemini"]) if args.model == "mixed" else args.model
+
+    return {
+        "quiz": lambda: ("POST", "/quiz", {"link": popular(videos), "qno": 5, "difficulty": rng.choice(["easy", "medium", "hard"]), "model": model()}),
+        "chat_trans": lambda: ("POST", "/chat_trans", {"link": popular(videos), "question": rng.choice(questions), "model": model()}),
+        "query": lambda: ("POST", "/query", {"query": rng.choice(questions)}),
+        "llm_quiz": lambda: ("POST", "/llm_quiz", {"topic": popular(topics), "num_questions": 5, "difficulty": rng.choice(["easy", "medium"])}),
+        "generate_paper": lambda: ("POST", "/generate_paper", {"file_path": prepared["paper_path"], "num_questions": 10, "num_papers": 2}),
+        "youtube_videos": lambda: ("POST", "/youtube_videos", {"topic": rng.sample(topics, 3)}),
+    }
+
+def drive(base_url, factories, mix, concurrency, duration, seed, headers):
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    results = []
+    results_lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def client(index):
+        rng = random.Random(seed + index)
+        session = requests.Session()
+        session.headers.update(headers)
+        while time.monotonic() < deadline:
+            name = rng.choices(names, weights=weights)[0]
+            method, path, payload = factories[name]()
+            started = time.perf_counter()
+            try:
+                response = session.request(method, f"{base_url}{path}", json=payload, timeout=120)
+                status = response.status_code
+            except requests.RequestException:
+                status = None
+            elapsed = time.perf_counter() - started
+            with results_lock:
+                results.append((name, elapsed, status))
+
+    threads = [threading.Thread(target=client, args=(i,), daemon=True) for i in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, time.perf_counter() - started
+
+def summarise(results, elapsed, middleware, path_for):
+    report = {}
+    for name in sorted({r[0] for r in results}):
+        latencies = [r[1] * 1000 for r in results if r[0] == name]
+        errors = sum(1 for r in results if r[0] == name and (r[2] is None or r[2] >= 400))
+        waits = [w * 1000 for w in middleware.queue_waits.get(path_for[name], [])]
+        report[name] = {
+            "requests": len(latencies),
+            "errors": errors,
+            "error_rate": round(errors / len(latencies), 3),
+            "rps": round(len(latencies) / elapsed, 2),
+            "p50_ms": round(percentile(latencies, 50), 1),
+            "p95_ms": round(percentile(latencies, 95), 1),
+            "p99_ms": round(percentile(latencies, 99), 1),
+            "queue_wait_p95_ms": round(percentile(waits, 95), 1) if waits else None,
+        }
+    return report
+
+def parse_mix(text):
+    mix = {}
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=60, help="seconds of measured traffic")
+    parser.add_argument("--warmup", type=float, default=5, help="seconds of unmeasured traffic first")
+    parser.add_argument("--concurrency", type=int, default=16, help="concurrent clients")
+    parser.add_argument("--workers", type=int, default=8, help="app request slots, like gunicorn workers x threads")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="endpoint weights, e.g. quiz=3,llm_quiz=1")
+    parser.add_argument("--model", default="mixed", choices=["chatgroq", "gemini", "mixed"])
+    parser.add_argument("--videos", type=int, default=20, help="distinct YouTube videos in the traffic")
+    parser.add_argument("--topics", type=int, default=30, help="distinct topics in the traffic")
+    parser.add_argument("--groq-latency-ms", type=float, default=400)
+    parser.add_argument("--gemini-latency-ms", type=float, default=600)
+    parser.add_argument("--serper-latency-ms", type=float, default=250)
+    parser.add_argument("--youtube-latency-ms", type=float, default=150)
+    parser.add_argument("--tts-latency-ms", type=float, default=200)
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="fraction of Groq/Gemini/Serper calls that fail")
+    parser.add_argument("--failure-status", type=int, default=503)
+    parser.add_argument("--youtube-failure-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", dest="json_path", help="also write the report to this file")
+    args = parser.parse_args(argv)
+
+    mix = parse_mix(args.mix)
+    profile = lambda latency: ProviderProfile(latency, latency / 3, args.failure_rate, args.failure_status)
+    stubs = ProviderStubServer({
+        "groq": profile(args.groq_latency_ms),
+        "gemini": profile(args.gemini_latency_ms),
+        "serper": profile(args.serper_latency_ms),
+    }, seed=args.seed).start()
+
+    workdir = tempfile.mkdtemp(prefix="quicklearn-load-")
+    previous_cwd = os.getcwd()
+    try:
+        os.chdir(workdir)  # uploads, generated papers, caches and indexes stay in the temp dir
+        app, server, middleware, base_url = start_app(args, stubs.url, workdir)
+        # /upload and /query only serve signed-in users; every client acts as one load-test user
+        headers = {"Authorization": f"Bearer {jwt.encode({'id': 'loadtest'}, app.SECRET_KEY, algorithm='HS256')}"}
+        prepared = prepare(base_url, workdir, headers)
+        factories = request_factories(random.Random(args.seed), args, prepared)
+        unknown = set(mix) - set(factories)
+        if unknown:
+            parser.error(f"unknown endpoints in --mix: {', '.join(sorted(unknown))}")
+        path_for = {name: factories[name]()[1] for name in mix}
+
+        if args.warmup > 0:
+            drive(base_url, factories, mix, args.concurrency, args.warmup, args.seed + 1000, headers)
+        middleware.reset()
+        results, elapsed = drive(base_url, factories, mix, args.concurrency, args.duration, args.seed, headers)
+
+        report = {
+            "endpoints": summarise(results, elapsed, middleware, path_for),
+            "total": {
+                "requests": len(results),
+                "rps": round(len(results) / elapsed, 2),
+                "p95_ms": round(percentile([r[1] * 1000 for r in results], 95), 1) if results else None,
+            },
+            "saturation": middleware.report(),
+            "providers": stubs.counts,
+        }
+        middleware.running = False
+        server.shutdown()
+    finally:
+        os.chdir(previous_cwd)
+        stubs.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"{'endpoint':<16} {'reqs':>6} {'err%':>6} {'rps':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'queue p95':>10}")
+    for name, row in report["endpoints"].items():
+        queue_p95 = "-" if row["queue_wait_p95_ms"] is None else f"{row['queue_wait_p95_ms']:.1f}"
+        print(f"{name:<16} {row['requests']:>6} {row['error_rate'] * 100:>5.1f}% {row['rps']:>7.2f} "
+              f"{row['p50_ms']:>9.1f} {row['p95_ms']:>9.1f} {row['p99_ms']:>9.1f} {queue_p95:>10}")
+    print(f"total: {report['total']['requests']} requests, {report['total']['rps']} req/s, p95 {report['total']['p95_ms']} ms")
+    print(f"saturation: {json.dumps(report['saturation'])}")
+    print(f"provider calls: {json.dumps(report['providers'])}")
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,255 @@
+"""
+Local stand-ins for the external providers app.py talks to.
+
+ProviderStubServer is one threaded HTTP server that answers like:
+  - Groq (OpenAI-compatible)  POST /openai/v1/chat/completions      (JSON or SSE stream)
+  - Gemini (REST)             POST /v1beta/models/<model>:generateContent
+                              POST /v1beta/models/<model>:streamGenerateContent?alt=sse
+  - Serper                    POST /videos
+
+Replies are synthesised from the prompt so the app's JSON parsing and validation take their
+normal paths. Each provider has its own latency and failure profile.
+
+YouTube transcripts and text-to-speech are faked in-process (FakeYouTubeTranscriptApi, fake_pyttsx3_module),
+because the app calls them as libraries rather than over HTTP.
+"""
+import json
+import random
+import re
+import threading
+import time
+import types
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class ProviderProfile:
+    """Latency is drawn from a normal distribution (ms, clipped at 0); failures return `failure_status`."""
+    def __init__(self, latency_ms=300, jitter_ms=100, failure_rate=0.0, failure_status=503, stream_chunks=8):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.failure_rate = failure_rate
+        self.failure_status = failure_status
+        self.stream_chunks = stream_chunks
+
+    def delay(self, rng):
+        return max(0.0, rng.gauss(self.latency_ms, self.jitter_ms)) / 1000
+
+WORDS = (
+    "algorithm structure data binary search tree node graph edge vertex energy force motion cell "
+    "membrane enzyme reaction equation integral limit vector matrix network packet protocol"
+).split()
+
+def _sentence(rng, n=10):
+    return " ".join(rng.choice(WORDS) for _ in range(n)).capitalize()
+
+def _question(rng, index):
+    options = [_sentence(rng, 3) for _ in range(4)]
+    return {
+        "question": f"Q{index}-{uuid.uuid4().hex[:6]}: {_sentence(rng, 8)}?",
+        "options": options,
+        "answer": rng.choice(options)
+    }
+
+def synthesize_reply(prompt, rng):
+    """Pick a reply shaped like what the prompt asks for."""
+    count_match = re.search(r"(\d+) (?:multiple-choice|new) questions", prompt) or re.search(r"Generate (\d+)", prompt)
+    count = int(count_match.group(1)) if count_match else 5
+    difficulty_match = re.search(r"(?:Only generate|of) (\w+) difficulty", prompt)
+    difficulty = difficulty_match.group(1) if difficulty_match else "medium"
+
+    if "Create a quiz on the topic" in prompt:
+        return json.dumps({"questions": {difficulty: [_question(rng, i) for i in range(count)]}})
+    if "multiple-choice questions" in prompt and '"summary"' in prompt:
+        return json.dumps({
+            "summary": {_sentence(rng, 2): _sentence(rng, 40) for _ in range(3)},
+            "questions": {difficulty: [_question(rng, i) for i in range(count)]}
+        })
+    if "multiple-choice questions" in prompt:
+        return json.dumps({"questions": [_question(rng, i) for i in range(count)]})
+    if '"summary"' in prompt:
+        return json.dumps({"summary": {_sentence(rng, 2): _sentence(rng, 40) for _ in range(3)}})
+    if "transcript cleaner" in prompt:
+        return "\n".join(_sentence(rng, 14) + "." for _ in range(40))
+    if "similar academic questions" in prompt:
+        return "\n".join(f"{i}. {_sentence(rng, 12)}?" for i in range(1, count + 1))
+    if "recommendation generator" in prompt:
+        topics = prompt.split("The topics are:")[-1].strip().split(", ")
+        return json.dumps({"topics": {
+            topic: {"overview": _sentence(rng, 20), "recommendations": _sentence(rng, 20),
+                    "youtube_links": [f"https://www.youtube.com/watch?v={uuid.uuid4().hex[:11]}" for _ in range(5)]}
+            for topic in topics
+        }})
+    if "mind map" in prompt:
+        return json.dumps({"topic": _sentence(rng, 2), "subtopics": [
+            {"name": _sentence(rng, 2), "details": [_sentence(rng, 6), _sentence(rng, 6)]} for _ in range(4)
+        ]})
+    return " ".join(_sentence(rng) + "." for _ in range(6))
+
+def _chunks(text, count):
+    size = max(1, -(-len(text) // count))
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+class ProviderStubServer:
+    def __init__(self, profiles, host="127.0.0.1", port=0, seed=0):
+        self.profiles = profiles
+        self.counts = {name: {"requests": 0, "failures": 0} for name in profiles}
+        self._lock = threading.Lock()
+        self._rng = random.Random(seed)
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if self.path.startswith("/openai/v1/chat/completions"):
+                    stub._handle(self, "groq", body)
+                elif ":generateContent" in self.path or ":streamGenerateContent" in self.path:
+                    stub._handle(self, "gemini", body)
+                elif self.path.startswith("/videos"):
+                    stub._handle(self, "serper", body)
+                else:
+                    stub._send_json(self, 404, {"error": f"No stub for {self.path}"})
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, name="provider-stubs", daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _rand(self):
+        with self._lock:
+            return random.Random(self._rng.random())
+
+    def _handle(self, handler, provider, body):
+        profile = self.profiles[provider]
+        rng = self._rand()
+        time.sleep(profile.delay(rng))
+        with self._lock:
+            self.counts[provider]["requests"] += 1
+            failed = rng.random() < profile.failure_rate
+            if failed:
+                self.counts[provider]["failures"] += 1
+        if failed:
+            headers = {"Retry-After": "0.2"} if profile.failure_status == 429 else {}
+            return self._send_json(handler, profile.failure_status, {"error": {"message": "stub failure"}}, headers)
+
+        if provider == "serper":
+            return self._send_json(handler, 200, {"videos": [
+                {"title": _sentence(rng, 5), "link": f"https://www.youtube.com/watch?v={uuid.uuid4().hex[:11]}"}
+                for _ in range(10)
+            ]})
+
+        if provider == "groq":
+            prompt = "\n".join(str(m.get("content", "")) for m in body.get("messages", []))
+        else:
+            prompt = "\n".join(p.get("text", "") for c in body.get("contents", []) for p in c.get("parts", []))
+        reply = synthesize_reply(prompt, rng)
+
+        streaming = body.get("stream") if provider == "groq" else ":streamGenerateContent" in handler.path
+        if not streaming:
+            return self._send_json(handler, 200, self._payload(provider, reply, body, final=True))
+
+        handler.send_response(200)
+        handler.send_header("Content-Type", "text/event-stream")
+        handler.send_header("Connection", "close")
+        handler.end_headers()
+        pieces = _chunks(reply, profile.stream_chunks)
+        for i, piece in enumerate(pieces):
+            handler.wfile.write(f"data: {json.dumps(self._payload(provider, piece, body, final=i == len(pieces) - 1, delta=True))}\n\n".encode())
+            handler.wfile.flush()
+            time.sleep(profile.delay(rng) / (4 * len(pieces)))
+        if provider == "groq":
+            handler.wfile.write(b"data: [DONE]\n\n")
+        handler.wfile.flush()
+        handler.close_connection = True
+
+    def _payload(self, provider, text, body, final, delta=False):
+        if provider == "gemini":
+            return {
+                "candidates": [{"content": {"parts": [{"text": text}], "role": "model"},
+                                "finishReason": "STOP" if final else None, "index": 0}],
+                "usageMetadata": {"promptTokenCount": 100, "candidatesTokenCount": len(text) // 4, "totalTokenCount": 100 + len(text) // 4}
+            }
+        message = {"role": "assistant", "content": text}
+        choice = {"index": 0, "finish_reason": "stop" if final else None}
+        choice["delta" if delta else "message"] = message
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion.chunk" if delta else "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [choice],
+            "usage": {"prompt_tokens": 100, "completion_tokens": len(text) // 4, "total_tokens": 100 + len(text) // 4}
+        }
+
+    def _send_json(self, handler, status, payload, headers=None):
+        data = json.dumps(payload).encode()
+        handler.send_response(status)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            handler.send_header(name, value)
+        handler.end_headers()
+        handler.wfile.write(data)
+
+class FakeYouTubeTranscriptApi:
+    """Replaces youtube_transcript_api.YouTubeTranscriptApi inside the app process."""
+    profile = ProviderProfile(latency_ms=150, jitter_ms=50)
+    lines_per_video = 120
+    _rng = random.Random(1)
+
+    def fetch(self, video_id, languages=("en",)):
+        return self.get_transcript(video_id, languages)
+
+    @classmethod
+    def get_transcript(cls, video_id, languages=("en",)):
+        if "en" not in languages:
+            raise Exception(f"No transcript in {languages} for {video_id}")
+        time.sleep(cls.profile.delay(cls._rng))
+        if cls._rng.random() < cls.profile.failure_rate:
+            raise Exception(f"Transcripts are disabled for {video_id}")
+        rng = random.Random(video_id)
+        return [{"text": _sentence(rng, 12), "start": i * 4.0, "duration": 4.0} for i in range(cls.lines_per_video)]
+
+def fake_pyttsx3_module(latency_ms=200):
+    """A pyttsx3 stand-in that writes a silent WAV after a delay, for the TTS worker."""
+    import wave
+
+    class Engine:
+        def __init__(self):
+            self.jobs = []
+
+        def setProperty(self, name, value):
+            pass
+
+        def save_to_file(self, text, path):
+            self.jobs.append(path)
+
+        def runAndWait(self):
+            time.sleep(latency_ms / 1000)
+            for path in self.jobs:
+                with wave.open(path, "wb") as f:
+                    f.setnchannels(1)
+                    f.setsampwidth(2)
+                    f.setframerate(8000)
+                    f.writeframes(b"\x00\x00" * 800)
+            self.jobs = []
+
+    module = types.ModuleType("pyttsx3")
+    module.init = lambda *args, **kwargs: Engine()
+    return module
@@ -0,0 +1,37 @@
+"""
+Shared fixtures. app.py is imported once per session from a scratch working directory, with the
+in-memory job store, no background refresher and no render processes. Its Redis client is pointed
+at a closed port, so tests exercise the "Redis unavailable" paths and never touch a real server.
+
+Run from server/flaskserver after `pip install -r requirements-dev.txt`:
+
+    python -m pytest -q tests
+"""
+import os
+import sys
+
+import pytest
+
+os.environ.setdefault("GROQ_API_KEY", "test")
+os.environ.setdefault("GENAI_API_KEY", "test")
+os.environ["JOB_STORE"] = "memory"
+os.environ["RECOMMENDATION_REFRESH_INTERVAL"] = "0"
+os.environ["PAPER_RENDER_PROCESSES"] = "0"
+os.environ.pop("WARMUP_RESOURCES", None)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture(scope="session")
+def app_module(tmp_path_factory):
+    import redis
+    workdir = tmp_path_factory.mktemp("app")
+    previous_cwd = os.getcwd()
+    os.chdir(workdir)  # app.py creates ./uploads and ./generated_papers on import
+    os.environ["FAISS_DIR"] = str(workdir / "faiss_index")
+    import app
+    app.redis_client = redis.StrictRedis(host="127.0.0.1", port=1, decode_responses=True, socket_connect_timeout=0.1)
+    yield app
+    os.chdir(previous_cwd)
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
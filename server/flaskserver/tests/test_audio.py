@@ -0,0 +1,19 @@
+import time
+
+import pytest
+
+@pytest.mark.parametrize("wait", ["abc", "", "-5", "nan"])
+def test_bad_wait_values_do_not_wait(client, wait):
+    started = time.monotonic()
+    response = client.get(f"/audio/{'0' * 32}?wait={wait}")
+    assert response.status_code == 404
+    assert time.monotonic() - started < 1
+
+def test_wait_is_capped(app_module, client, monkeypatch):
+    waits = []
+    monkeypatch.setattr(app_module.tts_manager, "wait", lambda audio_id, timeout: waits.append(timeout) or "missing")
+    assert client.get(f"/audio/{'0' * 32}?wait=600").status_code == 404
+    assert waits == [10.0]
+
+def test_invalid_audio_id_is_rejected(client):
+    assert client.get("/audio/not-an-id?wait=1").status_code == 400
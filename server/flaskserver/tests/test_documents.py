@@ -0,0 +1,62 @@
+import io
+
+import jwt
+import pytest
+
+def auth(app_module, **claims):
+    return {"Authorization": f"Bearer {jwt.encode(claims, app_module.SECRET_KEY, algorithm='HS256')}"}
+
+def upload(client, headers=None, name="notes.pdf"):
+    return client.post("/upload", data={"file": (io.BytesIO(b"%PDF"), name)}, headers=headers or {}, content_type="multipart/form-data")
+
+ROUTES = [
+    lambda client, headers: upload(client, headers),
+    lambda client, headers: client.post("/query", json={"query": "What?"}, headers=headers),
+    lambda client, headers: client.get("/documents", headers=headers),
+    lambda client, headers: client.delete("/documents/notes.pdf", headers=headers),
+]
+
+@pytest.mark.parametrize("route", ROUTES, ids=["upload", "query", "list", "delete"])
+def test_document_routes_need_a_token_with_a_user_id(app_module, client, route):
+    assert route(client, {}).status_code == 401
+    assert route(client, {"Authorization": "Bearer not-a-token"}).status_code == 401
+    assert route(client, auth(app_module, role="student")).status_code == 401
+
+@pytest.fixture
+def documents(app_module, monkeypatch):
+    """Records which namespace each route used instead of touching the vector store and the LLM."""
+    calls = []
+    monkeypatch.setattr(app_module, "extract_text_from_pdf", lambda path: "text")
+    monkeypatch.setattr(app_module, "index_document", lambda user_id, filename, content: calls.append(("index", user_id)) or 1)
+    monkeypatch.setattr(app_module, "delete_document", lambda user_id, filename: calls.append(("delete", user_id)) or 1)
+    monkeypatch.setattr(app_module, "search_documents", lambda user_id, query, filename=None: calls.append(("search", user_id)) or [])
+
+    class Answer:
+        text = "answer"
+
+    class Model:
+        def generate_content(self, prompt):
+            return Answer()
+
+    def busy(text):
+        raise app_module.TTSBusyError("busy")
+
+    monkeypatch.setattr(app_module, "get_llm_client", lambda provider, name: Model())
+    monkeypatch.setattr(app_module.tts_manager, "submit", busy)
+    return calls
+
+def test_each_user_gets_their_own_namespace(app_module, client, documents):
+    alice, bob = auth(app_module, id="alice"), auth(app_module, id="bob")
+    assert upload(client, alice).status_code == 200
+    assert upload(client, bob).status_code == 200
+    assert client.post("/query", json={"query": "What?"}, headers=alice).status_code == 200
+    assert client.delete("/documents/notes.pdf", headers=bob).status_code == 200
+    assert documents == [("index", "alice"), ("index", "bob"), ("search", "alice"), ("delete", "bob")]
+
+def test_numeric_user_ids_are_namespaced_as_strings(app_module, client, documents):
+    assert upload(client, auth(app_module, id=7)).status_code == 200
+    assert documents == [("index", "7")]
+
+def test_query_rejects_non_object_bodies(app_module, client):
+    response = client.post("/query", json=["What?"], headers=auth(app_module, id="alice"))
+    assert response.status_code == 400
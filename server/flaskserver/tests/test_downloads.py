@@ -0,0 +1,22 @@
+import os
+
+def write(path, data, mtime_ns):
+    with open(path, "wb") as f:
+        f.write(data)
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+def test_changed_bytes_of_the_same_size_get_a_new_etag(app_module, client, tmp_path, monkeypatch):
+    monkeypatch.setattr(app_module, "OUTPUT_FOLDER", str(tmp_path))
+    path = os.path.join(tmp_path, "paper.pdf")
+    write(path, b"first", 1_000_000_000)
+    first = client.get("/download/paper.pdf")
+    assert first.status_code == 200 and first.data == b"first"
+
+    # Same path, inode and size; only the contents and mtime differ
+    write(path, b"other", 2_000_000_000)
+    response = client.get("/download/paper.pdf", headers={"If-None-Match": first.headers["ETag"]})
+    assert response.status_code == 200
+    assert response.data == b"other"
+    assert response.headers["ETag"] != first.headers["ETag"]
+
+    assert client.get("/download/paper.pdf", headers={"If-None-Match": response.headers["ETag"]}).status_code == 304
@@ -0,0 +1,86 @@
+import threading
+
+import numpy as np
+import pytest
+
+class RecordingEncoder:
+    """Encodes each text as [len(text)] and records the batches it was called with."""
+    def __init__(self, started=None, release=None, error=None):
+        self.batches = []
+        self.started = started
+        self.release = release
+        self.error = error
+
+    def encode(self, texts, batch_size=None):
+        self.batches.append(list(texts))
+        if self.started is not None:
+            self.started.set()
+            self.release.wait(5)
+        if self.error is not None:
+            raise self.error
+        return np.array([[float(len(text))] for text in texts])
+
+@pytest.fixture
+def make_batcher(app_module, monkeypatch):
+    monkeypatch.setattr(app_module, "embedding_services", {})
+
+    def make(encoder, **kwargs):
+        return app_module.EmbeddingBatcher("test", encoder, **kwargs)
+    return make
+
+def test_concurrent_requests_share_a_batch_and_keep_their_rows(make_batcher):
+    started, release = threading.Event(), threading.Event()
+    encoder = RecordingEncoder(started, release)
+    batcher = make_batcher(encoder, max_batch_size=64, max_wait_ms=1)
+
+    first = batcher.submit(["a"])  # Occupies the worker so the next requests queue up together
+    started.wait(5)
+    futures = [batcher.submit(["bb", "ccc"]), batcher.submit(["dddd"]), batcher.submit(["eeeee", "f"])]
+    release.set()
+
+    assert first.result(5).tolist() == [[1.0]]
+    assert [future.result(5).tolist() for future in futures] == [[[2.0], [3.0]], [[4.0]], [[5.0], [1.0]]]
+    assert encoder.batches == [["a"], ["bb", "ccc", "dddd", "eeeee", "f"]]
+    stats = batcher.stats()
+    assert stats["batches"] == 2 and stats["texts"] == 6 and stats["requests"] == 4
+    assert stats["batch_size_histogram"]["1"] == 1 and stats["batch_size_histogram"]["8"] == 1
+
+def test_full_batch_is_encoded_without_waiting(make_batcher):
+    encoder = RecordingEncoder()
+    batcher = make_batcher(encoder, max_batch_size=2, max_wait_ms=60000)
+    assert batcher.submit(["a", "b"]).result(5).tolist() == [[1.0], [1.0]]
+
+def test_encode_matches_sentence_transformer_shapes(make_batcher):
+    batcher = make_batcher(RecordingEncoder(), max_wait_ms=1)
+    assert batcher.encode("abc").tolist() == [3.0]
+    assert batcher.encode(["a", "bb"]).tolist() == [[1.0], [2.0]]
+    assert batcher.encode([]) == []
+
+def test_encoder_errors_reach_every_request(make_batcher):
+    started, release = threading.Event(), threading.Event()
+    encoder = RecordingEncoder(started, release, error=RuntimeError("model failed"))
+    batcher = make_batcher(encoder, max_wait_ms=1)
+
+    futures = [batcher.submit(["a"])]
+    started.wait(5)
+    futures += [batcher.submit(["b"]), batcher.submit(["c"])]
+    release.set()
+    for future in futures:
+        with pytest.raises(RuntimeError, match="model failed"):
+            future.result(5)
+    assert batcher.stats()["batches"] == 0
+
+def test_cancelled_requests_are_skipped(make_batcher):
+    started, release = threading.Event(), threading.Event()
+    encoder = RecordingEncoder(started, release)
+    batcher = make_batcher(encoder, max_wait_ms=1)
+
+    first = batcher.submit(["a"])
+    started.wait(5)
+    cancelled = batcher.submit(["skipped"])
+    kept = batcher.submit(["kept"])
+    assert cancelled.cancel()
+    release.set()
+    assert first.result(5).tolist() == [[1.0]]
+    assert kept.result(5).tolist() == [[4.0]]
+    assert ["skipped"] not in encoder.batches and encoder.batches[-1] == ["kept"]
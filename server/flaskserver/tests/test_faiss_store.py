@@ -0,0 +1,88 @@
+import os
+
+import numpy as np
+import pytest
+
+DIMENSION = 16
+
+def random_vectors(count, seed):
+    return np.random.default_rng(seed).standard_normal((count, DIMENSION)).astype("float32")
+
+def exact_nearest(vectors, labels, query, k):
+    distances = ((vectors - query) ** 2).sum(axis=1)
+    return [labels[i] for i in np.argsort(distances)[:k]]
+
+@pytest.fixture
+def make_store(app_module, tmp_path):
+    return lambda index_type="flat": app_module.FaissStore(str(tmp_path / "faiss"), DIMENSION, index_type)
+
+def test_search_is_exact_and_sees_other_instances(make_store):
+    writer, reader = make_store(), make_store()  # Two instances stand in for two worker processes
+    a, b = random_vectors(50, 1), random_vectors(30, 2)
+    writer.add("a.pdf", a)
+    assert [hit[:2] for hit in reader.search(a[7], k=1)] == [("a.pdf", 7)]
+    writer.add("b.pdf", b)
+
+    vectors = np.concatenate([a, b])
+    labels = [("a.pdf", i) for i in range(50)] + [("b.pdf", i) for i in range(30)]
+    query = random_vectors(1, 3)[0]
+    assert [hit[:2] for hit in reader.search(query, k=5)] == exact_nearest(vectors, labels, query, 5)
+
+def test_add_appends_without_rewriting(make_store):
+    store = make_store()
+    store.add("a.pdf", random_vectors(10, 1))
+    path = store._vectors_path(0)
+    inode = os.stat(path).st_ino
+    store.add("b.pdf", random_vectors(5, 2))
+    assert os.stat(path).st_ino == inode
+    assert os.path.getsize(path) == 15 * DIMENSION * 4
+    assert store.stats()["rows"] == 15
+
+def test_deleted_documents_are_hidden_then_compacted(make_store):
+    store, reader = make_store(), make_store()
+    a, b = random_vectors(20, 1), random_vectors(30, 2)
+    store.add("a.pdf", a)
+    store.add("b.pdf", b)
+    reader.search(a[0], k=3)  # Map the first epoch in the reader
+
+    assert store.delete_document("a.pdf") == 20
+    assert store.stats()["deleted"] == 20
+    assert all(hit[0] == "b.pdf" for hit in reader.search(a[0], k=10))
+
+    assert store.delete_document("b.pdf") == 30  # Deleted rows now outnumber live ones
+    assert store.stats() == {"rows": 0, "deleted": 0, "epoch": 1, "index_type": "flat", "ivf_rows": 0}
+    assert reader.search(a[0], k=3) == []
+
+    store.add("c.pdf", random_vectors(4, 3))
+    assert [hit[:2] for hit in reader.search(random_vectors(4, 3)[2], k=1)] == [("c.pdf", 2)]
+
+def test_compaction_renumbers_live_rows(make_store):
+    store = make_store()
+    vectors = {name: random_vectors(10, seed) for seed, name in enumerate(["a", "b", "c"])}
+    for name, matrix in vectors.items():
+        store.add(name, matrix)
+    store.delete_document("a")
+    store.build()
+    assert store.stats()["rows"] == 20
+    for name in ("b", "c"):
+        assert [hit[:2] for hit in store.search(vectors[name][9], k=1)] == [(name, 9)]
+
+def test_ivf_index_covers_old_rows_and_scans_new_ones(app_module, make_store, monkeypatch):
+    monkeypatch.setattr(app_module, "FAISS_IVF_NLIST", 4)
+    monkeypatch.setattr(app_module, "FAISS_IVF_NPROBE", 4)  # Probe every list: results must be exact
+    store = make_store("ivf")
+    first = random_vectors(200, 1)
+    store.add("first", first)
+    stats = store.stats()
+    assert stats["ivf_rows"] == 200
+    assert os.path.exists(os.path.join(store.directory, "ivf.0.200.faiss"))
+
+    second = random_vectors(50, 2)
+    store.add("second", second)
+    assert store.stats()["ivf_rows"] == 200  # The tail is searched exactly until it outgrows the index
+
+    vectors = np.concatenate([first, second])
+    labels = [("first", i) for i in range(200)] + [("second", i) for i in range(50)]
+    for seed in range(5):
+        query = random_vectors(1, 10 + seed)[0]
+        assert [hit[:2] for hit in store.search(query, k=5)] == exact_nearest(vectors, labels, query, 5)
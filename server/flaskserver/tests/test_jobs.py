@@ -0,0 +1,162 @@
+import threading
+import time
+
+import pytest
+
+def wait_for_status(manager, job_id, statuses=("succeeded", "failed"), timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = manager.get(job_id)
+        if job is not None and job["status"] in statuses:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} did not reach {statuses}")
+
+@pytest.fixture
+def manager(app_module, monkeypatch):
+    release = threading.Event()
+    manager = app_module.JobManager(app_module.InMemoryJobStore(), workers=4, limits={"slow": 1}, result_ttl=60)
+
+    def echo(params, progress):
+        progress(0.5, "halfway")
+        return {"echo": params}
+
+    def slow(params, progress):
+        release.wait(5)
+        return {"done": params["n"]}
+
+    def rejected(params, progress):
+        raise app_module.JobError("Bad input", 422)
+
+    def crashed(params, progress):
+        raise RuntimeError("boom")
+
+    for job_type, handler in (("echo", echo), ("slow", slow), ("rejected", rejected), ("crashed", crashed)):
+        manager.register(job_type, handler)
+    manager.release = release
+    monkeypatch.setattr(app_module, "job_manager", manager)
+    yield manager
+    release.set()
+
+def test_identical_live_submissions_share_a_job(manager):
+    first = manager.submit("slow", {"n": 1})
+    assert manager.submit("slow", {"n": 1})["id"] == first["id"]
+    assert manager.submit("slow", {"n": 2})["id"] != first["id"]
+    manager.release.set()
+    assert wait_for_status(manager, first["id"])["result"] == {"done": 1}
+
+def test_failed_jobs_can_be_retried(manager):
+    first = manager.submit("rejected", {"n": 1})
+    wait_for_status(manager, first["id"])
+    assert manager.submit("rejected", {"n": 1})["id"] != first["id"]
+
+def test_per_type_limit_queues_extra_jobs(manager):
+    jobs = [manager.submit("slow", {"n": n}) for n in range(3)]
+    stats = manager.stats()
+    assert stats["running"]["slow"] == 1
+    assert stats["pending"]["slow"] == 2
+    assert stats["limits"]["slow"] == 1
+    assert [manager.get(job["id"])["status"] for job in jobs[1:]] == ["queued", "queued"]
+
+    manager.release.set()
+    assert [wait_for_status(manager, job["id"])["result"]["done"] for job in jobs] == [0, 1, 2]
+    assert manager.stats()["running"]["slow"] == 0
+
+def test_unlimited_types_use_every_worker(manager):
+    echo = manager.submit("echo", {"x": 1})
+    assert wait_for_status(manager, echo["id"])["result"] == {"echo": {"x": 1}}
+    assert manager.stats()["limits"]["echo"] == 4
+
+def test_expired_jobs_are_gone_and_their_dedupe_key_is_reused(app_module):
+    manager = app_module.JobManager(app_module.InMemoryJobStore(), workers=1, result_ttl=0.05)
+    manager.register("echo", lambda params, progress: params)
+    first = manager.submit("echo", {"x": 1})
+    wait_for_status(manager, first["id"])
+    time.sleep(0.1)
+    assert manager.get(first["id"]) is None
+    assert manager.submit("echo", {"x": 1})["id"] != first["id"]
+
+def test_in_memory_store_expiry(app_module):
+    store = app_module.InMemoryJobStore()
+    store.save({"id": "a"}, 60)
+    store.save({"id": "b"}, -1)
+    assert store.get("a") == {"id": "a"}
+    assert store.get("b") is None
+    assert store.claim("key", "a", -1) is None
+    assert store.claim("key", "c", 60) is None  # The expired claim is taken over
+    assert store.claim("key", "d", 60) == "c"
+    store.release("key")
+    assert store.claim("key", "d", 60) is None
+
+def test_submit_endpoint_validates_the_body(client, manager):
+    assert client.post("/jobs", json=["echo"]).status_code == 400
+    assert client.post("/jobs", data="echo", content_type="text/plain").status_code == 400
+    assert client.post("/jobs", json={"params": {}}).status_code == 400
+    assert client.post("/jobs", json={"type": "echo", "params": [1]}).status_code == 400
+    response = client.post("/jobs", json={"type": "missing", "params": {}})
+    assert response.status_code == 400
+    assert "Unknown job type" in response.get_json()["error"]
+
+def test_job_endpoints_report_status(client, manager):
+    response = client.post("/jobs", json={"type": "slow", "params": {"n": 7}})
+    assert response.status_code == 202
+    job = response.get_json()
+    assert response.headers["Location"] == job["status_url"] == f"/jobs/{job['id']}"
+    assert "result" not in job and "dedupe_key" not in job
+
+    assert client.get(job["status_url"]).status_code == 200
+    pending = client.get(job["result_url"])
+    assert pending.status_code == 202
+    assert pending.get_json()["status"] in ("queued", "running")
+
+    manager.release.set()
+    wait_for_status(manager, job["id"])
+    result = client.get(job["result_url"])
+    assert result.status_code == 200
+    assert result.get_json() == {"done": 7}
+
+@pytest.mark.parametrize("job_type, status, error", [("rejected", 422, "Bad input"), ("crashed", 500, "boom")])
+def test_failed_job_result_uses_the_error_status(client, manager, job_type, status, error):
+    job = client.post("/jobs", json={"type": job_type, "params": {}}).get_json()
+    wait_for_status(manager, job["id"])
+    assert client.get(job["status_url"]).get_json()["status"] == "failed"
+    response = client.get(job["result_url"])
+    assert response.status_code == status
+    assert response.get_json()["error"] == error
+
+def test_unknown_job_is_404(client, manager):
+    assert client.get("/jobs/missing").status_code == 404
+    assert client.get("/jobs/missing/result").status_code == 404
+
+def test_job_stats(client, manager):
+    stats = client.get("/job_stats").get_json()
+    assert set(stats) == {"running", "pending", "limits"}
+    assert stats["limits"]["slow"] == 1
+
+@pytest.mark.parametrize("body", [["topic"], "Physics", 3])
+def test_question_bank_rejects_non_object_bodies(client, body):
+    response = client.post("/question_bank", json=body)
+    assert response.status_code == 400
+
+def test_question_bank_requires_a_topic(client):
+    assert client.post("/question_bank", json={"topic": "  "}).status_code == 400
+    assert client.post("/question_bank", json={}).status_code == 400
+
+@pytest.mark.parametrize("path", ["/quiz", "/chat_trans", "/llm_quiz", "/generate_paper"])
+@pytest.mark.parametrize("body", [["x"], "x", 3])
+def test_endpoints_reject_non_object_bodies(client, path, body):
+    response = client.post(path, json=body)
+    assert response.status_code == 400
+    assert response.get_json()["error"]
+
+def test_redis_job_store_outage_is_503(app_module, client, monkeypatch):
+    manager = app_module.JobManager(app_module.RedisJobStore(app_module.redis_client), workers=1)
+    for job_type in ("echo", "paper"):
+        manager.register(job_type, lambda params, progress: params)
+    monkeypatch.setattr(app_module, "job_manager", manager)
+
+    response = client.post("/jobs", json={"type": "echo", "params": {}})
+    assert response.status_code == 503
+    assert client.post("/generate_paper?async=1", json={"file_path": "x"}).status_code == 503
+    assert client.get("/jobs/abc").status_code == 503
+    assert client.get("/jobs/abc/result").status_code == 503
@@ -0,0 +1,55 @@
+import concurrent.futures.process
+
+import pytest
+
+def write_pdf(path, lines):
+    """One line per page."""
+    from fpdf import FPDF
+    pdf = FPDF()
+    pdf.set_font("Helvetica", size=11)
+    for line in lines:
+        pdf.add_page()
+        pdf.multi_cell(0, 8, line, new_x="LMARGIN", new_y="NEXT")
+    pdf.output(str(path))
+    return str(path)
+
+class BrokenPool:
+    """Stands in for a process pool whose worker crashed."""
+    def __init__(self):
+        self.resets = 0
+
+    def submit(self, func, *args):
+        raise concurrent.futures.process.BrokenProcessPool("worker died")
+
+    def reset(self):
+        self.resets += 1
+
+@pytest.fixture
+def broken_pool(app_module, monkeypatch):
+    pool = BrokenPool()
+    monkeypatch.setattr(app_module, "paper_render_pool", pool)
+    monkeypatch.setattr(app_module, "PAPER_RENDER_PROCESSES", 2)
+    return pool
+
+def test_map_on_process_pool_falls_back_and_resets(app_module, broken_pool):
+    assert app_module.map_on_process_pool(pow, [(2, 3), (3, 2)]) == [8, 9]
+    assert broken_pool.resets == 1
+
+def test_extraction_survives_a_broken_pool(app_module, broken_pool, monkeypatch, tmp_path):
+    monkeypatch.setattr(app_module, "PDF_PARALLEL_PAGES", 0)
+    path = write_pdf(tmp_path / "paper.pdf", ["1. What is the boiling point of water?", "2. Define momentum in physics?"])
+    questions = app_module.extract_questions_from_pdf(path)
+    assert any("boiling point" in question for question in questions)
+    assert any("momentum" in question for question in questions)
+    assert broken_pool.resets == 1
+
+def test_pdf_without_questions_gives_an_empty_list(app_module, tmp_path):
+    path = write_pdf(tmp_path / "notes.pdf", ["Notes"])
+    assert app_module.extract_questions_from_pdf(path) == []
+
+def test_unreadable_pdf_is_a_400_not_a_question(client, tmp_path):
+    path = tmp_path / "broken.pdf"
+    path.write_bytes(b"not a pdf")
+    response = client.post("/generate_paper", json={"file_path": str(path), "num_questions": 2})
+    assert response.status_code == 400
+    assert "Could not read PDF" in response.get_json()["error"]
@@ -0,0 +1,27 @@
+import threading
+
+def test_dedupe_ignores_numbering_spacing_and_case(app_module):
+    questions = ["1. What is a vector?", "7)  what is a   VECTOR?", "Q3. Define entropy?", "12. Define entropy?", "Why?"]
+    assert app_module.dedupe_questions(questions) == ["What is a vector?", "Define entropy?", "Why?"]
+
+def test_strip_question_number_handles_three_digit_numbers(app_module):
+    assert app_module.strip_question_number("104. What is 2.5 squared?") == "What is 2.5 squared?"
+    assert app_module.strip_question_number("What is 2.5 squared?") == "What is 2.5 squared?"
+
+def test_batches_are_sized_per_set(app_module, monkeypatch):
+    sizes, lock = [], threading.Lock()
+
+    def fake_generate(samples, size):
+        with lock:
+            start = sum(sizes)
+            sizes.append(size)
+        # The model numbers each batch from 1, and one question repeats across batches
+        return [f"{i + 1}. Question {start + i}?" for i in range(size - 1)] + [f"{size}. What is a vector?"]
+
+    monkeypatch.setattr(app_module, "generate_questions", fake_generate)
+    questions = app_module.generate_questions_parallel(["1. Sample?"], 25, 10)
+
+    assert sorted(sizes) == [5, 10, 10]
+    assert questions.count("What is a vector?") == 1
+    assert len(questions) == len(set(questions)) == 23
+    assert not any(question[0].isdigit() for question in questions)
@@ -0,0 +1,20 @@
+import pytest
+
+@pytest.mark.parametrize("path", ["/profiles", "/profiles/abc"])
+def test_profiles_are_closed_without_an_admin_token(app_module, client, monkeypatch, path):
+    monkeypatch.setattr(app_module, "PROFILE_ADMIN_TOKEN", "")
+    assert client.get(path).status_code == 403
+    assert client.get(path, headers={"X-Profile": ""}).status_code == 403
+
+@pytest.mark.parametrize("path", ["/profiles", "/profiles/abc"])
+def test_profiles_need_the_configured_token(app_module, client, monkeypatch, path):
+    monkeypatch.setattr(app_module, "PROFILE_ADMIN_TOKEN", "secret")
+    assert client.get(path).status_code == 403
+    assert client.get(path, headers={"X-Profile": "wrong"}).status_code == 403
+    assert client.get(path, headers={"X-Profile": "secret"}).status_code in (200, 404)
+
+def test_admin_can_list_profiles(app_module, client, monkeypatch, tmp_path):
+    monkeypatch.setattr(app_module, "PROFILE_ADMIN_TOKEN", "secret")
+    monkeypatch.setattr(app_module, "PROFILE_DIR", str(tmp_path))
+    response = client.get("/profiles", headers={"X-Profile": "secret"})
+    assert response.status_code == 200
@@ -0,0 +1,47 @@
+import json
+
+DOCUMENT = {
+    "summary": {"Intro": "What the video covers", "Forces": "Newton's laws, with \"quotes\" and {braces}"},
+    "questions": {"medium": [
+        {"question": "What is F?", "options": ["ma", "mv"], "answer": "ma"},
+        {"question": "Unit of force?", "options": ["N", "J"], "answer": "N"}
+    ]}
+}
+
+def feed_in_chunks(app_module, text, size):
+    parser = app_module.QuizStreamParser()
+    events = []
+    for start in range(0, len(text), size):
+        events.extend(parser.feed(text[start:start + size]))
+    return parser, events
+
+def expected_events():
+    topics = [("topic", {"topic": topic, "summary": summary}) for topic, summary in DOCUMENT["summary"].items()]
+    questions = [("question", {"index": index, **question}) for index, question in enumerate(DOCUMENT["questions"]["medium"], 1)]
+    return topics + questions
+
+def test_every_item_is_emitted_once_in_order_whatever_the_chunking(app_module):
+    text = "```json\n" + json.dumps(DOCUMENT, indent=2) + "\n```"
+    for size in (1, 3, 7, 64, len(text)):
+        parser, events = feed_in_chunks(app_module, text, size)
+        assert events == expected_events(), size
+        assert parser.summary_done and parser.questions_done
+
+def test_items_wait_until_they_are_complete(app_module):
+    parser = app_module.QuizStreamParser()
+    assert parser.feed('{"summary": {"Intro": "What the vi') == []
+    assert parser.feed('deo covers", "Forces"') == [("topic", {"topic": "Intro", "summary": "What the video covers"})]
+    assert parser.feed(': "laws"}, "questions": {"easy": [{"question": "Q1"') == [("topic", {"topic": "Forces", "summary": "laws"})]
+    assert parser.feed('}, ') == [("question", {"index": 1, "question": "Q1"})]
+    assert parser.feed(']}}') == []
+    assert parser.questions_done
+
+def test_malformed_summary_stops_topic_parsing_but_not_questions(app_module):
+    parser = app_module.QuizStreamParser()
+    events = parser.feed('{"summary": {"Intro" "missing colon"}, "questions": {"hard": ["not an object", {"question": "Q"}]}}')
+    assert parser.summary_done
+    assert events == [("question", {"index": 1, "question": "Q"})]
+
+def test_nothing_is_emitted_without_the_expected_keys(app_module):
+    parser = app_module.QuizStreamParser()
+    assert parser.feed('{"result": [{"question": "Q"}]}') == []
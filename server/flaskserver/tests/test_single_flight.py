@@ -0,0 +1,125 @@
+import threading
+import time
+
+import fakeredis
+import pytest
+
+def wait_until(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, "condition never became true"
+        time.sleep(0.005)
+
+@pytest.fixture
+def flight(app_module, monkeypatch):
+    monkeypatch.setattr(app_module, "cache_registry", {})
+    return app_module.SingleFlight("test:flight", lock_ttl=5, wait_timeout=5, result_ttl=5)
+
+def run_concurrently(flight, key, func, callers):
+    """Start one leader, wait until it is in flight, then start the other callers behind it."""
+    results, errors = [], []
+
+    def call():
+        try:
+            results.append(flight.do(key, func))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(callers)]
+    threads[0].start()
+    wait_until(lambda: key in flight.calls)
+    for thread in threads[1:]:
+        thread.start()
+    wait_until(lambda: flight.counters["local_waits"] == callers - 1)
+    return threads, results, errors
+
+def test_concurrent_callers_share_one_run(flight):
+    release = threading.Event()
+    calls = []
+
+    def work():
+        calls.append(1)
+        release.wait(5)
+        return {"answer": 42}
+
+    threads, results, errors = run_concurrently(flight, "k", work, 8)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results == [{"answer": 42}] * 8 and not errors
+    stats = flight.stats()
+    assert stats["misses"] == 1 and stats["hits"] == 7
+    assert stats["in_flight"] == 0
+    assert stats["redis_errors"] == 1  # Redis is unreachable in tests; the leader ran locally
+
+def test_leader_exception_reaches_every_waiter(flight):
+    release = threading.Event()
+
+    def work():
+        release.wait(5)
+        raise ValueError("failed")
+
+    threads, results, errors = run_concurrently(flight, "k", work, 4)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert not results
+    assert len(errors) == 4 and all(str(e) == "failed" for e in errors)
+    assert flight.do("k", lambda: "retried") == "retried"
+
+def test_different_keys_run_separately(flight):
+    assert flight.do("a", lambda: 1) == 1
+    assert flight.do("b", lambda: 2) == 2
+    assert flight.stats()["misses"] == 2
+
+def test_waiter_runs_the_work_itself_after_wait_timeout(flight):
+    flight.wait_timeout = 0.05
+    release = threading.Event()
+    leader = threading.Thread(target=flight.do, args=("k", lambda: release.wait(5)))
+    leader.start()
+    wait_until(lambda: "k" in flight.calls)
+    assert flight.do("k", lambda: "fallback") == "fallback"
+    release.set()
+    leader.join()
+    assert flight.counters["fallbacks"] == 1
+
+@pytest.fixture
+def shared_redis(app_module, monkeypatch):
+    client = fakeredis.FakeStrictRedis(decode_responses=True)
+    monkeypatch.setattr(app_module, "redis_client", client)
+    return client
+
+def test_result_is_published_for_other_processes(flight, shared_redis):
+    assert flight.do("k", lambda: {"value": 1}) == {"value": 1}
+    assert shared_redis.get("k:result") == '{"value": 1}'
+    assert not shared_redis.exists("k:lock")
+    assert 0 < shared_redis.ttl("k:result") <= 5
+
+def test_waits_for_a_leader_in_another_process(flight, shared_redis):
+    shared_redis.set("k:lock", "other-process", ex=5)
+
+    def finish_elsewhere():
+        time.sleep(0.1)
+        shared_redis.setex("k:result", 5, '{"value": "remote"}')
+        shared_redis.delete("k:lock")
+
+    threading.Thread(target=finish_elsewhere).start()
+    assert flight.do("k", lambda: {"value": "local"}) == {"value": "remote"}
+    assert flight.counters["remote_waits"] == 1 and flight.counters["misses"] == 0
+
+def test_runs_locally_when_the_remote_leader_gives_up(flight, shared_redis):
+    shared_redis.set("k:lock", "other-process", ex=5)
+    threading.Timer(0.1, shared_redis.delete, args=("k:lock",)).start()
+    assert flight.do("k", lambda: "local") == "local"
+    assert flight.counters["fallbacks"] == 1
+
+def test_does_not_release_a_lock_it_no_longer_holds(flight, shared_redis):
+    def work():
+        shared_redis.set("k:lock", "next-leader")  # Our lock expired and another process took over
+        return "done"
+
+    assert flight.do("k", work) == "done"
+    assert shared_redis.get("k:lock") == "next-leader"
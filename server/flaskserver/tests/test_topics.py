@@ -0,0 +1,40 @@
+import json
+
+import pytest
+
+TOPICS = ["C", "C++", "C#", "प्रकाश संश्लेषण", "गुरुत्वाकर्षण", "光合作用", "Photosynthesis"]
+
+def test_normalize_topic_keeps_distinct_topics_apart(app_module):
+    normalized = [app_module.normalize_topic(topic) for topic in TOPICS]
+    assert all(normalized)
+    assert len(set(normalized)) == len(TOPICS)
+    assert app_module.normalize_topic("C++") == "c++"
+    assert app_module.normalize_topic("प्रकाश संश्लेषण") == "प्रकाश संश्लेषण"
+
+@pytest.mark.parametrize("a, b", [
+    ("  Photosynthesis!! ", "photosynthesis"),
+    ("Binary   Trees", "binary trees"),
+    ("ＰＨＹＳＩＣＳ", "physics"),
+    ("प्रकाश संश्लेषण?", "प्रकाश  संश्लेषण"),
+])
+def test_normalize_topic_merges_trivial_rewordings(app_module, a, b):
+    assert app_module.normalize_topic(a) == app_module.normalize_topic(b)
+
+def test_normalize_topic_falls_back_to_raw_text(app_module):
+    assert app_module.normalize_topic(" ?? ") == "??"
+    assert app_module.normalize_topic(None) == ""
+
+def test_recommendations_are_cached_per_topic(app_module, monkeypatch):
+    app_module.recommendation_cache.local = app_module.LRUCache(64)
+    reply = {"topics": {topic: {"overview": f"about {topic}"} for topic in TOPICS}}
+    monkeypatch.setattr(app_module, "llama_generate_recommendations", lambda prompt: json.dumps(reply))
+
+    generated, error = app_module.generate_topic_recommendations(TOPICS)
+
+    assert error is None
+    assert {topic: value["overview"] for topic, value in generated.items()} == {t: f"about {t}" for t in TOPICS}
+    keys = {app_module.recommendation_cache.key(app_module.normalize_topic(topic)) for topic in TOPICS}
+    assert len(keys) == len(TOPICS)
+    cached, missing = app_module.get_cached_recommendations(TOPICS + ["गणित"])
+    assert missing == ["गणित"]
+    assert all(cached[topic]["overview"] == f"about {topic}" for topic in TOPICS)
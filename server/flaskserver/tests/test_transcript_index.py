@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+
+class FakeCollection:
+    """The parts of a chroma collection index_transcript uses; where filters on one field only."""
+    def __init__(self):
+        self.rows = {}
+        self.lookups = 0
+        self.upserts = 0
+
+    def _matches(self, metadata, where):
+        (field, condition), = where.items()
+        if isinstance(condition, dict):
+            return field in metadata and metadata[field] < condition["$lt"]
+        return metadata.get(field) == condition
+
+    def get(self, where, limit=None):
+        self.lookups += 1
+        ids = [row_id for row_id, (metadata, _) in self.rows.items() if self._matches(metadata, where)]
+        return {"ids": ids[:limit]}
+
+    def upsert(self, ids, documents, embeddings, metadatas):
+        self.upserts += 1
+        self.rows.update(zip(ids, zip(metadatas, documents)))
+
+    def delete(self, where):
+        self.rows = {row_id: row for row_id, row in self.rows.items() if not self._matches(row[0], where)}
+
+    def query(self, query_embeddings, n_results, where):
+        hits = [row for row in self.rows.values() if self._matches(row[0], where)][:n_results]
+        return {"metadatas": [[metadata for metadata, _ in hits]], "documents": [[document for _, document in hits]]}
+
+    def keys(self):
+        return {metadata["index_key"] for metadata, _ in self.rows.values()}
+
+class FakeEmbeddings:
+    def encode(self, texts):
+        return np.zeros(3) if isinstance(texts, str) else np.zeros((len(texts), 3))
+
+@pytest.fixture
+def collection(app_module, monkeypatch):
+    collection = FakeCollection()
+    monkeypatch.setattr(app_module, "transcript_collection", collection)
+    monkeypatch.setattr(app_module, "minilm_embeddings", FakeEmbeddings())
+    monkeypatch.setattr(app_module, "indexed_transcripts", app_module.LRUCache(max_size=2, on_evict=app_module.drop_transcript_index))
+    monkeypatch.setattr(app_module, "transcript_sweep", {"last": 0.0})
+    monkeypatch.setattr(app_module, "TRANSCRIPT_SWEEP_INTERVAL", 3600)
+    return collection
+
+def index(app_module, i):
+    return app_module.index_transcript(f"video{i:06d}", "Gemini", f"transcript {i}")
+
+def test_evicted_transcripts_are_dropped_from_the_collection(app_module, collection):
+    keys = [index(app_module, i) for i in range(3)]
+    assert len(app_module.indexed_transcripts) == 2
+    assert collection.keys() == set(keys[1:])
+
+    assert index(app_module, 2) == keys[2]
+    assert collection.lookups == 3 and collection.upserts == 3  # Cached: no lookup, no embedding
+
+    assert index(app_module, 0) == keys[0]
+    assert collection.upserts == 4  # Dropped on eviction, so embedded again
+    assert collection.keys() == {keys[0], keys[2]}
+
+def test_sweep_drops_chunks_older_than_the_ttl(app_module, collection, monkeypatch):
+    stale = index(app_module, 0)
+    for metadata, _ in collection.rows.values():
+        metadata["indexed_at"] -= app_module.TRANSCRIPT_INDEX_TTL + 1
+    monkeypatch.setattr(app_module, "transcript_sweep", {"last": 0.0})
+
+    fresh = index(app_module, 1)
+    assert collection.keys() == {fresh}
+    assert stale != fresh
+
+def test_sweep_runs_at_most_once_per_interval(app_module, collection):
+    index(app_module, 0)
+    last = app_module.transcript_sweep["last"]
+    assert last > 0
+    index(app_module, 1)
+    assert app_module.transcript_sweep["last"] == last
+
+def test_retrieval_reindexes_a_transcript_pruned_by_another_worker(app_module, collection):
+    key = index(app_module, 0)
+    collection.delete(where={"index_key": key})  # Evicted or swept elsewhere; this process still caches the key
+
+    context = app_module.retrieve_transcript_context("video000000", "gemini", "transcript 0", "question?")
+    assert context == "transcript 0"
+    assert collection.keys() == {key}
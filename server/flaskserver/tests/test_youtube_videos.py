@@ -0,0 +1,49 @@
+import hashlib
+
+import pytest
+
+@pytest.mark.parametrize("body", [
+    {"topic": [1, 2]},
+    {"topic": ["Physics", {"name": "C++"}]},
+    {"topic": ["Physics", "  "]},
+    {"topic": []},
+    {"topic": 42},
+    ["Physics"],
+])
+def test_invalid_topics_are_rejected(client, body):
+    response = client.post("/youtube_videos", json=body)
+    assert response.status_code == 400
+    assert response.get_json()["success"] is False
+
+def test_non_json_body_is_rejected(client):
+    response = client.post("/youtube_videos", data="topic=Physics", content_type="text/plain")
+    assert response.status_code == 400
+
+def test_video_cache_is_keyed_per_topic(app_module, client, monkeypatch):
+    app_module.serper_cache.local = app_module.LRUCache(64)
+    monkeypatch.setenv("SERPER_API_KEY", "test")
+    calls = []
+
+    class FakeResponse:
+        def __init__(self, topic):
+            self.topic = topic
+
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            video_id = hashlib.md5(self.topic.encode("utf-8")).hexdigest()[:11]
+            return {"videos": [{"link": f"https://www.youtube.com/watch?v={video_id}"}]}
+
+    def fake_post(url, headers=None, json=None, timeout=None):
+        calls.append(json["q"])
+        return FakeResponse(json["q"])
+
+    monkeypatch.setattr(app_module.serper_session.load(), "post", fake_post)
+    topics = ["C", "C++", "C#", "प्रकाश संश्लेषण", "गुरुत्वाकर्षण"]
+    first = client.post("/youtube_videos", json={"topic": topics}).get_json()["data"]
+    second = client.post("/youtube_videos", json={"topic": topics}).get_json()["data"]
+
+    assert len(calls) == len(topics)
+    assert first == second
+    assert len({tuple(links) for links in first.values()}) == len(topics)